@@ -1,80 +1,33 @@
 import os
-import pandas as pd
+import argparse
+from match_id import match_ids
+from ranking_asof import attach_team_ranking, load_ranking_history, ranking_with_team_ids
+from storage import WINDOW_SINCE, read_table, write_table
+from team_registry import TeamRegistry
 
 IN_API = "data/curated/api_matches_curated.csv"
-IN_RANK = "data/processed/football_ranking/ranking_processed.csv"
-IN_MAPPING = "data/processed/mappings/team_name_mapping.csv"  # el mismo que usaste para Kaggle
+IN_RANK = "data/processed/football_ranking/ranking_history.csv"
 
 OUT_DIR = "data/curated"
 OUT_FILE = os.path.join(OUT_DIR, "api_matches_with_ranking.csv")
 
-os.makedirs(OUT_DIR, exist_ok=True)
 
-def normalize_team_name(s: pd.Series) -> pd.Series:
-    # Arreglo encoding + limpieza
-    return (
-        s.astype(str)
-        .str.encode("latin1", errors="ignore")
-        .str.decode("utf-8", errors="ignore")
-        .str.strip()
-        .str.replace(r"\s+", " ", regex=True)
-    )
+def main(static_ranking: bool = False, since: str | None = None):
+    os.makedirs(OUT_DIR, exist_ok=True)
 
-def load_mapping(path: str) -> dict:
-    if not os.path.exists(path):
-        return {}
-    try:
-        m = pd.read_csv(path, encoding="utf-8")
-    except UnicodeDecodeError:
-        m = pd.read_csv(path, encoding="cp1252")
-    m["kaggle_name"] = normalize_team_name(m["kaggle_name"])
-    m["ranking_name"] = normalize_team_name(m["ranking_name"])
-    return dict(zip(m["kaggle_name"], m["ranking_name"]))
+    df = read_table(IN_API, since=since)
+    rank = load_ranking_history(IN_RANK)
 
-def main():
-    df = pd.read_csv(IN_API, parse_dates=["date"])
-    rank = pd.read_csv(IN_RANK)
+    # Los nombres ya vienen traducidos a Kaggle (curated_api_as_kaggle.py)
+    reg = TeamRegistry.load()
+    rank = ranking_with_team_ids(rank, reg)
+    print(f"Ranking histórico: {rank['rank_date'].nunique()} periodos | {len(rank)} filas")
 
-    df["home_team_norm"] = normalize_team_name(df["home_team"])
-    df["away_team_norm"] = normalize_team_name(df["away_team"])
+    # Join as-of HOME/AWAY por team_id: último ranking publicado antes de cada partido
+    df = attach_team_ranking(df, rank, reg, static=static_ranking)
 
-    rank["team_norm"] = normalize_team_name(rank["team"])
-    if rank["points"].dtype == "object":
-        rank["points"] = rank["points"].astype(str).str.replace(",", "", regex=False).astype(float)
-    rank = rank[["team_norm", "position", "points"]].copy()
-
-    # Aplicar mapping que ya usaste (Kaggle -> Ranking)
-    mapping = load_mapping(IN_MAPPING)
-    if mapping:
-        df["home_team_norm"] = df["home_team_norm"].replace(mapping)
-        df["away_team_norm"] = df["away_team_norm"].replace(mapping)
-        print(f"Mapping aplicado: {len(mapping)} reglas desde {IN_MAPPING}")
-    else:
-        print("Sin mapping (OK).")
-
-    # Merge HOME
-    df = df.merge(
-        rank.rename(columns={
-            "team_norm": "home_team_norm",
-            "position": "home_rank_position",
-            "points": "home_rank_points"
-        }),
-        on="home_team_norm",
-        how="left"
-    )
-
-    # Merge AWAY
-    df = df.merge(
-        rank.rename(columns={
-            "team_norm": "away_team_norm",
-            "position": "away_rank_position",
-            "points": "away_rank_points"
-        }),
-        on="away_team_norm",
-        how="left"
-    )
-
-    df["rank_points_diff"] = df["home_rank_points"] - df["away_rank_points"]
+    # Mismo match_id que la rama Kaggle: un partido presente en ambas fuentes comparte ID
+    df["match_id"] = match_ids(df["date"], df["home_team_id"], df["away_team_id"])
 
     # Reporte
     home_match = df["home_rank_points"].notna().mean()
@@ -86,8 +39,15 @@ def main():
     print(f"Away match: {away_match:.2%}")
     print(f"Both match: {both_match:.2%}")
 
-    df.to_csv(OUT_FILE, index=False, encoding="utf-8")
+    write_table(df, OUT_FILE)
     print("\nCURATED guardado en:", OUT_FILE)
 
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--static-ranking", action="store_true",
+                        help="Usar el último ranking para todos los partidos (join antiguo, con fuga)")
+    parser.add_argument("--since", default=WINDOW_SINCE,
+                        help="Solo partidos desde esta fecha (por defecto TFM_SINCE o histórico completo)")
+    args = parser.parse_args()
+    main(static_ranking=args.static_ranking, since=args.since)
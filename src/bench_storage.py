@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+import pandas as pd
+from storage import DATE_COLUMNS, csv_path, parquet_path, HAS_PARQUET
+
+
+# =========================
+# BENCHMARK CSV vs PARQUET (capa processed/curated)
+# =========================
+# Uso: python src/bench_storage.py   (después de src/pipeline.py)
+
+TABLES = [
+    "data/processed/kaggle/results_processed.csv",
+    "data/processed/kaggle/goalscorers_processed.csv",
+    "data/processed/api_football/fixtures_processed.csv",
+    "data/processed/football_ranking/ranking_history.csv",
+    "data/curated/kaggle_matches_curated.csv",
+    "data/curated/kaggle_matches_with_ranking.csv",
+    "data/curated/matches_final_curated.csv",
+]
+
+# Proyección típica de las etapas de features/modelo
+PROJECTION = ["date", "home_team", "away_team", "home_score", "away_score"]
+
+
+def best_of(fn, repeat: int = 5) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+
+def bench_table(path: str) -> dict:
+    csv, pq = csv_path(path), parquet_path(path)
+    header = pd.read_csv(csv, nrows=0).columns
+    dates = [c for c in header if c in DATE_COLUMNS]
+    proj = [c for c in PROJECTION if c in header]
+
+    row = {
+        "table": os.path.basename(csv).replace(".csv", ""),
+        "rows": len(pd.read_csv(csv, usecols=[header[0]])),
+        "csv_mb": os.path.getsize(csv) / 1e6,
+        "csv_read_s": best_of(lambda: pd.read_csv(csv, parse_dates=dates, low_memory=False)),
+        "csv_mem_mb": pd.read_csv(csv, parse_dates=dates, low_memory=False).memory_usage(deep=True).sum() / 1e6,
+    }
+    if os.path.exists(pq):
+        row.update({
+            "parquet_mb": os.path.getsize(pq) / 1e6,
+            "parquet_read_s": best_of(lambda: pd.read_parquet(pq)),
+            "parquet_proj_s": best_of(lambda: pd.read_parquet(pq, columns=proj)) if proj else float("nan"),
+            "parquet_mem_mb": pd.read_parquet(pq).memory_usage(deep=True).sum() / 1e6,
+        })
+    return row
+
+
+def main():
+    if not HAS_PARQUET:
+        sys.exit("pyarrow no está instalado: no hay Parquet con el que comparar.")
+
+    rows = [bench_table(t) for t in TABLES if os.path.exists(csv_path(t))]
+    df = pd.DataFrame(rows).set_index("table")
+    df["size_ratio"] = df["csv_mb"] / df["parquet_mb"]
+    df["read_speedup"] = df["csv_read_s"] / df["parquet_read_s"]
+
+    pd.set_option("display.width", 200)
+    print(df.round(3).to_string())
+    print("\nTOTAL | CSV MB:", round(df["csv_mb"].sum(), 2), "| Parquet MB:", round(df["parquet_mb"].sum(), 2),
+          "| lectura CSV s:", round(df["csv_read_s"].sum(), 3), "| lectura Parquet s:", round(df["parquet_read_s"].sum(), 3))
+
+
+if __name__ == "__main__":
+    main()
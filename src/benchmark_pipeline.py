@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import argparse
+import subprocess
+import pandas as pd
+from pipeline import ROOT_DIR, INSTRUMENT, STAGES, build_graph, topo_order
+from instrumentation import EVENTS_PATH, RUN_ID_ENV, read_events
+from synthetic_data import generate, workspace_dir
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Uso: python src/benchmark_pipeline.py --scales 1 10 100
+# Cada escala se genera con synthetic_data.py en data/.bench/scale_<n> y todas las etapas
+# de pipeline.py se ejecutan en orden, una a una, cada una en su propio proceso (así el
+# pico de memoria es el de la etapa y no el acumulado). Las medidas salen del evento que
+# escribe instrumentation.py en el espacio de trabajo.
+SCALES = (1, 10, 100)
+RESULTS_PATH = "benchmarks/pipeline_benchmarks.csv"
+
+
+# =========================
+# BENCHMARK
+# =========================
+def git_commit() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--", "src"], cwd=ROOT_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def dir_size_mb(path: str) -> float:
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total / 1e6
+
+
+def run_stage(stage, workdir: str, env: dict) -> dict:
+    script = os.path.join(ROOT_DIR, stage.script)
+    proc = subprocess.run([sys.executable, INSTRUMENT, "run", "--stage", stage.name, script, "--", *stage.args],
+                          cwd=workdir, env=env, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    events = [e for e in read_events(os.path.join(workdir, EVENTS_PATH))
+              if e["stage"] == stage.name and e["run_id"] == env[RUN_ID_ENV]]
+    if not events:
+        print(proc.stdout[-2000:], proc.stderr[-2000:])
+        return {"seconds": None, "cpu_seconds": None, "peak_mb": None, "rows_in": None, "rows_out": None,
+                "exit_code": proc.returncode}
+    e = events[-1]
+    if e["exit_code"] != 0:
+        print(proc.stdout[-2000:], proc.stderr[-2000:])
+    return {"seconds": e["wall_s"], "cpu_seconds": e["cpu_s"], "peak_mb": e["peak_rss_mb"],
+            "rows_in": e["rows_in"], "rows_out": e["rows_out"], "exit_code": e["exit_code"]}
+
+
+def bench_scale(scale: int, stages: list[str] | None, regenerate: bool, csv_export: bool) -> list[dict]:
+    workdir = os.path.abspath(workspace_dir(scale))
+    if regenerate or not os.path.exists(workdir):
+        t0 = time.perf_counter()
+        counts = generate(scale, workdir)
+        print(f"Datos sintéticos {scale}x en {time.perf_counter() - t0:.1f}s |", counts)
+
+    env = dict(os.environ, TFM_EXPORT_CSV="1" if csv_export else "0")
+    env[RUN_ID_ENV] = f"bench_{scale}x_{time.strftime('%Y%m%d_%H%M%S')}"
+    raw_mb = dir_size_mb(os.path.join(workdir, "data", "raw"))
+    by_name = {s.name: s for s in STAGES}
+    deps = build_graph(STAGES)
+    order = [n for n in topo_order(deps) if not stages or n in stages]
+
+    commit, run_at = git_commit(), time.strftime("%Y-%m-%d %H:%M:%S")
+    rows, failed = [], set()
+    for name in order:
+        if deps[name] & failed:
+            print(f"[{scale:>3}x] {name:<20} bloqueada (falló una etapa previa)")
+            failed.add(name)
+            continue
+        m = run_stage(by_name[name], workdir, env)
+        rows.append({"run_at": run_at, "commit": commit, "scale": scale, "stage": name,
+                     "raw_mb": round(raw_mb, 2), **m})
+        peak = f"{m['peak_mb']:.0f} MB" if m["peak_mb"] is not None else "n/d"
+        secs = f"{m['seconds']:.2f}s" if m["seconds"] is not None else "-"
+        print(f"[{scale:>3}x] {name:<20} {secs:>9} | pico {peak:>8} | exit={m['exit_code']}")
+        if m["exit_code"] != 0:
+            failed.add(name)
+    return rows
+
+
+def save_results(rows: list[dict], path: str = RESULTS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    df = pd.DataFrame(rows)
+    df.to_csv(path, mode="a", header=not os.path.exists(path), index=False, encoding="utf-8")
+    print("Resultados ->", path)
+
+
+def compare(path: str = RESULTS_PATH):
+    """Última ejecución de cada commit frente a la del commit anterior, por escala y etapa."""
+    df = pd.read_csv(path)
+    runs = df.drop_duplicates(["commit", "scale", "stage"], keep="last")
+    commits = list(dict.fromkeys(df.sort_values("run_at")["commit"]))
+    if len(commits) < 2:
+        print("Hace falta al menos dos commits en", path)
+        return
+    prev, last = commits[-2], commits[-1]
+    a = runs[runs["commit"] == prev].set_index(["scale", "stage"])
+    b = runs[runs["commit"] == last].set_index(["scale", "stage"])
+    out = pd.DataFrame({
+        f"s_{prev}": a["seconds"], f"s_{last}": b["seconds"],
+        f"mb_{prev}": a["peak_mb"], f"mb_{last}": b["peak_mb"],
+    }).dropna(how="all")
+    out["time_change_%"] = (out[f"s_{last}"] / out[f"s_{prev}"] - 1) * 100
+    out["mem_change_%"] = (out[f"mb_{last}"] / out[f"mb_{prev}"] - 1) * 100
+    pd.set_option("display.width", 200)
+    print(out.round(2).to_string())
+
+
+def main(scales: list[int], stages: list[str] | None, regenerate: bool, csv_export: bool):
+    os.chdir(ROOT_DIR)
+    rows = []
+    for scale in scales:
+        rows.extend(bench_scale(scale, stages, regenerate, csv_export))
+    if rows:
+        save_results(rows)
+        summary = pd.DataFrame(rows).pivot_table(index="stage", columns="scale", values="seconds", sort=False)
+        print("\n=== SEGUNDOS POR ETAPA Y ESCALA ===")
+        print(summary.round(2).to_string())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas del pipeline con datos sintéticos")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES), help="Escalas (múltiplos del tamaño actual)")
+    parser.add_argument("--stages", nargs="+", default=None, help="Solo estas etapas (deben tener sus inputs)")
+    parser.add_argument("--regenerate", action="store_true", help="Regenerar los datos sintéticos aunque existan")
+    parser.add_argument("--csv", action="store_true", help="Escribir también los CSV (por defecto solo Parquet)")
+    parser.add_argument("--compare", action="store_true", help=f"Comparar los dos últimos commits de {RESULTS_PATH}")
+    args = parser.parse_args()
+
+    if args.compare:
+        os.chdir(ROOT_DIR)
+        compare()
+        sys.exit(0)
+    main(args.scales, args.stages, args.regenerate, args.csv)
@@ -1,69 +1,65 @@
 import os
+import argparse
 import pandas as pd
+from storage import WINDOW_SINCE, read_table, write_table
+from team_registry import TeamRegistry
 
 IN_API = "data/processed/api_football/fixtures_processed.csv"
 OUT_DIR = "data/curated"
 OUT_FILE = os.path.join(OUT_DIR, "api_matches_curated.csv")
 
-MAP_PATH = "data/processed/mappings/api_to_kaggle_mapping.csv"
+# Columnas del fixture que pasan al esquema Kaggle
+API_COLS = ["fixture_id", "date", "home_team", "away_team", "home_score", "away_score",
+            "tournament", "league_id", "season"]
 
-os.makedirs(OUT_DIR, exist_ok=True)
 
-def normalize(s: pd.Series) -> pd.Series:
-    return s.astype(str).str.strip().str.replace(r"\s+", " ", regex=True)
+def main(since: str | None = None):
+    os.makedirs(OUT_DIR, exist_ok=True)
 
-def load_map(path: str) -> dict:
-    if not os.path.exists(path):
-        return {}
-    try:
-        m = pd.read_csv(path, encoding="utf-8")
-    except UnicodeDecodeError:
-        m = pd.read_csv(path, encoding="cp1252")
-    m["api_name"] = normalize(m["api_name"])
-    m["kaggle_name"] = normalize(m["kaggle_name"])
-    return dict(zip(m["api_name"], m["kaggle_name"]))
+    df = read_table(IN_API, API_COLS, schema="api_fixtures", since=since)
 
-df = pd.read_csv(IN_API, parse_dates=["date"])
+    # Normalizar nombres + mapping API -> Kaggle (alias del registro de equipos)
+    reg = TeamRegistry.load()
+    df["home_team"] = reg.api_names_to_kaggle(df["home_team"])
+    df["away_team"] = reg.api_names_to_kaggle(df["away_team"])
+    if reg.api_to_kaggle:
+        print(f"Mapping API->Kaggle aplicado: {len(reg.api_to_kaggle)} reglas")
+    else:
+        print("No hay mapping API->Kaggle. (OK, pero bajará el match con ranking)")
 
-# Normalizar nombres
-df["home_team"] = normalize(df["home_team"])
-df["away_team"] = normalize(df["away_team"])
+    # Construir output con esquema compatible con Kaggle curado
+    out = pd.DataFrame({
+        "date": df["date"],
+        "home_team": df["home_team"],
+        "away_team": df["away_team"],
+        "home_score": df["home_score"],
+        "away_score": df["away_score"],
+        "tournament": df.get("tournament", pd.NA),
+        "city": pd.NA,
+        "country": pd.NA,
+        "neutral": pd.Series(pd.NA, index=df.index, dtype="boolean"),
 
-# Aplicar mapping API -> Kaggle (solo si lo creaste)
-mp = load_map(MAP_PATH)
-if mp:
-    df["home_team"] = df["home_team"].replace(mp)
-    df["away_team"] = df["away_team"].replace(mp)
-    print(f"Mapping API->Kaggle aplicado: {len(mp)} reglas")
-else:
-    print("No hay mapping API->Kaggle. (OK, pero bajará el match con ranking)")
+        # columnas del curado Kaggle (aquí API no las trae)
+        "has_shootout": False,
+        "shootout_winner": pd.NA,
+        "goalscorers_rows": 0,
+        "penalty_goals_count": 0,
+        "own_goals_count": 0,
 
-# Construir output con esquema compatible con Kaggle curado
-out = pd.DataFrame({
-    "date": df["date"],
-    "home_team": df["home_team"],
-    "away_team": df["away_team"],
-    "home_score": df["home_score"],
-    "away_score": df["away_score"],
-    "tournament": df.get("tournament", pd.NA),
-    "city": pd.NA,
-    "country": pd.NA,
-    "neutral": pd.NA,
+        # trazabilidad
+        "fixture_id": df["fixture_id"],
+        "league_id": df["league_id"],
+        "season": df["season"],
+        "source": "api_football"
+    })
 
-    # columnas del curado Kaggle (aquí API no las trae)
-    "has_shootout": False,
-    "shootout_winner": pd.NA,
-    "goalscorers_rows": 0,
-    "penalty_goals_count": 0,
-    "own_goals_count": 0,
+    write_table(out, OUT_FILE)
+    print("OK ->", OUT_FILE, "| filas:", len(out))
+    print(out.head(5))
 
-    # trazabilidad
-    "fixture_id": df["fixture_id"],
-    "league_id": df["league_id"],
-    "season": df["season"],
-    "source": "api_football"
-})
 
-out.to_csv(OUT_FILE, index=False, encoding="utf-8")
-print("OK ->", OUT_FILE, "| filas:", len(out))
-print(out.head(5))
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--since", default=WINDOW_SINCE,
+                        help="Solo partidos desde esta fecha (por defecto TFM_SINCE o histórico completo)")
+    main(since=parser.parse_args().since)
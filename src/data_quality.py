@@ -0,0 +1,329 @@
+import os
+import sys
+import json
+import time
+import argparse
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+from storage import read_table, table_columns
+from instrumentation import record
+
+
+# =========================
+# CONFIGURACION
+# =========================
+REPORT_PATH = "data/curated/data_quality_report.json"
+
+# Tablas validadas: nombre -> (ruta, esquema de schemas.py o None)
+TABLES = {
+    "results": ("data/processed/kaggle/results_processed.csv", "results"),
+    "shootouts": ("data/processed/kaggle/shootouts_processed.csv", "shootouts"),
+    "goalscorers": ("data/processed/kaggle/goalscorers_processed.csv", "goalscorers"),
+    "ranking_history": ("data/processed/football_ranking/ranking_history.csv", "ranking_history"),
+    "api_fixtures": ("data/processed/api_football/fixtures_processed.csv", "api_fixtures"),
+    "kaggle_matches_curated": ("data/curated/kaggle_matches_curated.csv", None),
+    "kaggle_matches_with_ranking": ("data/curated/kaggle_matches_with_ranking.csv", None),
+    "matches_final_curated": ("data/curated/matches_final_curated.csv", None),
+    "team_registry": ("data/processed/mappings/team_registry.csv", None),
+}
+
+# Columnas que acompañan a los ejemplos de filas que fallan
+CONTEXT_COLS = ["date", "home_team", "away_team"]
+N_EXAMPLES = 5
+
+# Primer ranking FIFA publicado: antes no puede haber match
+FIRST_RANKING_DATE = "1993-08-08"
+
+# Sin fuga: el ranking unido a un partido se publicó antes del partido (o no hay ranking)
+RANKING_BEFORE_MATCH = ("(home_rank_date.isna() or home_rank_date < date) and "
+                        "(away_rank_date.isna() or away_rank_date < date)")
+
+
+@dataclass
+class Rule:
+    """
+    Una regla sobre una tabla. Cada tipo produce una máscara booleana (fila válida)
+    calculada de forma vectorizada:
+      not_null    columnas sin nulos (cobertura)
+      unique      combinación de columnas sin duplicados
+      range       lo <= valor <= hi (los nulos no cuentan como fallo)
+      in_set      valor dentro de `values`
+      references  la llave existe en otra tabla (integridad referencial)
+      expr        expresión de DataFrame.eval que debe ser True
+    `where` (expresión) restringe las filas evaluadas. La regla falla si la tasa de
+    filas inválidas supera max_fail_rate; solo las de severidad "error" paran el proceso.
+    """
+    name: str
+    table: str
+    kind: str
+    columns: list[str]
+    params: dict = field(default_factory=dict)
+    max_fail_rate: float = 0.0
+    severity: str = "error"
+    where: str | None = None
+
+
+RULES = [
+    # --- Kaggle processed ---
+    Rule("results_key_not_null", "results", "not_null", ["date", "home_team", "away_team"]),
+    Rule("results_scores_range", "results", "range", ["home_score", "away_score"], {"lo": 0, "hi": 40}),
+    Rule("results_distinct_teams", "results", "expr", ["home_team", "away_team"],
+         {"expr": "home_team != away_team"}),
+    Rule("results_unique_key", "results", "unique", ["date", "home_team", "away_team"],
+         max_fail_rate=0.001, severity="warn"),
+    Rule("shootouts_in_results", "shootouts", "references", ["date", "home_team", "away_team"],
+         {"ref": "results"}, max_fail_rate=0.02, severity="warn"),
+    Rule("shootouts_winner_plays", "shootouts", "expr", ["winner", "home_team", "away_team"],
+         {"expr": "winner == home_team or winner == away_team"}, max_fail_rate=0.01),
+    Rule("goalscorers_in_results", "goalscorers", "references", ["date", "home_team", "away_team"],
+         {"ref": "results"}, max_fail_rate=0.01, severity="warn"),
+    Rule("goalscorers_team_plays", "goalscorers", "expr", ["team", "home_team", "away_team"],
+         {"expr": "team == home_team or team == away_team"}),
+    Rule("goalscorers_minute_range", "goalscorers", "range", ["minute"], {"lo": 1, "hi": 130}),
+
+    # --- Ranking ---
+    Rule("ranking_unique_team_date", "ranking_history", "unique", ["rank_date", "team"]),
+    Rule("ranking_position_range", "ranking_history", "range", ["position"], {"lo": 1, "hi": 250}),
+    Rule("ranking_points_range", "ranking_history", "range", ["points"], {"lo": 0, "hi": 3000}),
+    Rule("ranking_not_null", "ranking_history", "not_null", ["rank_date", "team", "position", "points"]),
+
+    # Páginas recién descargadas del ranking (datos_football_ranking.py, solo en memoria)
+    Rule("ranking_pages_unique_position", "ranking_pages", "unique", ["position"]),
+    Rule("ranking_pages_position_range", "ranking_pages", "range", ["position"], {"lo": 1, "hi": 250}),
+    Rule("ranking_pages_points_range", "ranking_pages", "range", ["points_num"], {"lo": 0, "hi": 3000}),
+    Rule("ranking_pages_not_null", "ranking_pages", "not_null", ["position", "team", "points_num"]),
+
+    # --- API-Football ---
+    Rule("api_unique_fixture", "api_fixtures", "unique", ["fixture_id"]),
+    Rule("api_key_not_null", "api_fixtures", "not_null", ["date", "home_team", "away_team"]),
+
+    # --- Curated ---
+    Rule("curated_unique_match_id", "kaggle_matches_curated", "unique", ["match_id"]),
+    Rule("curated_goalscorers_vs_score", "kaggle_matches_curated", "expr",
+         ["goalscorers_rows", "home_score", "away_score"],
+         {"expr": "goalscorers_rows == 0 or goalscorers_rows == home_score + away_score"},
+         max_fail_rate=0.02, severity="warn"),
+    Rule("curated_shootout_is_draw", "kaggle_matches_curated", "expr",
+         ["has_shootout", "home_score", "away_score"],
+         {"expr": "~has_shootout or home_score == away_score"}, max_fail_rate=0.01),
+    Rule("ranking_team_match_rate", "kaggle_matches_with_ranking", "not_null",
+         ["home_rank_points", "away_rank_points"], max_fail_rate=0.05, severity="warn",
+         where=f"date >= '{FIRST_RANKING_DATE}'"),
+    Rule("ranking_published_before_match", "kaggle_matches_with_ranking", "expr",
+         ["date", "home_rank_date", "away_rank_date"], {"expr": RANKING_BEFORE_MATCH}),
+    Rule("ranking_home_team_ids_registered", "kaggle_matches_with_ranking", "references", ["home_team_id"],
+         {"ref": "team_registry", "ref_columns": ["team_id"]}),
+    Rule("ranking_away_team_ids_registered", "kaggle_matches_with_ranking", "references", ["away_team_id"],
+         {"ref": "team_registry", "ref_columns": ["team_id"]}),
+    Rule("final_team_ids_not_null", "matches_final_curated", "not_null", ["home_team_id", "away_team_id"]),
+    Rule("final_unique_match_id", "matches_final_curated", "unique", ["match_id"]),
+    Rule("final_ranking_published_before_match", "matches_final_curated", "expr",
+         ["date", "home_rank_date", "away_rank_date"], {"expr": RANKING_BEFORE_MATCH}),
+    Rule("final_resolution_values", "matches_final_curated", "in_set", ["resolution"],
+         {"values": ["merged", "conflict", "unmatched"], "allow_null": True}),
+]
+
+
+# =========================
+# EVALUACION
+# =========================
+def needed_columns(rules: list[Rule]) -> list[str]:
+    # Las expresiones `where` usan columnas de contexto (date)
+    cols = list(CONTEXT_COLS)
+    for r in rules:
+        cols.extend(r.columns + r.params.get("ref_columns", []))
+    return list(dict.fromkeys(cols))
+
+
+def load_table(name: str, columns: list[str] | None = None) -> pd.DataFrame:
+    """Lee solo las columnas que usan las reglas (proyección)."""
+    path, schema = TABLES[name]
+    if columns is not None:
+        available = set(table_columns(path))
+        columns = [c for c in columns if c in available]
+    return read_table(path, columns=columns, schema=schema)
+
+
+def unify_categories(*frames: pd.DataFrame) -> list[pd.DataFrame]:
+    """
+    Mismas categorías en todas las columnas category: así se comparan (==, isin) por
+    código entero en lugar de convertir cada fila a texto.
+    """
+    cat_cols = [(i, c) for i, df in enumerate(frames) for c in df.columns if df[c].dtype == "category"]
+    if not cat_cols:
+        return list(frames)
+    union = pd.Index(np.concatenate([frames[i][c].cat.categories.to_numpy() for i, c in cat_cols])).unique()
+    out = [df.copy() for df in frames]
+    for i, c in cat_cols:
+        out[i][c] = out[i][c].cat.set_categories(union)
+    return out
+
+
+def key_index(df: pd.DataFrame, cols: list[str]) -> pd.Index:
+    return pd.MultiIndex.from_frame(df[cols]) if len(cols) > 1 else pd.Index(df[cols[0]])
+
+
+def valid_mask(rule: Rule, df: pd.DataFrame, refs: dict) -> np.ndarray:
+    cols, p = rule.columns, rule.params
+    if rule.kind == "not_null":
+        return df[cols].notna().all(axis=1).to_numpy()
+    if rule.kind == "unique":
+        return ~df.duplicated(subset=cols, keep="first").to_numpy()
+    if rule.kind == "range":
+        ok = np.ones(len(df), dtype=bool)
+        for c in cols:
+            v = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+            with np.errstate(invalid="ignore"):
+                ok &= np.isnan(v) | ((v >= p.get("lo", -np.inf)) & (v <= p.get("hi", np.inf)))
+        return ok
+    if rule.kind == "in_set":
+        s = df[cols[0]]
+        ok = s.isin(p["values"]).to_numpy()
+        return ok | s.isna().to_numpy() if p.get("allow_null") else ok
+    if rule.kind == "references":
+        ref_cols = p.get("ref_columns", cols)
+        left, ref = unify_categories(df[cols], refs[p["ref"]][ref_cols])
+        return key_index(left, cols).isin(key_index(ref, ref_cols))
+    if rule.kind == "expr":
+        res = unify_categories(df[cols])[0].eval(p["expr"])
+        return pd.Series(res).fillna(False).to_numpy(dtype=bool)
+    raise ValueError(f"Tipo de regla desconocido: {rule.kind}")
+
+
+def examples(df: pd.DataFrame, bad: np.ndarray, rule: Rule) -> list[dict]:
+    cols = list(dict.fromkeys([c for c in CONTEXT_COLS if c in df.columns] + rule.columns))
+    sample = df.loc[bad, cols].head(N_EXAMPLES)
+    return json.loads(sample.astype("str").to_json(orient="records", force_ascii=False))
+
+
+def check_table(name: str, df: pd.DataFrame, refs: dict | None = None,
+                rules: list[Rule] = RULES) -> list[dict]:
+    """
+    Evalúa todas las reglas de la tabla `name` sobre `df` (ya en memoria) en una pasada.
+    `refs` aporta las tablas de las reglas `references`; las que falten se leen del disco.
+    """
+    refs = dict(refs or {})
+    results = []
+    for rule in [r for r in rules if r.table == name]:
+        t0 = time.perf_counter()
+        ref = rule.params.get("ref")
+        if rule.kind == "references" and ref not in refs:
+            refs[ref] = load_table(ref, rule.params.get("ref_columns", rule.columns))
+
+        missing = [c for c in rule.columns if c not in df.columns]
+        if missing:
+            results.append({"table": name, "rule": rule.name, "kind": rule.kind, "severity": rule.severity,
+                            "passed": False, "error": f"faltan columnas: {missing}"})
+            continue
+
+        scope = df if rule.where is None else df[df.eval(rule.where).to_numpy(dtype=bool)]
+        bad = ~valid_mask(rule, scope, refs)
+        n_bad = int(bad.sum())
+        rate = n_bad / len(scope) if len(scope) else 0.0
+        results.append({
+            "table": name,
+            "rule": rule.name,
+            "kind": rule.kind,
+            "columns": rule.columns,
+            "severity": rule.severity,
+            "rows": len(scope),
+            "failed": n_bad,
+            "fail_rate": round(rate, 6),
+            "max_fail_rate": rule.max_fail_rate,
+            "passed": rate <= rule.max_fail_rate,
+            "examples": examples(scope, bad, rule) if n_bad else [],
+            "seconds": round(time.perf_counter() - t0, 4),
+        })
+    return results
+
+
+def print_results(results: list[dict]):
+    for r in results:
+        tag = "OK  " if r["passed"] else ("FAIL" if r["severity"] == "error" else "WARN")
+        if "error" in r:
+            print(f"[{tag}] {r['table']}.{r['rule']}: {r['error']}")
+            continue
+        print(f"[{tag}] {r['table']}.{r['rule']}: {r['failed']}/{r['rows']} "
+              f"({r['fail_rate']:.2%}, máx {r['max_fail_rate']:.2%})")
+        if not r["passed"]:
+            for e in r["examples"]:
+                print("        ", e)
+
+
+def merge_results(parts: list[list[dict]]) -> list[dict]:
+    """Une los resultados de check_table de varios bloques (modo por bloques) en uno por regla."""
+    merged = {}
+    for r in (r for part in parts for r in part):
+        key = (r["table"], r["rule"])
+        m = merged.get(key)
+        if m is None:
+            merged[key] = dict(r, examples=list(r.get("examples", [])))
+            continue
+        if "error" in m or "error" in r:
+            merged[key] = m if "error" in m else dict(r)
+            continue
+        m["rows"] += r["rows"]
+        m["failed"] += r["failed"]
+        m["seconds"] = round(m["seconds"] + r["seconds"], 4)
+        m["examples"] = (m["examples"] + r["examples"])[:N_EXAMPLES]
+    for m in merged.values():
+        if "error" not in m:
+            m["fail_rate"] = round(m["failed"] / m["rows"], 6) if m["rows"] else 0.0
+            m["passed"] = m["fail_rate"] <= m["max_fail_rate"]
+    return list(merged.values())
+
+
+def has_errors(results: list[dict]) -> bool:
+    return any(not r["passed"] and r["severity"] == "error" for r in results)
+
+
+def run_checks(tables: list[str] | None = None, rules: list[Rule] = RULES) -> list[dict]:
+    """Lee cada tabla una sola vez (columnas necesarias) y evalúa sus reglas."""
+    names = tables or [t for t in dict.fromkeys(r.table for r in rules) if t in TABLES]
+    results = []
+    for name in names:
+        table_rules = [r for r in rules if r.table == name]
+        path, _ = TABLES[name]
+        if not table_rules:
+            continue
+        if not any(os.path.exists(p) for p in (path, os.path.splitext(path)[0] + ".parquet")):
+            print(f"[SKIP] {name}: no existe {path}")
+            continue
+        df = load_table(name, needed_columns(table_rules))
+        results.extend(check_table(name, df, rules=table_rules))
+    return results
+
+
+def write_report(results: list[dict], path: str = REPORT_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    report = {
+        "generated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "passed": not has_errors(results),
+        "n_rules": len(results),
+        "n_failed": sum(not r["passed"] for r in results),
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1, ensure_ascii=False)
+    record("write", path, len(results))
+
+
+def main(tables: list[str] | None = None, report_path: str = REPORT_PATH) -> bool:
+    t0 = time.perf_counter()
+    results = run_checks(tables)
+    print("\n=== CALIDAD DE DATOS ===")
+    print_results(results)
+    write_report(results, report_path)
+    ok = not has_errors(results)
+    print(f"\n{len(results)} reglas | fallidas: {sum(not r['passed'] for r in results)} | "
+          f"{time.perf_counter() - t0:.2f}s -> {report_path}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("tables", nargs="*", help=f"Tablas a validar (por defecto todas): {', '.join(TABLES)}")
+    parser.add_argument("--report", default=REPORT_PATH, help="Ruta del reporte JSON")
+    args = parser.parse_args()
+    sys.exit(0 if main(args.tables, args.report) else 1)
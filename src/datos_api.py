@@ -1,9 +1,14 @@
 import os
 import json
 import time
-from datetime import datetime
-import requests
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import pandas as pd
+from http_cache import cached_get, get_session
 
 
 # =========================
@@ -37,6 +42,14 @@ OUT_DIR = "data/raw/api_football"
 FIXTURES_DIR = os.path.join(OUT_DIR, "fixtures")
 MANIFEST_PATH = os.path.join(FIXTURES_DIR, "manifest_fixtures.csv")
 
+# Modo concurrente
+MAX_WORKERS = 4
+DEFAULT_RATE_PER_MINUTE = 10  # plan free de API-Football; se corrige con las cabeceras
+
+# Modo incremental: estados de fixture que ya no van a cambiar (la API mezcla
+# mayúsculas, p.ej. "Canc": se comparan en mayúsculas)
+FINISHED_STATUSES = {"FT", "AET", "PEN", "CANC", "ABD", "AWD", "WO"}
+
 
 # =========================
 # HELPERS
@@ -45,13 +58,154 @@ def safe_name(s: str) -> str:
     return "".join(c if c.isalnum() or c in ("_", "-") else "_" for c in s).strip("_")
 
 
-def api_get(endpoint: str, params: dict) -> dict:
-    url = f"{BASE}{endpoint}"
-    r = requests.get(url, headers=HEADERS, params=params, timeout=60)
-    # Si hay error HTTP, igual intentamos leer cuerpo para logging
-    if r.status_code != 200:
-        raise Exception(f"HTTP {r.status_code} | {r.text[:300]}")
-    return r.json()
+class TokenBucket:
+    """
+    Limitador token-bucket thread-safe.
+    La capacidad y el ritmo de recarga se ajustan con las cabeceras de rate limit
+    que devuelve API-Football (X-RateLimit-* por minuto, x-ratelimit-requests-* por día).
+    """
+
+    def __init__(self, rate_per_minute: float = DEFAULT_RATE_PER_MINUTE):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self.tokens = float(rate_per_minute)
+        self.updated = time.monotonic()
+        self.daily_remaining = None
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                if self.daily_remaining is not None and self.daily_remaining <= 0:
+                    raise Exception("Cuota diaria de API-Football agotada (x-ratelimit-requests-remaining=0)")
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def update_from_headers(self, headers):
+        with self.lock:
+            limit = _int_header(headers, "X-RateLimit-Limit")
+            remaining = _int_header(headers, "X-RateLimit-Remaining")
+            daily = _int_header(headers, "x-ratelimit-requests-remaining")
+
+            self._refill()
+            if limit:
+                self.capacity = float(limit)
+                self.rate = limit / 60.0
+            if remaining is not None:
+                # El servidor manda: nunca tener más tokens de los que nos quedan
+                self.tokens = min(self.tokens, float(remaining))
+            if daily is not None:
+                self.daily_remaining = daily
+
+    def backoff(self, seconds: float):
+        # Tras un 429 vaciamos el bucket para que todos los workers esperen
+        with self.lock:
+            self._refill()
+            self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+def _int_header(headers, name: str) -> int | None:
+    v = headers.get(name)
+    try:
+        return int(v) if v is not None else None
+    except ValueError:
+        return None
+
+
+def retry_after_seconds(headers, default: float) -> float:
+    """
+    Segundos de `Retry-After`: la cabecera puede traer segundos o una fecha HTTP
+    (RFC 9110). Si falta o no se entiende, `default`.
+    """
+    v = headers.get("Retry-After")
+    if v is None:
+        return default
+    try:
+        return max(float(v), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(v)
+    except (TypeError, ValueError):
+        return default
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def api_errors(data: dict) -> dict:
+    """
+    `errors` de un payload de API-Football como dict ({} si no hay errores).
+    La API devuelve [] cuando todo va bien y {"rateLimit": ...}, {"token": ...}, etc. si no.
+    """
+    errors = data.get("errors") or {}
+    if isinstance(errors, list):
+        errors = {str(i): e for i, e in enumerate(errors)}
+    return errors
+
+
+def api_request(endpoint: str, params: dict, base_url: str = BASE,
+                limiter: TokenBucket | None = None, max_retries: int = 3) -> dict:
+    url = f"{base_url}{endpoint}"
+    default_wait = 60 / max(limiter.capacity, 1) if limiter else 6
+
+    for attempt in range(max_retries + 1):
+        # Las respuestas servidas desde la caché HTTP no consumen tokens
+        r = cached_get(url, params=params, headers=HEADERS, timeout=60,
+                       before_request=limiter.acquire if limiter is not None else None)
+        if limiter is not None and not r.from_cache:
+            limiter.update_from_headers(r.headers)
+
+        # Si hay error HTTP, igual intentamos leer cuerpo para logging
+        if r.status_code not in (200, 429):
+            raise Exception(f"HTTP {r.status_code} | {r.text[:300]}")
+
+        # API-Football avisa del rate limit con HTTP 200 + errors.rateLimit (429 solo en proxies)
+        data = r.json() if r.status_code == 200 else {"errors": {"rateLimit": r.text[:300]}}
+        errors = api_errors(data)
+        if "rateLimit" in errors:
+            if attempt == max_retries:
+                break
+            retry_after = retry_after_seconds(r.headers, default_wait)
+            if limiter is not None:
+                limiter.backoff(retry_after)
+            else:
+                time.sleep(retry_after)
+            continue
+        if errors:
+            raise Exception(f"API errors | {json.dumps(errors, ensure_ascii=False)[:300]}")
+        return data
+
+    raise Exception(f"rateLimit | reintentos agotados para {endpoint} {params}")
+
+
+def api_get(endpoint: str, params: dict, base_url: str = BASE,
+            limiter: TokenBucket | None = None) -> dict:
+    """
+    GET a la API siguiendo `paging.total`: si la respuesta viene paginada se piden
+    el resto de páginas y se concatena `response`, de modo que el JSON guardado
+    sigue siendo uno por liga/temporada.
+    """
+    data = api_request(endpoint, params, base_url=base_url, limiter=limiter)
+
+    paging = data.get("paging") or {}
+    total_pages = int(paging.get("total") or 1)
+    for page in range(2, total_pages + 1):
+        extra = api_request(endpoint, {**params, "page": page}, base_url=base_url, limiter=limiter)
+        data.setdefault("response", []).extend(extra.get("response", []))
+
+    if total_pages > 1:
+        data["results"] = len(data.get("response", []))
+    return data
 
 
 def save_json(path: str, payload: dict):
@@ -60,93 +214,216 @@ def save_json(path: str, payload: dict):
         json.dump(payload, f, ensure_ascii=False, indent=2)
 
 
-def main():
-    os.makedirs(FIXTURES_DIR, exist_ok=True)
+def content_hash(data: dict) -> str:
+    # Hash solo de `response`: cabeceras como `paging` no cambian el contenido
+    blob = json.dumps(data.get("response", []), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def local_path(path: str) -> str:
+    # El manifest original se generó en Windows (rutas con '\\')
+    return path.replace("\\", "/").replace("/", os.sep)
+
+
+def is_season_closed(data: dict, season: int) -> bool:
+    """
+    Una temporada está cerrada si todos sus fixtures tienen estado final.
+    Un payload con `errors`, sin fixtures o de otra temporada (`parameters.season`)
+    nunca cuenta como cerrado (p.ej. un rateLimit guardado como OK): se vuelve a pedir
+    en el siguiente run.
+    """
+    resp = data.get("response", [])
+    if api_errors(data) or not resp:
+        return False
+    if str((data.get("parameters") or {}).get("season")) != str(season):
+        return False
+    return all(str(m["fixture"]["status"]["short"]).upper() in FINISHED_STATUSES for m in resp)
+
+
+def load_manifest(path: str) -> pd.DataFrame:
+    if not os.path.exists(path):
+        return pd.DataFrame()
+    return pd.read_csv(path, encoding="utf-8")
+
+
+def latest_ok_extractions(df_manifest: pd.DataFrame) -> dict:
+    """
+    {(league_id, season): info} con la última extracción OK cuyo JSON existe en disco,
+    su content hash y si la temporada está cerrada. Los payloads con `errors` (runs
+    antiguos que los guardaban como OK) no cuentan como extracción previa.
+    """
+    if df_manifest.empty:
+        return {}
+
+    ok = df_manifest[df_manifest["status"] == "OK"].sort_values("extract_timestamp")
+    latest = ok.groupby(["league_id", "season"]).tail(1)
+
+    out = {}
+    for row in latest.itertuples(index=False):
+        path = local_path(row.raw_file_path)
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if api_errors(data):
+            continue
+        out[(int(row.league_id), int(row.season))] = {
+            "raw_file_path": path,
+            "content_hash": content_hash(data),
+            "closed": is_season_closed(data, int(row.season)),
+        }
+    return out
+
+
+def extract_league_season(league: dict, season: int, run_ts: str, fixtures_dir: str,
+                          base_url: str = BASE, limiter: TokenBucket | None = None,
+                          previous: dict | None = None) -> dict:
+    league_id = league["id"]
+    league_name = league["name"]
+    league_folder = os.path.join(fixtures_dir, f"league_{league_id}_{safe_name(league_name)}")
+    os.makedirs(league_folder, exist_ok=True)
+
+    params = {"league": league_id, "season": season}
+    endpoint = "/fixtures"
+    extract_ts = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+
+    out_file = os.path.join(
+        league_folder,
+        f"fixtures_league_{league_id}_season_{season}_{extract_ts}.json"
+    )
+
+    status = "OK"
+    error_msg = ""
+    results = None
+    paging = None
+    response_count = 0
+    digest = ""
+    stored = False
+
+    try:
+        data = api_get(endpoint, params=params, base_url=base_url, limiter=limiter)
+
+        # Validaciones suaves (sin transformar)
+        results = data.get("results")
+        paging = data.get("paging")
+        resp = data.get("response", [])
+        response_count = len(resp)
+        digest = content_hash(data)
+
+        if previous is not None and previous["content_hash"] == digest:
+            # Mismo contenido que la última extracción: no duplicar el RAW
+            out_file = previous["raw_file_path"]
+            print(f"[OK] League={league_id} Season={season} -> fixtures={response_count} | sin cambios={out_file}")
+        else:
+            save_json(out_file, data)
+            stored = True
+            print(f"[OK] League={league_id} Season={season} -> fixtures={response_count} | saved={out_file}")
+
+    except Exception as e:
+        status = "ERROR"
+        error_msg = str(e)
+        print(f"[ERROR] League={league_id} Season={season} -> {error_msg}")
+
+        # Guardar también el error como “raw” para evidencia si quieres
+        err_payload = {
+            "endpoint": endpoint,
+            "params": params,
+            "error": error_msg,
+            "timestamp": extract_ts
+        }
+        out_file = os.path.join(
+            league_folder,
+            f"ERROR_fixtures_league_{league_id}_season_{season}_{extract_ts}.json"
+        )
+        save_json(out_file, err_payload)
+
+    return {
+        "run_id": run_ts,
+        "extract_timestamp": extract_ts,
+        "league_id": league_id,
+        "league_name": league_name,
+        "season": season,
+        "endpoint": endpoint,
+        "params": json.dumps(params, ensure_ascii=False),
+        "results_field": results,
+        "paging_field": json.dumps(paging, ensure_ascii=False) if paging is not None else "",
+        "response_count": response_count,
+        "status": status,
+        "error": error_msg,
+        "raw_file_path": out_file,
+        "content_hash": digest,
+        "stored": stored
+    }
+
+
+def main(out_dir: str = OUT_DIR, base_url: str = BASE, workers: int = 1,
+         rate_per_minute: float = DEFAULT_RATE_PER_MINUTE, incremental: bool = False):
+    fixtures_dir = os.path.join(out_dir, "fixtures")
+    manifest_path = os.path.join(fixtures_dir, "manifest_fixtures.csv")
+    os.makedirs(fixtures_dir, exist_ok=True)
 
-    manifest_rows = []
     run_ts = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+    tasks = [(league, season) for league in LEAGUES for season in SEASONS]
+
+    df_previous = load_manifest(manifest_path) if incremental else pd.DataFrame()
+    previous = latest_ok_extractions(df_previous)
+    if incremental:
+        closed = [t for t in tasks if previous.get((t[0]["id"], t[1]), {}).get("closed")]
+        tasks = [t for t in tasks if t not in closed]
+        print(f"Modo incremental: {len(closed)} temporadas cerradas omitidas | a refrescar: {len(tasks)}")
 
-    for league in LEAGUES:
-        league_id = league["id"]
-        league_name = league["name"]
-        league_folder = os.path.join(FIXTURES_DIR, f"league_{league_id}_{safe_name(league_name)}")
-        os.makedirs(league_folder, exist_ok=True)
-
-        for season in SEASONS:
-            params = {"league": league_id, "season": season}
-            endpoint = "/fixtures"
-            extract_ts = datetime.now().strftime("%Y-%m-%d_%H%M%S")
-
-            out_file = os.path.join(
-                league_folder,
-                f"fixtures_league_{league_id}_season_{season}_{extract_ts}.json"
-            )
-
-            status = "OK"
-            error_msg = ""
-            results = None
-            paging = None
-            response_count = 0
-
-            try:
-                data = api_get(endpoint, params=params)
-
-                # Validaciones suaves (sin transformar)
-                results = data.get("results")
-                paging = data.get("paging")
-                resp = data.get("response", [])
-                response_count = len(resp)
-
-                save_json(out_file, data)
-
-                print(f"[OK] League={league_id} Season={season} -> fixtures={response_count} | saved={out_file}")
-
-            except Exception as e:
-                status = "ERROR"
-                error_msg = str(e)
-                print(f"[ERROR] League={league_id} Season={season} -> {error_msg}")
-
-                # Guardar también el error como “raw” para evidencia si quieres
-                err_payload = {
-                    "endpoint": endpoint,
-                    "params": params,
-                    "error": error_msg,
-                    "timestamp": extract_ts
-                }
-                out_file = os.path.join(
-                    league_folder,
-                    f"ERROR_fixtures_league_{league_id}_season_{season}_{extract_ts}.json"
-                )
-                save_json(out_file, err_payload)
-
-            manifest_rows.append({
-                "run_id": run_ts,
-                "extract_timestamp": extract_ts,
-                "league_id": league_id,
-                "league_name": league_name,
-                "season": season,
-                "endpoint": endpoint,
-                "params": json.dumps(params, ensure_ascii=False),
-                "results_field": results,
-                "paging_field": json.dumps(paging, ensure_ascii=False) if paging is not None else "",
-                "response_count": response_count,
-                "status": status,
-                "error": error_msg,
-                "raw_file_path": out_file
-            })
-
-            # Pausa pequeña para no bombardear la API
-            time.sleep(0.5)
-
-    df_manifest = pd.DataFrame(manifest_rows)
-    df_manifest.to_csv(MANIFEST_PATH, index=False, encoding="utf-8")
-    print("\nManifest guardado en:", MANIFEST_PATH)
+    # El token bucket marca el ritmo en los dos modos (en lugar de una pausa fija)
+    limiter = TokenBucket(rate_per_minute=rate_per_minute)
+    if workers <= 1:
+        manifest_rows = []
+        for league, season in tasks:
+            manifest_rows.append(extract_league_season(league, season, run_ts, fixtures_dir, base_url=base_url,
+                                                       limiter=limiter,
+                                                       previous=previous.get((league["id"], season))))
+    else:
+        # Modo concurrente: pool acotado que comparte el token bucket
+        get_session(pool_size=workers)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = [
+                pool.submit(extract_league_season, league, season, run_ts, fixtures_dir,
+                            base_url=base_url, limiter=limiter,
+                            previous=previous.get((league["id"], season)))
+                for league, season in tasks
+            ]
+            # Mantener el orden LEAGUES x SEASONS en el manifest
+            manifest_rows = [f.result() for f in futures]
+
+    df_run = pd.DataFrame(manifest_rows)
+    # En modo incremental el manifest es un histórico: se añaden las filas de este run
+    df_manifest = pd.concat([df_previous, df_run], ignore_index=True) if incremental else df_run
+    df_manifest.to_csv(manifest_path, index=False, encoding="utf-8")
+    print("\nManifest guardado en:", manifest_path)
 
     # Resumen final útil para tu reporte
-    ok = df_manifest[df_manifest["status"] == "OK"]
-    print("Extracciones OK:", len(ok), "de", len(df_manifest))
+    if df_run.empty:
+        print("Nada que extraer: todas las temporadas están cerradas.")
+        return
+    ok = df_run[df_run["status"] == "OK"]
+    print("Extracciones OK:", len(ok), "de", len(df_run), "| ERROR:", len(df_run) - len(ok))
     print("Total fixtures (suma):", ok["response_count"].sum())
+    print("JSON nuevos guardados:", int(ok["stored"].sum()), "| sin cambios:", int((~ok["stored"]).sum()))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Extracción de fixtures desde API-Football")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Nº de workers concurrentes (1 = modo secuencial)")
+    parser.add_argument("--rate-per-minute", type=float, default=DEFAULT_RATE_PER_MINUTE,
+                        help="Ritmo inicial del token bucket, en ambos modos (se ajusta con las cabeceras de la API)")
+    parser.add_argument("--base-url", default=BASE,
+                        help="URL base de la API (p.ej. el stub local para benchmarks)")
+    parser.add_argument("--out-dir", default=OUT_DIR)
+    parser.add_argument("--incremental", action="store_true",
+                        help="Usar el manifest: omitir temporadas cerradas y no guardar payloads idénticos")
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(out_dir=args.out_dir, base_url=args.base_url, workers=args.workers,
+         rate_per_minute=args.rate_per_minute, incremental=args.incremental)
@@ -1,9 +1,16 @@
 import os
 import re
+import sys
+import glob
+import argparse
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import requests
 from bs4 import BeautifulSoup
+import numpy as np
 import pandas as pd
+from data_quality import check_table, print_results
+from http_cache import cached_get
 
 
 BASE_URL = "https://football-ranking.com/fifa-rankings"
@@ -19,10 +26,26 @@ HEADERS = {
 RANK_RE = re.compile(r"^\s*(\d+)\b")
 TEAM_CODE_RE = re.compile(r"\([A-Z]{3}\)")
 DECIMAL_NUMBER_RE = re.compile(r"\b\d{1,3}(?:,\d{3})*\.\d+\b")  # 1,877.18 o 799.80
+PAGE_LINK_RE = re.compile(r"[?&]page=(\d+)")
+ISO_DATE_RE = re.compile(r"\b((?:19|20)\d{2})-(\d{2})-(\d{2})\b")
+
+# lxml es bastante más rápido que html.parser; se usa si está instalado
+DEFAULT_PARSER = "lxml" if importlib.util.find_spec("lxml") else "html.parser"
+MAX_WORKERS = 4
+
+# Mismo directorio que lee process_football_ranking.py (RAW_GLOB). Las versiones
+# anteriores escribían en data/raw: migrate_legacy_raw() mueve esos CSV aquí
+RAW_DIR = "data/raw/fifa_ranking"
+LEGACY_RAW_DIR = "data/raw"
+
+# Backfill histórico: una partición por fecha de publicación del ranking
+PERIOD_URL = BASE_URL + "?date={date}&page={page}"
+HISTORY_DIR = "data/raw/fifa_ranking/history"
+FIRST_RANKING_DATE = "1993-08-08"  # primer ranking FIFA publicado
 
 
 def fetch_html(url: str) -> str:
-    r = requests.get(url, headers=HEADERS, timeout=30)
+    r = cached_get(url, headers=HEADERS, timeout=30)
     if r.status_code != 200:
         raise Exception(f"Error HTTP {r.status_code} al descargar {url}")
     return r.text
@@ -83,6 +106,58 @@ def parse_current_points_from_row(row: BeautifulSoup) -> str | None:
     return m.group(0) if m else None
 
 
+def parse_row(row: BeautifulSoup) -> list | None:
+    """
+    Versión de una sola pasada de parse_rank/team/current_points: el texto de cada
+    celda se calcula una vez y el texto de la fila se arma a partir de ellas.
+    Devuelve [rank, team, points] o None, igual que la combinación de los tres helpers.
+    """
+    tds = row.find_all("td")
+    if len(tds) == 0:
+        return None
+
+    cells = [td.get_text(" ", strip=True) for td in tds]
+
+    # Si la fila solo tiene <td> como hijos directos, el texto de la fila es la
+    # unión de sus celdas; si no (th, texto suelto...), se calcula como antes.
+    children = [c for c in row.children if getattr(c, "name", None) or str(c).strip()]
+    if len(children) == len(tds) and all(c.name == "td" for c in children):
+        row_text = " ".join(c for c in cells if c)
+    else:
+        row_text = row.get_text(" ", strip=True)
+
+    m = RANK_RE.match(row_text)
+    if not m:
+        return None
+    rank = int(m.group(1))
+    if not 1 <= rank <= 210:
+        return None
+
+    team = next((c for c in cells if TEAM_CODE_RE.search(c)), None)
+    if not team:
+        return None
+
+    m = DECIMAL_NUMBER_RE.search(row_text)
+    if not m:
+        return None
+
+    return [rank, team, m.group(0)]
+
+
+def extract_ranking_from_table_fast(table) -> pd.DataFrame:
+    data = [r for r in map(parse_row, table.find_all("tr")) if r is not None]
+    return pd.DataFrame(data, columns=["position", "team", "points"])
+
+
+def detect_page_count(soup: BeautifulSoup) -> int | None:
+    """
+    Número de páginas según los enlaces de paginación (?page=N) de la primera página.
+    """
+    pages = [int(m.group(1)) for a in soup.find_all("a", href=True)
+             for m in [PAGE_LINK_RE.search(a["href"])] if m]
+    return max(pages) if pages else None
+
+
 def extract_ranking_from_table(table) -> pd.DataFrame:
     data = []
 
@@ -118,6 +193,25 @@ def save_raw_per_page(df: pd.DataFrame, out_dir: str, page: int, period: str) ->
     return path
 
 
+def migrate_legacy_raw(legacy_dir: str = LEGACY_RAW_DIR, raw_dir: str = RAW_DIR) -> int:
+    """
+    Mueve a RAW_DIR los CSV por página que quedaron en data/raw (salida antigua del
+    scraper), para que process_football_ranking.py los vea. No pisa los que ya existen.
+    """
+    moved = 0
+    for path in sorted(glob.glob(os.path.join(legacy_dir, "football_ranking_raw_*.csv"))):
+        dest = os.path.join(raw_dir, os.path.basename(path))
+        if os.path.exists(dest):
+            print(f"AVISO: {path} ya existe en {raw_dir}; se deja sin mover")
+            continue
+        os.makedirs(raw_dir, exist_ok=True)
+        os.replace(path, dest)
+        moved += 1
+    if moved:
+        print(f"Migrados {moved} CSV de {legacy_dir} a {raw_dir}")
+    return moved
+
+
 def validate_full_dataset(all_pages: list[pd.DataFrame]):
     # Validación (no raw): unir, ordenar y revisar cobertura 1..210
     full = pd.concat(all_pages, ignore_index=True)
@@ -129,25 +223,19 @@ def validate_full_dataset(all_pages: list[pd.DataFrame]):
 
     print("\n=== VALIDACION GLOBAL ===")
     print("Total filas combinadas:", len(full))
-    print("Min position:", full["position"].min())
-    print("Max position:", full["position"].max())
-    print("Unique positions:", full["position"].nunique())
-    print("Points min/max:", full["points_num"].min(), "/", full["points_num"].max())
-    print(full.head(12))
+    # Unicidad, rangos y nulos: reglas "ranking_pages" de data_quality.py
+    print_results(check_table("ranking_pages", full))
 
-    missing = sorted(set(range(1, 211)) - set(full["position"].tolist()))
+    # Cobertura 1..N: es una comprobación de tabla, no de fila
+    missing = np.setdiff1d(np.arange(1, 211), full["position"].to_numpy())
     print("Missing positions count:", len(missing))
-    if missing:
-        print("Missing positions (primeras 30):", missing[:30])
-
-    dups = full[full.duplicated(subset=["position"], keep=False)].sort_values("position")
-    if not dups.empty:
-        print("\n⚠️ Duplicados de position (muestra):")
-        print(dups.head(20))
+    if len(missing):
+        print("Missing positions (primeras 30):", missing[:30].tolist())
 
 
 def main():
-    out_dir = "data/raw"
+    out_dir = RAW_DIR
+    migrate_legacy_raw()
     all_pages = []
     page = 1
 
@@ -184,5 +272,185 @@ def main():
         validate_full_dataset(all_pages)
 
 
+def scrape_page(page: int, parser: str = DEFAULT_PARSER, url: str | None = None):
+    """
+    Descarga y parsea una página. Devuelve (soup, period, df); df es None si no hay tabla.
+    """
+    html = fetch_html(url or f"{BASE_URL}?page={page}")
+    soup = BeautifulSoup(html, parser)
+    period = extract_period_label(soup)
+    table = find_ranking_table(soup)
+    df = extract_ranking_from_table_fast(table) if table is not None else None
+    return soup, period, df
+
+
+def main_parallel(workers: int = MAX_WORKERS, parser: str = DEFAULT_PARSER):
+    """
+    Igual que main(), pero aprende el nº de páginas de la primera y descarga el resto
+    en paralelo. Las páginas se procesan después en orden con las mismas reglas de
+    corte, así que los CSV por página y la validación son idénticos. Si la última
+    página detectada viene llena (50 filas) la paginación era incompleta y se sigue
+    en secuencial, como main().
+    """
+    out_dir = RAW_DIR
+    migrate_legacy_raw()
+
+    soup, period, df = scrape_page(1, parser)
+    n_pages = detect_page_count(soup)
+    if n_pages is None:
+        print("No se detectó paginación; se usa el modo secuencial.")
+        main()
+        return
+
+    results = {1: (period, df)}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {p: pool.submit(scrape_page, p, parser) for p in range(2, n_pages + 1)}
+        for p, fut in futures.items():
+            _, p_period, p_df = fut.result()
+            results[p] = (p_period, p_df)
+
+    all_pages = []
+    page = 1
+    while True:
+        if page in results:
+            period, df = results[page]
+        else:
+            _, period, df = scrape_page(page, parser)
+
+        if df is None:
+            print(f"Page {page} | sin tabla -> fin de paginación")
+            break
+
+        print(f"Page {page} | period={period} | filas extraídas={len(df)}")
+
+        if len(df) == 0:
+            break
+
+        save_raw_per_page(df, out_dir=out_dir, page=page, period=period)
+        all_pages.append(df)
+
+        if len(df) < 50:
+            print("Última página detectada (<50 filas). Fin.")
+            break
+
+        page += 1
+
+    if all_pages:
+        validate_full_dataset(all_pages)
+
+
+# =========================
+# BACKFILL HISTORICO
+# =========================
+def list_ranking_dates(soup: BeautifulSoup) -> list[str]:
+    """
+    Fechas de publicación del ranking que ofrece el selector de periodo
+    (<select> con <option value=...> o enlaces ?date=...), desde FIRST_RANKING_DATE.
+    Si la página no trae selector con fechas (la web cambió) se lanza ValueError: el
+    backfill no puede seguir sin saber qué periodos existen.
+    """
+    candidates = [o.get("value", "") for s in soup.find_all("select") for o in s.find_all("option")]
+    candidates += [a["href"] for a in soup.find_all("a", href=True) if "date=" in a["href"]]
+
+    dates = {"-".join(m.groups()) for c in candidates for m in [ISO_DATE_RE.search(c)] if m}
+    if not dates:
+        raise ValueError("La página 1 no tiene selector de periodo con fechas (<select>/<option> "
+                         "o enlaces ?date=AAAA-MM-DD): revisar el HTML de football-ranking.com")
+    return sorted(d for d in dates if d >= FIRST_RANKING_DATE)
+
+
+def partition_path(rank_date: str, history_dir: str = HISTORY_DIR) -> str:
+    return os.path.join(history_dir, f"rank_date={rank_date}", "ranking.csv")
+
+
+def check_period(period: str, rank_date: str, page: int):
+    """
+    La web sirve el ranking actual si no reconoce `?date=`: el periodo visible tiene
+    que ser la fecha pedida, si no la partición guardaría otro ranking.
+    """
+    shown = pd.to_datetime(period, format="%d %B %Y", errors="coerce")
+    if pd.isna(shown) or shown != pd.Timestamp(rank_date):
+        raise ValueError(f"rank_date={rank_date} page={page}: la página muestra el periodo '{period}'")
+
+
+def scrape_period(rank_date: str, parser: str = DEFAULT_PARSER) -> pd.DataFrame:
+    """
+    Ranking completo (todas las páginas) de una fecha de publicación.
+    """
+    soup, period, df = scrape_page(1, parser, url=PERIOD_URL.format(date=rank_date, page=1))
+    check_period(period, rank_date, 1)
+    pages = [df] if df is not None and len(df) else []
+
+    n_pages = detect_page_count(soup) or 1
+    for page in range(2, n_pages + 1):
+        _, period, df = scrape_page(page, parser, url=PERIOD_URL.format(date=rank_date, page=page))
+        check_period(period, rank_date, page)
+        if df is None or len(df) == 0:
+            break
+        pages.append(df)
+
+    if not pages:
+        return pd.DataFrame(columns=["rank_date", "position", "team", "points"])
+    out = pd.concat(pages, ignore_index=True)
+    out.insert(0, "rank_date", rank_date)
+    return out
+
+
+def backfill_history(workers: int = MAX_WORKERS, parser: str = DEFAULT_PARSER,
+                     history_dir: str = HISTORY_DIR):
+    """
+    Descarga todos los periodos publicados que aún no tienen partición en disco.
+    Cada periodo se escribe al terminar, así que un corte se reanuda sin perder trabajo.
+    """
+    soup, _, _ = scrape_page(1, parser)
+    dates = list_ranking_dates(soup)
+
+    pending = [d for d in dates if not os.path.exists(partition_path(d, history_dir))]
+    print(f"Periodos publicados: {len(dates)} | ya descargados: {len(dates) - len(pending)} | pendientes: {len(pending)}")
+
+    def run(rank_date: str):
+        df = scrape_period(rank_date, parser)
+        if len(df) == 0:
+            return rank_date, 0, "sin filas"
+        path = partition_path(rank_date, history_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = path + ".tmp"
+        df.to_csv(tmp, index=False, encoding="utf-8")
+        os.replace(tmp, path)
+        return rank_date, len(df), "OK"
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run, d) for d in pending]
+        for fut in futures:
+            try:
+                rank_date, n, status = fut.result()
+                print(f"[{status}] rank_date={rank_date} | filas={n}")
+            except Exception as e:
+                print(f"[ERROR] {e}")
+
+    done = sum(os.path.exists(partition_path(d, history_dir)) for d in dates)
+    print(f"Particiones completas: {done} de {len(dates)} (re-ejecutar para reanudar las que falten)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Scraper del ranking FIFA (football-ranking.com)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Nº de descargas en paralelo (1 = modo secuencial original)")
+    parser.add_argument("--parser", default=DEFAULT_PARSER,
+                        help="Backend de BeautifulSoup para el modo paralelo (lxml o html.parser)")
+    parser.add_argument("--backfill", action="store_true",
+                        help="Descargar el histórico de rankings (todas las fechas desde 1993)")
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    if args.backfill:
+        try:
+            backfill_history(workers=max(args.workers, 1), parser=args.parser)
+        except ValueError as e:
+            sys.exit(str(e))
+    elif args.workers > 1:
+        main_parallel(workers=args.workers, parser=args.parser)
+    else:
+        main()
@@ -0,0 +1,314 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from storage import read_table, write_table
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Rating Elo sobre todo el histórico (desde 1872), al estilo de eloratings.net: K según
+# el torneo, escalado por diferencia de goles, ventaja de local salvo campo neutral y las
+# tandas de penales como resultado parcial. Una sola pasada en orden de fecha; el rating
+# previo a cada partido es una feature sin fuga (solo usa partidos anteriores).
+IN_MATCHES = "data/curated/matches_final_curated.csv"
+OUT_FILE = "data_to_model/06_elo_features.csv"
+CHECKPOINT_FILE = "data/curated/elo_checkpoints.npz"
+
+# Primer partido internacional (Escocia - Inglaterra): si la tabla empieza después, viene
+# recortada (pipeline con --since) y todos los equipos arrancarían en 1500 en la ventana
+FIRST_MATCH_DATE = "1872-11-30"
+
+MATCH_COLS = ["date", "home_team", "away_team", "home_score", "away_score", "tournament",
+              "neutral", "shootout_winner", "home_team_id", "away_team_id", "match_id"]
+FEATURE_COLS = ["match_id", "date", "home_team_id", "away_team_id",
+                "home_elo", "away_elo", "elo_diff", "elo_home_expected"]
+
+INITIAL_RATING = 1500.0
+HOME_ADVANTAGE = 100.0
+SHOOTOUT_SCORE = 0.75     # resultado del ganador de la tanda (0.5 = tratarla como empate)
+
+# K por tipo de torneo (eloratings.net); el primer grupo que coincide manda
+K_WORLD_CUP = 60
+K_CONTINENTAL = 50
+K_QUALIFIER = 40
+K_OTHER = 30
+K_FRIENDLY = 20
+
+WORLD_CUP = {"FIFA World Cup"}
+CONTINENTAL = {
+    "UEFA Euro", "Copa América", "African Cup of Nations", "AFC Asian Cup", "Gold Cup",
+    "CONCACAF Championship", "Oceania Nations Cup", "Confederations Cup",
+}
+FRIENDLY = {"Friendly", "Friendlies"}
+
+
+# =========================
+# PARAMETROS POR PARTIDO (vectorizados)
+# =========================
+def tournament_k(tournament: pd.Series) -> np.ndarray:
+    """K de cada partido: se decide una vez por categoría de torneo y se expande por código."""
+    cat = tournament.astype("category")
+    names = cat.cat.categories.astype(str)
+    k = np.full(len(names), K_OTHER, dtype=float)
+    lower = names.str.lower()
+    k[lower.str.contains("qualification") | lower.str.contains("nations league")] = K_QUALIFIER
+    k[names.isin(CONTINENTAL)] = K_CONTINENTAL
+    k[names.isin(WORLD_CUP)] = K_WORLD_CUP
+    k[names.isin(FRIENDLY)] = K_FRIENDLY
+    codes = cat.cat.codes.to_numpy()
+    return np.where(codes >= 0, k[codes], K_OTHER)
+
+
+def goal_multiplier(goal_diff: np.ndarray) -> np.ndarray:
+    """1 por 0-1 goles, 1.5 por 2, 1.75 + (N-3)/8 por N >= 3."""
+    g = np.abs(goal_diff)
+    return np.where(g <= 1, 1.0, np.where(g == 2, 1.5, 1.75 + (g - 3) / 8))
+
+
+def match_inputs(df: pd.DataFrame) -> dict:
+    """
+    Arrays de la pasada en el orden de proceso (fecha y, dentro de la fecha, orden de
+    fila). Partidos sin marcador: K = 0 (reciben rating previo pero no lo cambian).
+    """
+    df = df.iloc[np.argsort(df["date"].to_numpy(), kind="stable")]
+    hs = df["home_score"].to_numpy(dtype=float, na_value=np.nan)
+    as_ = df["away_score"].to_numpy(dtype=float, na_value=np.nan)
+    played = ~np.isnan(hs) & ~np.isnan(as_)
+    gd = np.where(played, hs - as_, 0.0)
+
+    # Resultado local: 1 / 0.5 / 0; con empate y tanda, SHOOTOUT_SCORE para el ganador
+    score = np.where(gd > 0, 1.0, np.where(gd < 0, 0.0, 0.5))
+    winner = df["shootout_winner"].astype("str").to_numpy()
+    level = played & (gd == 0) & df["shootout_winner"].notna().to_numpy()
+    score[level & (winner == df["home_team"].astype("str").to_numpy())] = SHOOTOUT_SCORE
+    score[level & (winner == df["away_team"].astype("str").to_numpy())] = 1 - SHOOTOUT_SCORE
+
+    # Sin dato de neutral: como en RESULTS, se juega en casa del local
+    neutral = df["neutral"].astype("boolean").fillna(False).to_numpy(dtype=bool)
+    return {
+        "match_id": df["match_id"].to_numpy(dtype=np.int64),
+        "date": df["date"].to_numpy(dtype="datetime64[D]"),
+        "home": df["home_team_id"].to_numpy(dtype=np.int64),
+        "away": df["away_team_id"].to_numpy(dtype=np.int64),
+        "k": np.where(played, tournament_k(df["tournament"]) * goal_multiplier(gd), 0.0),
+        "score": score,
+        "adv": np.where(neutral, 0.0, HOME_ADVANTAGE),
+    }
+
+
+# =========================
+# PASADA ELO (O(n))
+# =========================
+def run_elo(inputs: dict, ratings: np.ndarray) -> tuple[dict, np.ndarray, dict]:
+    """
+    Una pasada secuencial (cada partido depende de los anteriores). Devuelve los ratings
+    previos a cada partido, los ratings finales y un checkpoint al inicio de cada año
+    (ratings antes del primer partido de ese año).
+    """
+    home, away = inputs["home"].tolist(), inputs["away"].tolist()
+    k, score, adv = inputs["k"].tolist(), inputs["score"].tolist(), inputs["adv"].tolist()
+    n = len(home)
+
+    # Índices donde empieza un año (también la primera fila: el punto desde el que se retoma)
+    year = inputs["date"].astype("datetime64[Y]")
+    starts = [0, *(np.flatnonzero(year[1:] != year[:-1]) + 1).tolist()] if n else []
+    starts.append(-1)
+
+    R = ratings.tolist()
+    pre_h, pre_a = [0.0] * n, [0.0] * n
+    ckpt_rows, ckpt_ratings = [], []
+    nxt, j = starts[0], 0
+    for i in range(n):
+        if i == nxt:
+            ckpt_rows.append(i)
+            ckpt_ratings.append(R.copy())
+            j += 1
+            nxt = starts[j]
+        h, a = home[i], away[i]
+        rh, ra = R[h], R[a]
+        pre_h[i], pre_a[i] = rh, ra
+        delta = k[i] * (score[i] - 1.0 / (10.0 ** ((ra - rh - adv[i]) / 400.0) + 1.0))
+        R[h] = rh + delta
+        R[a] = ra - delta
+
+    checkpoints = {
+        "date": inputs["date"][ckpt_rows].astype("datetime64[Y]").astype("datetime64[D]"),
+        "ratings": np.array(ckpt_ratings).reshape(len(ckpt_rows), len(R)),
+    }
+    return {"home_elo": np.array(pre_h), "away_elo": np.array(pre_a)}, np.array(R), checkpoints
+
+
+def elo_features(inputs: dict, pre: dict) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "match_id": inputs["match_id"],
+        "date": inputs["date"].astype("datetime64[ns]"),
+        "home_team_id": inputs["home"].astype("int32"),
+        "away_team_id": inputs["away"].astype("int32"),
+        "home_elo": pre["home_elo"].round(3),
+        "away_elo": pre["away_elo"].round(3),
+    })
+    df["elo_diff"] = df["home_elo"] - df["away_elo"]
+    # Probabilidad esperada del local con la ventaja de campo
+    df["elo_home_expected"] = (1 / (10 ** (-(df["elo_diff"] + inputs["adv"]) / 400) + 1)).round(5)
+    return df
+
+
+# =========================
+# CHECKPOINTS
+# =========================
+def save_checkpoints(checkpoints: dict, final: np.ndarray, watermark, path: str = CHECKPOINT_FILE):
+    """Checkpoints anuales + estado final (ratings tras el último partido de `watermark`)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, date=checkpoints["date"].astype("datetime64[D]"), ratings=checkpoints["ratings"],
+             final=final, watermark=np.datetime64(watermark, "D"))
+    os.replace(tmp, path)
+
+
+def load_checkpoints(path: str = CHECKPOINT_FILE) -> dict:
+    with np.load(path) as z:
+        ckpt = {k: z[k] for k in z.files}
+    ckpt["watermark"] = pd.Timestamp(ckpt["watermark"].item())
+    return ckpt
+
+
+def checkpoint_before(ckpt: dict, date, n_teams: int) -> tuple[np.datetime64, np.ndarray]:
+    """Último checkpoint anual con fecha <= `date` (ratings ampliados a n_teams)."""
+    i = int(np.searchsorted(ckpt["date"], np.datetime64(date, "D"), side="right")) - 1
+    if i < 0:
+        return None, np.full(n_teams, INITIAL_RATING)
+    return ckpt["date"][i], grow(ckpt["ratings"][i], n_teams)
+
+
+def grow(ratings: np.ndarray, n_teams: int) -> np.ndarray:
+    out = np.full(max(n_teams, len(ratings)), INITIAL_RATING)
+    out[:len(ratings)] = ratings
+    return out
+
+
+def n_teams_of(df: pd.DataFrame) -> int:
+    return int(max(df["home_team_id"].max(), df["away_team_id"].max())) + 1 if len(df) else 0
+
+
+# =========================
+# EJECUCION
+# =========================
+def full_run(matches: pd.DataFrame) -> tuple[pd.DataFrame, np.ndarray, dict]:
+    inputs = match_inputs(matches.dropna(subset=["home_team_id", "away_team_id"]))
+    pre, final, ckpt = run_elo(inputs, np.full(n_teams_of(matches), INITIAL_RATING))
+    return elo_features(inputs, pre), final, ckpt
+
+
+def extend(matches: pd.DataFrame, old: pd.DataFrame, ckpt: dict, since) -> tuple[pd.DataFrame, np.ndarray, dict, str]:
+    """
+    Recorre solo los partidos desde `since` (primera fecha con partidos nuevos o cambiados).
+    Si no hay cambios antes de la marca de agua se sigue desde el estado final guardado; si
+    los hay, desde el último checkpoint anual <= `since`. `matches` puede venir filtrada
+    desde esa fecha (read_table(since=...)). Devuelve además desde dónde se retomó.
+    """
+    n_teams = n_teams_of(matches)
+    resume = resume_after_watermark(matches, old, ckpt, since)
+    if resume is not None:
+        done, todo = resume
+        ratings, keep = grow(ckpt["final"], n_teams), np.ones(len(ckpt["date"]), dtype=bool)
+        origin = f"el estado final ({ckpt['watermark'].date()})"
+    else:
+        start, ratings = checkpoint_before(ckpt, since, n_teams)
+        if start is None:
+            return (*full_run(matches), "el inicio")
+        done, todo = old[old["date"] < pd.Timestamp(start)], matches[matches["date"] >= pd.Timestamp(start)]
+        keep, origin = ckpt["date"] < start, f"el checkpoint {start}"
+    inputs = match_inputs(todo.dropna(subset=["home_team_id", "away_team_id"]))
+    pre, final, new_ckpt = run_elo(inputs, ratings)
+
+    # Desde el estado final, el primer checkpoint de la pasada no es el de inicio de año si
+    # ese año ya tenía partidos procesados: se queda el guardado
+    if len(new_ckpt["date"]) and keep.any() and new_ckpt["date"][0] <= ckpt["date"][keep][-1]:
+        new_ckpt = {k: v[1:] for k, v in new_ckpt.items()}
+    features = pd.concat([done, elo_features(inputs, pre)], ignore_index=True)
+    n = len(final)
+    checkpoints = {
+        "date": np.concatenate([ckpt["date"][keep], new_ckpt["date"]]),
+        "ratings": np.vstack([np.array([grow(r, n) for r in ckpt["ratings"][keep]]).reshape(-1, n),
+                              new_ckpt["ratings"].reshape(-1, n)]),
+    }
+    return features, final, checkpoints, origin
+
+
+def resume_after_watermark(matches: pd.DataFrame, old: pd.DataFrame, ckpt: dict, since):
+    """
+    (features que se conservan, partidos a recorrer) si el estado final guardado sirve como
+    punto de partida: todo lo cambiado es posterior a la marca de agua, o del mismo día y
+    detrás de los partidos de ese día ya procesados (siguen todos, en el mismo orden). Si
+    no, None (hay que volver a un checkpoint).
+    """
+    watermark, since = ckpt["watermark"], pd.Timestamp(since)
+    if "final" not in ckpt or since < watermark:
+        return None
+    todo = matches[matches["date"] >= since]
+    if since > watermark:
+        return old[old["date"] < since], todo
+    day = old.loc[old["date"] == since, "match_id"].to_numpy()
+    same_day = todo[todo["date"] == since].dropna(subset=["home_team_id", "away_team_id"])
+    if not np.array_equal(match_inputs(same_day)["match_id"][:len(day)], day):
+        return None
+    return old[old["date"] <= since], todo[~todo["match_id"].isin(day)]
+
+
+def watermark_of(matches: pd.DataFrame):
+    played = matches.dropna(subset=["home_score", "away_score"])
+    return played["date"].max() if len(played) else matches["date"].min()
+
+
+class PartialHistory(ValueError):
+    """La tabla de partidos no empieza en el primer partido internacional (--since)."""
+
+
+def require_full_history(dates: pd.Series, what: str = "el Elo"):
+    first = dates.min()
+    if pd.notna(first) and first > pd.Timestamp(FIRST_MATCH_DATE):
+        raise PartialHistory(f"{IN_MATCHES} empieza el {first.date()} (¿pipeline con --since?): {what} "
+                         f"necesita el histórico completo desde {FIRST_MATCH_DATE}; regenerar sin --since")
+
+
+def main(update_from: str | None = None):
+    t0 = time.perf_counter()
+    try:
+        if update_from and os.path.exists(CHECKPOINT_FILE) and os.path.exists(OUT_FILE):
+            ckpt = load_checkpoints()
+            start, _ = checkpoint_before(ckpt, update_from, 0)
+            require_full_history(read_table(IN_MATCHES, ["date"])["date"])
+            matches = read_table(IN_MATCHES, MATCH_COLS, since=str(start) if start is not None else None)
+            t1 = time.perf_counter()
+            features, final, new_ckpt, origin = extend(matches, read_table(OUT_FILE), ckpt, update_from)
+            watermark = max(ckpt["watermark"], watermark_of(matches))
+            ckpt = new_ckpt
+            print(f"Retomado desde {origin} | partidos leídos: {len(matches)}")
+        else:
+            matches = read_table(IN_MATCHES, MATCH_COLS)
+            require_full_history(matches["date"])
+            t1 = time.perf_counter()
+            features, final, ckpt = full_run(matches)
+            watermark = watermark_of(matches)
+    except PartialHistory as e:
+        sys.exit(str(e))
+    t_run = time.perf_counter() - t1
+
+    save_checkpoints(ckpt, final, watermark)
+    write_table(features, OUT_FILE)
+    top = np.argsort(final)[::-1][:5]
+    print(f"OK -> {OUT_FILE} | partidos: {len(features)} | equipos: {len(final)} | checkpoints: {len(ckpt['date'])}")
+    print(f"Pasada Elo: {t_run * 1000:.0f} ms | total: {time.perf_counter() - t0:.2f}s")
+    print("Top 5 (team_id: rating):", ", ".join(f"{i}: {final[i]:.0f}" for i in top))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rating Elo sobre el histórico completo (features previas al partido)")
+    parser.add_argument("--update-from", metavar="AAAA-MM-DD",
+                        help="Recalcular desde esta fecha: desde el estado final si es posterior a la marca de agua, "
+                             "si no desde el último checkpoint anual anterior (por defecto: todo)")
+    main(parser.parse_args().update_from)
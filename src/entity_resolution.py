@@ -0,0 +1,161 @@
+import numpy as np
+import pandas as pd
+from match_id import base_match_ids, base_of, resequence
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Un partido de 2021+ puede estar en Kaggle y en API-Football. Candidatos: misma pareja de
+# equipos (en cualquier orientación) con fecha a ±1 día (API da la fecha en UTC).
+DAY_WINDOW = 1
+
+# Pesos del score de un candidato (máximo 1.0)
+W_DATE = 0.4        # misma fecha: 1, a ±1 día: 0.5
+W_ORIENT = 0.2      # misma orientación home/away: 1, invertida: 0.5
+W_GOALS = 0.4       # mismo marcador: 1, sin marcador en API: 0.5, distinto: 0
+
+# Columnas que solo trae API-Football y que el registro canónico hereda al fusionar
+API_COLS = ["fixture_id", "league_id", "season"]
+
+KAGGLE, API = "kaggle", "api_football"
+
+
+def candidate_pairs(kaggle: pd.DataFrame, api: pd.DataFrame, day_window: int = DAY_WINDOW) -> pd.DataFrame:
+    """
+    Blocking por match_id base: para cada partido API se generan 2 * (2 * day_window + 1)
+    llaves (fecha ± días, orientación normal e invertida) y se buscan con searchsorted en las
+    llaves Kaggle ordenadas. Coste O((n + m) log n), sin producto cartesiano.
+    """
+    k_base = base_of(kaggle["match_id"])
+    order = np.argsort(k_base, kind="stable")
+    k_sorted = k_base[order]
+
+    dates = pd.to_datetime(api["date"])
+    home = api["home_team_id"].to_numpy(dtype=np.int64)
+    away = api["away_team_id"].to_numpy(dtype=np.int64)
+    api_pos = np.arange(len(api))
+
+    parts = []
+    for dd in range(-day_window, day_window + 1):
+        d = dates + pd.Timedelta(days=dd)
+        for swapped, (h, a) in ((False, (home, away)), (True, (away, home))):
+            keys = base_match_ids(d, h, a)
+            lo = np.searchsorted(k_sorted, keys, side="left")
+            hi = np.searchsorted(k_sorted, keys, side="right")
+            n = hi - lo
+            if not n.any():
+                continue
+            rep = np.repeat(api_pos, n)
+            offs = np.arange(n.sum()) - np.repeat(np.cumsum(n) - n, n)
+            parts.append(pd.DataFrame({
+                "api_pos": rep,
+                "k_pos": order[np.repeat(lo, n) + offs],
+                "day_diff": dd,
+                "swapped": swapped,
+            }))
+
+    if not parts:
+        return pd.DataFrame(columns=["api_pos", "k_pos", "day_diff", "swapped"])
+    return pd.concat(parts, ignore_index=True)
+
+
+def score_pairs(pairs: pd.DataFrame, kaggle: pd.DataFrame, api: pd.DataFrame) -> pd.DataFrame:
+    kh = kaggle["home_score"].to_numpy(dtype=float)[pairs["k_pos"]]
+    ka = kaggle["away_score"].to_numpy(dtype=float)[pairs["k_pos"]]
+    ah = api["home_score"].to_numpy(dtype=float)[pairs["api_pos"]]
+    aa = api["away_score"].to_numpy(dtype=float)[pairs["api_pos"]]
+
+    # Con orientación invertida se compara el marcador también invertido
+    swapped = pairs["swapped"].to_numpy()
+    ah, aa = np.where(swapped, aa, ah), np.where(swapped, ah, aa)
+
+    no_score = np.isnan(ah) | np.isnan(aa)
+    same_score = (ah == kh) & (aa == ka)
+
+    pairs = pairs.copy()
+    pairs["goals_agree"] = np.where(no_score, np.nan, same_score.astype(float))
+    pairs["score"] = (
+        W_DATE * np.where(pairs["day_diff"] == 0, 1.0, 0.5)
+        + W_ORIENT * np.where(swapped, 0.5, 1.0)
+        + W_GOALS * np.where(no_score, 0.5, same_score.astype(float))
+    )
+    return pairs
+
+
+def best_matches(pairs: pd.DataFrame) -> pd.DataFrame:
+    """Asignación 1 a 1, voraz por score: cada partido (de cualquiera de las fuentes) se usa una vez."""
+    pairs = pairs.sort_values(["score", "api_pos", "k_pos"], ascending=[False, True, True], kind="stable")
+    chosen, used_api, used_k = [], set(), set()
+    for row in pairs.itertuples(index=False):
+        if row.api_pos in used_api or row.k_pos in used_k:
+            continue
+        used_api.add(row.api_pos)
+        used_k.add(row.k_pos)
+        chosen.append(row)
+    return pd.DataFrame(chosen, columns=pairs.columns)
+
+
+def score_text(df: pd.DataFrame) -> np.ndarray:
+    # "2-1" (nulo si falta el marcador)
+    return (df["home_score"].astype("Int64").astype("string") + "-"
+            + df["away_score"].astype("Int64").astype("string")).to_numpy()
+
+
+def resolve_sources(kaggle: pd.DataFrame, api: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Une Kaggle y API-Football con un único registro por partido.
+    - merged: mismo partido y marcador compatible -> registro Kaggle + columnas API
+    - conflict: mismo partido y marcador distinto -> se conserva el registro Kaggle
+    - unmatched: partido solo en API -> se añade tal cual
+    Devuelve (tabla final, reporte con una fila por partido API).
+    """
+    pairs = candidate_pairs(kaggle, api)
+    best = best_matches(score_pairs(pairs, kaggle, api)) if len(pairs) else pairs
+
+    k = kaggle.copy()
+    for c in API_COLS:
+        if c not in k.columns:
+            k[c] = np.nan
+    k["sources"] = KAGGLE
+    k["resolution"] = pd.NA
+
+    conflict = best["goals_agree"].eq(0).to_numpy() if len(best) else np.array([], dtype=bool)
+    k_pos = best["k_pos"].to_numpy(dtype=int) if len(best) else np.array([], dtype=int)
+    a_pos = best["api_pos"].to_numpy(dtype=int) if len(best) else np.array([], dtype=int)
+
+    for c in API_COLS:
+        k.iloc[k_pos, k.columns.get_loc(c)] = api[c].to_numpy()[a_pos]
+    k.iloc[k_pos, k.columns.get_loc("sources")] = f"{KAGGLE}+{API}"
+    k.iloc[k_pos, k.columns.get_loc("resolution")] = np.where(conflict, "conflict", "merged")
+
+    matched = np.zeros(len(api), dtype=bool)
+    matched[a_pos] = True
+    a = api[~matched].copy()
+    a["sources"] = API
+    a["resolution"] = "unmatched"
+
+    final = pd.concat([k, a], ignore_index=True)
+    # Un fixture API sin pareja puede compartir llave con un partido Kaggle: secuencia
+    # después de los Kaggle (sus IDs no cambian, van primero)
+    final["match_id"] = resequence(final["match_id"])
+
+    # Reporte: una fila por partido API
+    report = pd.DataFrame({
+        "fixture_id": api["fixture_id"].to_numpy(),
+        "api_date": pd.to_datetime(api["date"]).to_numpy(),
+        "api_home_team": api["home_team"].to_numpy(),
+        "api_away_team": api["away_team"].to_numpy(),
+        "api_score": score_text(api),
+        "resolution": "unmatched",
+    })
+    if len(best):
+        report.loc[a_pos, "resolution"] = np.where(conflict, "conflict", "merged")
+        report.loc[a_pos, "kaggle_match_key"] = kaggle["match_key"].to_numpy()[k_pos]
+        report.loc[a_pos, "kaggle_home_team"] = kaggle["home_team"].to_numpy()[k_pos]
+        report.loc[a_pos, "kaggle_away_team"] = kaggle["away_team"].to_numpy()[k_pos]
+        report.loc[a_pos, "kaggle_score"] = score_text(kaggle)[k_pos]
+        report.loc[a_pos, "day_diff"] = best["day_diff"].to_numpy()
+        report.loc[a_pos, "swapped"] = best["swapped"].to_numpy()
+        report.loc[a_pos, "score"] = best["score"].to_numpy()
+    return final, report
@@ -0,0 +1,240 @@
+import os
+import sys
+import time
+import argparse
+import importlib.util
+import numpy as np
+import pandas as pd
+from storage import read_table, write_table
+
+
+# =========================
+# CONFIGURACION
+# =========================
+IN_MATCHES = "data/curated/matches_final_curated.csv"
+OUT_DIR = "data_to_model"
+OUT_FILE = os.path.join(OUT_DIR, "06_datos_features_1993.csv")
+OUT_FILE_FULL = os.path.join(OUT_DIR, "06_datos_features_full.csv")
+
+# Salida de referencia generada en R (mismas reglas: ventana desde 1993, lag de 1 partido)
+R_FEATURES_RDS = os.path.join(OUT_DIR, "06_datos_features_1993.rds")
+
+SINCE = "1993-01-01"   # inicio del ranking FIFA moderno
+WINDOWS = (5, 10)
+DIFF_WINDOW = 5
+
+# Métricas por equipo y partido: (columna long, sufijo de la feature)
+METRICS = [("gf", "gf"), ("ga", "ga"), ("win", "winrate"), ("pts", "pts")]
+
+# Diferencias home - away (las tres primeras son las del script de R)
+DIFFS = [("gf", "form_gf_diff"), ("ga", "form_ga_diff"), ("winrate", "form_win_diff"), ("pts", "form_pts_diff")]
+
+
+# =========================
+# FORMATO LARGO (una fila por equipo y partido)
+# =========================
+def team_long(df: pd.DataFrame, home_col: str, away_col: str) -> dict:
+    """
+    Apila la vista home y la vista away de cada partido y las ordena por
+    (equipo, fecha, home antes que away, orden de fila). El desempate es el mismo
+    que el de bind_rows(home, away) + arrange(team, date) del script de R.
+    """
+    n = len(df)
+    team_codes, _ = pd.factorize(pd.concat([df[home_col], df[away_col]], ignore_index=True))
+    date = pd.to_datetime(df["date"]).to_numpy(dtype="datetime64[D]").astype(np.int64)
+    hs = df["home_score"].to_numpy(dtype=float)
+    as_ = df["away_score"].to_numpy(dtype=float)
+
+    # Resultado: match_outcome (1/0/-1) si existe; NaN cuenta como partido sin resultado
+    if "match_outcome" in df.columns:
+        outcome = pd.to_numeric(df["match_outcome"], errors="coerce").to_numpy(dtype=float)
+    else:
+        outcome = np.sign(hs - as_)
+
+    side = np.repeat(np.array([0, 1], dtype=np.int8), n)
+    row = np.tile(np.arange(n), 2)
+    sign = np.repeat(np.array([1.0, -1.0]), n)
+    with np.errstate(invalid="ignore"):
+        res = np.concatenate([outcome, outcome]) * sign
+
+    order = np.lexsort((row, side, np.concatenate([date, date]), team_codes))
+    return {
+        "team": team_codes[order],
+        "side": side[order],
+        "row": row[order],
+        "gf": np.concatenate([hs, as_])[order],
+        "ga": np.concatenate([as_, hs])[order],
+        "win": np.where(np.isnan(res), np.nan, (res == 1).astype(float))[order],
+        "pts": np.select([res == 1, res == 0], [3.0, 1.0], np.where(np.isnan(res), np.nan, 0.0))[order],
+    }
+
+
+def group_starts(team: np.ndarray) -> np.ndarray:
+    """Índice de la primera fila del equipo para cada fila (array ordenado por equipo)."""
+    idx = np.arange(len(team))
+    is_start = np.ones(len(team), dtype=bool)
+    is_start[1:] = team[1:] != team[:-1]
+    return np.maximum.accumulate(np.where(is_start, idx, 0))
+
+
+def lagged_rolling_mean(values: np.ndarray, starts: np.ndarray, window: int) -> np.ndarray:
+    """
+    Media de los `window` partidos anteriores del mismo equipo (sin el actual), con
+    sumas acumuladas: O(n) y sin groupby.apply. Igual que en R, los NaN se ignoran y
+    la media no existe hasta que el equipo acumula window-1 partidos previos.
+    """
+    valid = ~np.isnan(values)
+    cs = np.concatenate([[0.0], np.cumsum(np.where(valid, values, 0.0))])
+    cn = np.concatenate([[0], np.cumsum(valid)])
+
+    i = np.arange(len(values))
+    lo = np.maximum(starts, i - window)
+    total = cs[i] - cs[lo]
+    count = cn[i] - cn[lo]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = total / count
+    out[(count == 0) | (i - starts < window - 1)] = np.nan
+    return out
+
+
+# =========================
+# FEATURES
+# =========================
+def add_form_features(df: pd.DataFrame, home_col: str = "home_team", away_col: str = "away_team",
+                      windows: tuple = WINDOWS) -> pd.DataFrame:
+    """
+    Añade home/away_last{w}_gf, _ga, _winrate, _pts (media de los últimos w partidos,
+    con lag) y las diferencias form_*_diff_5. El orden de las filas no cambia.
+    """
+    long = team_long(df, home_col, away_col)
+    starts = group_starts(long["team"])
+    home = long["side"] == 0
+
+    out = df.copy()
+    n = len(df)
+    for w in windows:
+        for metric, suffix in METRICS:
+            vals = lagged_rolling_mean(long[metric], starts, w)
+            for side, mask in (("home", home), ("away", ~home)):
+                col = np.empty(n)
+                col[long["row"][mask]] = vals[mask]
+                out[f"{side}_last{w}_{suffix}"] = col
+
+    for suffix, name in DIFFS:
+        out[f"{name}_{DIFF_WINDOW}"] = out[f"home_last{DIFF_WINDOW}_{suffix}"] - out[f"away_last{DIFF_WINDOW}_{suffix}"]
+    return out
+
+
+def refresh_form_features(df: pd.DataFrame, teams, since, home_col: str = "home_team",
+                          away_col: str = "away_team", windows: tuple = WINDOWS) -> tuple[pd.DataFrame, int]:
+    """
+    Recalcula las features solo donde pueden haber cambiado: partidos de `teams` con
+    fecha >= `since`. El cálculo usa esas filas más los últimos max(windows) partidos
+    previos de cada equipo, así que el coste depende del lote nuevo y no del histórico.
+    Devuelve (df actualizado, nº de filas recalculadas).
+    """
+    dates = pd.to_datetime(df["date"]).to_numpy()
+    since = np.datetime64(pd.Timestamp(since))
+    in_home = df[home_col].isin(teams).to_numpy()
+    in_away = df[away_col].isin(teams).to_numpy()
+    zone = (dates >= since) & (in_home | in_away)
+
+    # Contexto: últimos partidos de cada equipo afectado antes de `since`
+    pos = np.arange(len(df))
+    prev = dates < since
+    ctx = pd.DataFrame({
+        "team": np.concatenate([df[home_col].to_numpy()[prev & in_home], df[away_col].to_numpy()[prev & in_away]]),
+        "date": np.concatenate([dates[prev & in_home], dates[prev & in_away]]),
+        "side": np.repeat([0, 1], [(prev & in_home).sum(), (prev & in_away).sum()]),
+        "row": np.concatenate([pos[prev & in_home], pos[prev & in_away]]),
+    }).sort_values(["date", "side", "row"]).groupby("team").tail(max(windows))
+
+    rows = np.union1d(pos[zone], ctx["row"].to_numpy())
+    sub = add_form_features(df.iloc[rows], home_col, away_col, windows)
+
+    out = df.copy()
+    sub_zone = zone[rows]
+    cols = {c: out.columns.get_loc(c) for c in feature_columns(windows)}
+    for side, mask in (("home", in_home), ("away", in_away)):
+        upd = sub_zone & mask[rows]
+        for c, j in cols.items():
+            if c.startswith(f"{side}_"):
+                out.iloc[rows[upd], j] = sub[c].to_numpy()[upd]
+
+    for suffix, name in DIFFS:
+        c = f"{name}_{DIFF_WINDOW}"
+        out.loc[zone, c] = out.loc[zone, f"home_last{DIFF_WINDOW}_{suffix}"] - out.loc[zone, f"away_last{DIFF_WINDOW}_{suffix}"]
+    return out, int(zone.sum())
+
+
+def feature_columns(windows: tuple = WINDOWS) -> list[str]:
+    cols = [f"{side}_last{w}_{suffix}" for side in ("home", "away") for w in windows for _, suffix in METRICS]
+    return cols + [f"{name}_{DIFF_WINDOW}" for _, name in DIFFS]
+
+
+# =========================
+# PARIDAD CON R
+# =========================
+def check_r_parity(path: str = R_FEATURES_RDS, atol: float = 1e-6) -> bool:
+    """
+    Recalcula las features sobre las filas de la salida de R (06_datos_features_1993.rds)
+    y compara columna a columna. Necesita pyreadr.
+    """
+    if importlib.util.find_spec("pyreadr") is None:
+        sys.exit("pyreadr no está instalado: no se puede leer la salida .rds de R.")
+    import pyreadr
+
+    ref = next(iter(pyreadr.read_r(path).values()))
+    r_cols = [c for c in feature_columns() if c in ref.columns]
+    base = ref.drop(columns=r_cols)
+
+    t0 = time.perf_counter()
+    py = add_form_features(base)
+    elapsed = time.perf_counter() - t0
+
+    ok = True
+    print(f"Paridad con R: {path} | filas: {len(ref)} | columnas comparadas: {len(r_cols)} | {elapsed:.3f}s")
+    for c in r_cols:
+        a, b = ref[c].to_numpy(dtype=float), py[c].to_numpy(dtype=float)
+        bad = ~np.isclose(a, b, atol=atol, rtol=0, equal_nan=True)
+        if bad.any():
+            ok = False
+            print(f"  [DIFF] {c}: {bad.sum()} filas | ej. match_key {ref.loc[bad, 'match_key'].head(3).tolist()}")
+    print("OK: features idénticas a las de R" if ok else "ERROR: hay diferencias con R")
+    return ok
+
+
+# =========================
+# MAIN
+# =========================
+def main(since: str | None = SINCE):
+    os.makedirs(OUT_DIR, exist_ok=True)
+
+    # Ventana temporal del modelo (las features solo ven partidos dentro de la ventana, como
+    # en R): el filtro se aplica al leer
+    df = read_table(IN_MATCHES, since=since).reset_index(drop=True)
+    print(f"Partidos desde {since}:" if since else "Partidos curados:", len(df))
+
+    # Con el registro de equipos, la clave es el team_id (alias y nombres históricos resueltos)
+    keys = ("home_team_id", "away_team_id") if "home_team_id" in df.columns else ("home_team", "away_team")
+
+    t0 = time.perf_counter()
+    out = add_form_features(df, *keys)
+    print(f"Features de forma ({', '.join(map(str, WINDOWS))} partidos) en {time.perf_counter() - t0:.3f}s")
+
+    out_file = OUT_FILE if since else OUT_FILE_FULL
+    write_table(out, out_file)
+    print("OK ->", out_file, "| filas:", len(out), "| columnas:", out.shape[1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--since", default=SINCE, help="Fecha de inicio de la ventana (por defecto 1993-01-01)")
+    parser.add_argument("--full-history", action="store_true", help="Calcular sobre todo el histórico (sin filtro de fecha)")
+    parser.add_argument("--check-r", action="store_true", help="Comparar con la salida de R (06_datos_features_1993.rds)")
+    args = parser.parse_args()
+
+    if args.check_r:
+        sys.exit(0 if check_r_parity() else 1)
+    main(since=None if args.full_history else args.since)
@@ -1,23 +1,48 @@
 import os
-import pandas as pd
+import argparse
+from entity_resolution import resolve_sources
+from storage import WINDOW_SINCE, read_table, write_table
+
+IN_KAGGLE = "data/curated/kaggle_matches_with_ranking.csv"
+IN_API = "data/curated/api_matches_with_ranking.csv"
 
 OUT_DIR = "data/curated"
 OUT_FILE = os.path.join(OUT_DIR, "matches_final_curated.csv")
+OUT_REPORT = os.path.join(OUT_DIR, "matches_resolution_report.csv")
+
+
+def main(since: str | None = None):
+    os.makedirs(OUT_DIR, exist_ok=True)
+
+    k = read_table(IN_KAGGLE, since=since)
+    a = read_table(IN_API, since=since)
+
+    # Asegurar columna source
+    if "source" not in k.columns:
+        k["source"] = "kaggle"
+    if "source" not in a.columns:
+        a["source"] = "api_football"
 
-os.makedirs(OUT_DIR, exist_ok=True)
+    # Un único registro por partido: los fixtures de API que ya están en Kaggle se fusionan
+    final, report = resolve_sources(k, a)
 
-k = pd.read_csv("data/curated/kaggle_matches_with_ranking.csv", parse_dates=["date"])
-a = pd.read_csv("data/curated/api_matches_with_ranking.csv", parse_dates=["date"])
+    print("=== RESOLUCION KAGGLE <-> API ===")
+    print(report["resolution"].value_counts().to_string())
+    conflicts = report[report["resolution"] == "conflict"]
+    if len(conflicts):
+        print("\nConflictos (se conserva el marcador de Kaggle):")
+        print(conflicts[["api_date", "api_home_team", "api_away_team", "api_score",
+                         "kaggle_home_team", "kaggle_away_team", "kaggle_score"]].head(20))
 
-# Asegurar columna source
-if "source" not in k.columns:
-    k["source"] = "kaggle"
-if "source" not in a.columns:
-    a["source"] = "api_football"
+    write_table(report, OUT_REPORT)
+    write_table(final, OUT_FILE)
+    print("\nOK ->", OUT_FILE, "| filas:", len(final), "| concat sin resolver:", len(k) + len(a))
+    print(final["source"].value_counts())
+    print("Rango fechas:", final["date"].min(), "->", final["date"].max())
 
-final = pd.concat([k, a], ignore_index=True)
 
-final.to_csv(OUT_FILE, index=False, encoding="utf-8")
-print("OK ->", OUT_FILE, "| filas:", len(final))
-print(final["source"].value_counts())
-print("Rango fechas:", final["date"].min(), "->", final["date"].max())
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--since", default=WINDOW_SINCE,
+                        help="Solo partidos desde esta fecha (por defecto TFM_SINCE o histórico completo)")
+    main(since=parser.parse_args().since)
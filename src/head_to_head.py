@@ -0,0 +1,244 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from elo import PartialHistory, require_full_history
+from storage import read_table, write_table
+from team_registry import TeamRegistry
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Índice de enfrentamientos directos: una fila por partido jugado, ordenada por pareja de
+# equipos (team_id menor, team_id mayor) y fecha, con los conteos acumulados de la pareja
+# hasta ese partido incluido. Consultar una pareja en una fecha es una búsqueda binaria
+# (se toma la última fila anterior a esa fecha), sin filtrar el histórico.
+IN_MATCHES = "data/curated/matches_final_curated.csv"
+INDEX_FILE = "data/curated/h2h_index.csv"
+OUT_FILE = "data_to_model/06_h2h_features.csv"
+
+MATCH_COLS = ["date", "home_team_id", "away_team_id", "home_score", "away_score", "match_id"]
+
+# Conteos acumulados desde el punto de vista de team_a (el de team_id menor)
+COUNTS = ["n", "a_wins", "draws", "b_wins", "a_goals", "b_goals"]
+FEATURES = ["h2h_matches", "h2h_home_wins", "h2h_draws", "h2h_away_wins", "h2h_home_goals", "h2h_away_goals"]
+
+# Llave de búsqueda: pareja (16 + 16 bits) y día (20 bits, desplazado para fechas < 1970)
+TEAM_BITS = 16
+DAY_BITS = 20
+DAY_OFFSET = 1 << (DAY_BITS - 1)
+
+
+def pair_keys(a: np.ndarray, b: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(llave de la pareja ordenada, team_a, ¿a es el primero de la pareja?)."""
+    a, b = np.asarray(a, dtype=np.int64), np.asarray(b, dtype=np.int64)
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    return (lo << TEAM_BITS) | hi, lo, a == lo
+
+
+def search_keys(pair: np.ndarray, dates) -> np.ndarray:
+    days = pd.to_datetime(pd.Series(dates)).to_numpy(dtype="datetime64[D]").astype(np.int64)
+    return (pair << DAY_BITS) | (days + DAY_OFFSET)
+
+
+# =========================
+# CONSTRUCCION (una pasada ordenada)
+# =========================
+def played_matches(matches: pd.DataFrame) -> pd.DataFrame:
+    return matches.dropna(subset=["home_team_id", "away_team_id", "home_score", "away_score"])
+
+
+def match_counts(df: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Llave de pareja, team_a y la contribución de cada partido a los conteos de la pareja."""
+    pair, team_a, home_is_a = pair_keys(df["home_team_id"].to_numpy(dtype=np.int64),
+                                        df["away_team_id"].to_numpy(dtype=np.int64))
+    hs = df["home_score"].to_numpy(dtype=float)
+    as_ = df["away_score"].to_numpy(dtype=float)
+    ga, gb = np.where(home_is_a, hs, as_), np.where(home_is_a, as_, hs)
+    delta = np.column_stack([np.ones(len(df)), ga > gb, ga == gb, ga < gb, ga, gb]).astype(np.int64)
+    return pair, team_a, delta
+
+
+def index_frame(pair, team_a, dates, match_id, cum) -> pd.DataFrame:
+    out = pd.DataFrame({
+        "pair_key": pair,
+        "team_a": team_a.astype("int32"),
+        "team_b": (pair & ((1 << TEAM_BITS) - 1)).astype("int32"),
+        "date": pd.to_datetime(pd.Series(dates)).to_numpy(),
+        "match_id": match_id,
+    })
+    for j, c in enumerate(COUNTS):
+        out[c] = cum[:, j].astype("int32")
+    return out
+
+
+def cumulative_by_pair(pair: np.ndarray, days: np.ndarray, delta: np.ndarray,
+                       base: np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Ordena por (pareja, fecha, orden de llegada) y acumula dentro de cada pareja con una
+    suma acumulada global menos la del inicio del grupo. `base` suma a cada fila los
+    conteos previos de su pareja (extensión incremental).
+    """
+    order = np.lexsort((np.arange(len(pair)), days, pair))
+    pair_s, delta_s = pair[order], delta[order]
+    cs = np.cumsum(delta_s, axis=0)
+    starts = np.ones(len(pair_s), dtype=bool)
+    starts[1:] = pair_s[1:] != pair_s[:-1]
+    first = np.maximum.accumulate(np.where(starts, np.arange(len(pair_s)), 0))
+    cum = cs - cs[first] + delta_s[first]
+    if base is not None:
+        cum += base[order]
+    return order, cum
+
+
+def build_index(matches: pd.DataFrame) -> pd.DataFrame:
+    df = played_matches(matches)
+    pair, team_a, delta = match_counts(df)
+    days = df["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+    order, cum = cumulative_by_pair(pair, days, delta)
+    return index_frame(pair[order], team_a[order], df["date"].to_numpy()[order],
+                       df["match_id"].to_numpy(dtype=np.int64)[order], cum)
+
+
+# =========================
+# CONSULTAS
+# =========================
+class HeadToHead:
+    """Índice cargado en arrays: query() es una búsqueda binaria por (pareja, fecha)."""
+
+    def __init__(self, index: pd.DataFrame):
+        self.index = index.reset_index(drop=True)
+        self.pair = self.index["pair_key"].to_numpy(dtype=np.int64)
+        self.keys = search_keys(self.pair, self.index["date"])
+        self.counts = self.index[COUNTS].to_numpy(dtype=np.int64)
+
+    @classmethod
+    def load(cls, path: str = INDEX_FILE) -> "HeadToHead":
+        return cls(read_table(path))
+
+    @property
+    def watermark(self) -> pd.Timestamp | None:
+        return self.index["date"].max() if len(self.index) else None
+
+    def lookup(self, pair: np.ndarray, dates) -> np.ndarray:
+        """Conteos acumulados (desde team_a) de cada pareja con los partidos anteriores a `dates`."""
+        pos = np.searchsorted(self.keys, search_keys(pair, dates), side="left") - 1
+        hit = (pos >= 0) & (self.pair[np.maximum(pos, 0)] == pair)
+        return np.where(hit[:, None], self.counts[np.maximum(pos, 0)], 0)
+
+    def query(self, team, opponent, dates) -> pd.DataFrame:
+        """
+        Historial de `team` contra `opponent` antes de cada fecha (sin incluirla), desde
+        el punto de vista de `team`: partidos, victorias, empates, derrotas, goles.
+        """
+        pair, _, team_is_a = pair_keys(team, opponent)
+        c = self.lookup(pair, dates)
+        wins = np.where(team_is_a, c[:, 1], c[:, 3])
+        losses = np.where(team_is_a, c[:, 3], c[:, 1])
+        gf = np.where(team_is_a, c[:, 4], c[:, 5])
+        ga = np.where(team_is_a, c[:, 5], c[:, 4])
+        return pd.DataFrame({"matches": c[:, 0], "wins": wins, "draws": c[:, 2], "losses": losses,
+                             "goals_for": gf, "goals_against": ga})
+
+    def features(self, matches: pd.DataFrame) -> pd.DataFrame:
+        """Features h2h de cada partido (local contra visitante, solo fechas anteriores): sin fuga."""
+        ok = matches["home_team_id"].notna() & matches["away_team_id"].notna()
+        home = matches["home_team_id"].fillna(0).to_numpy(dtype=np.int64)
+        away = matches["away_team_id"].fillna(0).to_numpy(dtype=np.int64)
+        q = self.query(home, away, matches["date"])
+        out = pd.DataFrame({"match_id": matches["match_id"].to_numpy(dtype=np.int64)})
+        for name, col in zip(FEATURES, ["matches", "wins", "draws", "losses", "goals_for", "goals_against"]):
+            out[name] = pd.Series(q[col].to_numpy(), dtype="Int32").where(ok.to_numpy())
+        return out
+
+    # ---------- actualización ----------
+    def extend(self, matches: pd.DataFrame) -> int:
+        """
+        Añade partidos jugados desde la marca de agua: cada pareja sigue desde su última
+        fila (lookup al final de los tiempos), sin recorrer el histórico. Los del día de la
+        marca de agua que ya están en el índice (mismo match_id) se ignoran; los que llegan
+        tarde ese día se añaden (las consultas solo ven días anteriores, el orden dentro del
+        día no importa). Partidos anteriores a la marca de agua: ValueError (hay que
+        reconstruir).
+        """
+        df = played_matches(matches)
+        if self.watermark is not None:
+            on_day = df["date"] == self.watermark
+            known = self.index.loc[self.index["date"] == self.watermark, "match_id"]
+            df = df[~(on_day & df["match_id"].isin(known))]
+            if (df["date"] < self.watermark).any():
+                raise ValueError(f"hay partidos con fecha < marca de agua ({self.watermark.date()})")
+        if df.empty:
+            return 0
+        pair, team_a, delta = match_counts(df)
+        base = self.lookup(pair, np.full(len(df), np.datetime64("2200-01-01")))
+        days = df["date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+        order, cum = cumulative_by_pair(pair, days, delta, base)
+        new = index_frame(pair[order], team_a[order], df["date"].to_numpy()[order],
+                          df["match_id"].to_numpy(dtype=np.int64)[order], cum)
+
+        # Las filas nuevas son posteriores a todas las de su pareja: basta una mezcla estable
+        index = pd.concat([self.index, new], ignore_index=True)
+        index = index.iloc[np.argsort(index["pair_key"].to_numpy(), kind="stable")]
+        self.__init__(index)
+        return len(df)
+
+
+def main(update: bool = False):
+    # El historial de una pareja empieza en su primer partido: con la tabla recortada por
+    # --since los conteos saldrían truncados
+    matches = read_table(IN_MATCHES, MATCH_COLS)
+    try:
+        require_full_history(matches["date"], "el índice h2h")
+    except PartialHistory as e:
+        sys.exit(str(e))
+
+    t0 = time.perf_counter()
+    h2h = None
+    if update and os.path.exists(INDEX_FILE):
+        h2h = HeadToHead.load()
+        watermark = h2h.watermark
+        try:
+            n_new = h2h.extend(matches[matches["date"] >= watermark] if watermark is not None else matches)
+            print("Partidos añadidos al índice:", n_new)
+        except ValueError as e:
+            print(f"No se puede actualizar en orden ({e}): se reconstruye")
+            h2h = None
+    if h2h is None:
+        h2h = HeadToHead(build_index(matches))
+    t_index = time.perf_counter() - t0
+
+    features = h2h.features(matches)
+    write_table(h2h.index, INDEX_FILE)
+    write_table(features, OUT_FILE)
+    print(f"OK -> {INDEX_FILE} | filas: {len(h2h.index)} | parejas: {h2h.index['pair_key'].nunique()} "
+          f"| {t_index * 1000:.0f} ms")
+    print(f"OK -> {OUT_FILE} | partidos: {len(features)} | con historial previo: {int((features['h2h_matches'] > 0).sum())}")
+
+
+def show_pair(team: str, opponent: str, date: str | None):
+    reg = TeamRegistry.load()
+    ids = reg.lookup(pd.Series([team, opponent]))
+    if ids.isna().any():
+        unknown = [n for n, i in zip((team, opponent), ids) if pd.isna(i)]
+        raise SystemExit(f"Equipo desconocido: {unknown}")
+    h2h = HeadToHead.load()
+    when = date or "2200-01-01"
+    row = h2h.query([int(ids[0])], [int(ids[1])], [when]).iloc[0]
+    print(f"{team} vs {opponent} (antes de {date or 'hoy'}): " + ", ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Índice de enfrentamientos directos por pareja de equipos")
+    parser.add_argument("--update", action="store_true",
+                        help="Añadir al índice existente solo los partidos posteriores a su marca de agua")
+    parser.add_argument("--pair", nargs=2, metavar=("EQUIPO", "RIVAL"), help="Consultar una pareja")
+    parser.add_argument("--date", help="Con --pair: historial anterior a esta fecha (por defecto todo)")
+    args = parser.parse_args()
+    if args.pair:
+        show_pair(*args.pair, args.date)
+    else:
+        main(args.update)
@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from email.utils import formatdate
+from urllib.parse import urlencode, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+
+# =========================
+# CONFIGURACION
+# =========================
+CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", "data/.http_cache")
+
+# off     -> sin caché (solo la sesión compartida); por defecto, los extractores
+#            se comportan igual que sin este módulo
+# normal  -> usa la caché si está fresca, revalida si está vencida
+# refresh -> revalida siempre contra el servidor (If-None-Match / If-Modified-Since)
+# replay  -> solo caché, sin red (CI / benchmarks); un miss es un error
+CACHE_MODE = os.environ.get("HTTP_CACHE_MODE", "off")
+MAX_CACHE_BYTES = int(float(os.environ.get("HTTP_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+# TTL por endpoint (substring de la URL -> segundos). El primero que coincide gana.
+ENDPOINT_TTL = [
+    ("/leagues", 7 * 24 * 3600),
+    ("/fixtures", 6 * 3600),
+    ("fifa-rankings", 24 * 3600),
+]
+DEFAULT_TTL = 3600
+
+POOL_SIZE = 16
+
+# Parámetros que nunca forman parte de la clave (credenciales)
+_KEY_EXCLUDED_PARAMS = {"x-apisports-key"}
+
+
+class CacheMiss(Exception):
+    """No hay respuesta en caché y el modo replay impide ir a la red."""
+
+
+# =========================
+# SESION COMPARTIDA
+# =========================
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session(pool_size: int = POOL_SIZE) -> requests.Session:
+    """
+    Sesión HTTP compartida por todos los extractores (api_get, fetch_html):
+    keep-alive + pool de conexiones.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+    return _session
+
+
+# =========================
+# RESPUESTA CACHEADA
+# =========================
+class CachedResponse:
+    """Subconjunto de requests.Response que usan los extractores."""
+
+    def __init__(self, status_code: int, headers: dict, content: bytes, from_cache: bool):
+        self.status_code = status_code
+        self.headers = CaseInsensitiveDict(headers)
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+def ttl_for(url: str) -> int:
+    for pattern, ttl in ENDPOINT_TTL:
+        if pattern in url:
+            return ttl
+    return DEFAULT_TTL
+
+
+def is_cacheable(content: bytes) -> bool:
+    """
+    Un 200 de API-Football puede traer el error en el cuerpo (`errors` no vacío, p.ej.
+    rateLimit): eso no se guarda. Los cuerpos que no son JSON (HTML) siempre se guardan.
+    """
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return True
+    return not (isinstance(data, dict) and data.get("errors"))
+
+
+def cache_key(url: str, params: dict | None = None) -> str:
+    items = sorted((str(k), str(v)) for k, v in (params or {}).items()
+                   if str(k).lower() not in _KEY_EXCLUDED_PARAMS)
+    full = f"{url}?{urlencode(items)}" if items else url
+    return hashlib.sha256(full.encode("utf-8")).hexdigest()
+
+
+# =========================
+# CACHE EN DISCO (indice SQLite + cuerpos en ficheros)
+# =========================
+class DiskCache:
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(cache_dir, "index.sqlite"), check_same_thread=False)
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT,
+                status INTEGER,
+                headers TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL,
+                last_access REAL,
+                size INTEGER
+            )
+        """)
+        self.db.commit()
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.body")
+
+    def get(self, key: str) -> dict | None:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT status, headers, etag, last_modified, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            path = self._body_path(key)
+            if not os.path.exists(path):
+                self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.db.commit()
+                return None
+            self.db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+        with open(path, "rb") as f:
+            content = f.read()
+        status, headers, etag, last_modified, stored_at = row
+        return {
+            "status": status,
+            "headers": json.loads(headers),
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": stored_at,
+            "content": content,
+        }
+
+    def put(self, key: str, url: str, status: int, headers: dict, content: bytes):
+        path = self._body_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp{threading.get_ident()}"
+        with open(tmp, "wb") as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+        now = time.time()
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, status, json.dumps(dict(headers)), headers.get("ETag"),
+                 headers.get("Last-Modified"), now, now, len(content)),
+            )
+            self.db.commit()
+            self._evict()
+
+    def touch(self, key: str):
+        # Revalidación 304: la entrada vuelve a estar fresca
+        with self.lock:
+            now = time.time()
+            self.db.execute("UPDATE entries SET stored_at = ?, last_access = ? WHERE key = ?", (now, now, key))
+            self.db.commit()
+
+    def _evict(self):
+        # LRU acotado por tamaño total (se llama con el lock tomado)
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self.db.execute("SELECT key, size FROM entries ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._body_path(key))
+            except FileNotFoundError:
+                pass
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+        self.db.commit()
+
+    def stats(self) -> dict:
+        with self.lock:
+            n, size = self.db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {"entries": n, "bytes": size, "max_bytes": self.max_bytes}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> DiskCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache()
+    return _cache
+
+
+# =========================
+# GET CON CACHE
+# =========================
+def cached_get(url: str, params: dict | None = None, headers: dict | None = None,
+               timeout: int = 60, ttl: int | None = None, mode: str | None = None,
+               before_request=None) -> CachedResponse:
+    """
+    GET a través de la sesión compartida y la caché en disco.
+    `before_request` se llama solo cuando se va a la red (p.ej. el token bucket de
+    datos_api), así las respuestas servidas desde caché no consumen cuota.
+    """
+    mode = mode or CACHE_MODE
+    session = get_session()
+
+    if mode == "off":
+        if before_request is not None:
+            before_request()
+        r = session.get(url, params=params, headers=headers, timeout=timeout)
+        return CachedResponse(r.status_code, dict(r.headers), r.content, from_cache=False)
+
+    cache = get_cache()
+    key = cache_key(url, params)
+    entry = cache.get(key)
+    ttl = ttl_for(url) if ttl is None else ttl
+
+    if mode == "replay":
+        if entry is None:
+            raise CacheMiss(f"Sin respuesta en caché (modo replay): {url} {params or ''}")
+        return CachedResponse(entry["status"], entry["headers"], entry["content"], from_cache=True)
+
+    if entry is not None and mode == "normal" and time.time() - entry["stored_at"] < ttl:
+        return CachedResponse(entry["status"], entry["headers"], entry["content"], from_cache=True)
+
+    # Revalidación condicional si tenemos validadores
+    req_headers = dict(headers or {})
+    if entry is not None:
+        if entry["etag"]:
+            req_headers["If-None-Match"] = entry["etag"]
+        if entry["last_modified"]:
+            req_headers["If-Modified-Since"] = entry["last_modified"]
+        elif not entry["etag"]:
+            req_headers["If-Modified-Since"] = formatdate(entry["stored_at"], usegmt=True)
+
+    if before_request is not None:
+        before_request()
+    r = session.get(url, params=params, headers=req_headers, timeout=timeout)
+
+    if r.status_code == 304 and entry is not None:
+        # Ha habido request: from_cache=False para que el llamador lea las cabeceras
+        # de rate limit del 304 (el cuerpo sí es el de la caché)
+        cache.touch(key)
+        merged = {**entry["headers"], **dict(r.headers)}
+        return CachedResponse(entry["status"], merged, entry["content"], from_cache=False)
+
+    if r.status_code == 200 and is_cacheable(r.content):
+        cache.put(key, url, r.status_code, dict(r.headers), r.content)
+    return CachedResponse(r.status_code, dict(r.headers), r.content, from_cache=False)
+
+
+if __name__ == "__main__":
+    print(f"Caché HTTP en {CACHE_DIR} | modo={CACHE_MODE}")
+    print(get_cache().stats())
+    print("Hosts:", sorted({urlparse(u).netloc for (u,) in get_cache().db.execute("SELECT url FROM entries")}))
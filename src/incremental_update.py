@@ -0,0 +1,327 @@
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import elo
+import head_to_head
+from entity_resolution import API, API_COLS, resolve_sources
+from features_form import OUT_FILE as FEATURES_FILE, SINCE, add_form_features, feature_columns, refresh_form_features
+from final_concat_kaggle_api import OUT_REPORT
+from integracion_datasets_k import add_match_outcome, aggregate_goalscorers, curate_matches, prepare_shootouts, strip_cols
+from process_kaggle import load_raw_csv
+from ranking_asof import (IN_RANKING_HISTORY, attach_ranking_asof, attach_team_ranking, load_ranking_history,
+                           ranking_with_team_ids)
+from storage import read_table, to_storage_dtypes, write_table
+from team_registry import TeamRegistry
+from team_state import OUT_FILE as STATE_FILE, STORE_FILE, TeamStateStore, attach_elo
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Actualización diaria: en lugar de reconstruir todo (process_kaggle -> joins -> ranking ->
+# concat -> features), se añaden solo los partidos Kaggle posteriores a la marca de agua
+# (última fecha Kaggle ya curada) y se recalculan las features de los equipos afectados.
+FINAL_FILE = "data/curated/matches_final_curated.csv"
+IN_API_WITH_RANKING = "data/curated/api_matches_with_ranking.csv"
+
+KAGGLE_SOURCE = "kaggle"
+
+# Columnas que añade la resolución Kaggle <-> API (entity_resolution.py)
+RESOLUTION_COLS = API_COLS + ["sources", "resolution"]
+
+
+class FullRebuildRequired(Exception):
+    """Los datos RAW no son un append limpio sobre lo ya curado: hay que usar src/pipeline.py."""
+
+
+def split_sources(df: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # final_concat_kaggle_api.py deja primero el bloque Kaggle y después el de API
+    is_kaggle = (df["source"] == KAGGLE_SOURCE).to_numpy()
+    return df[is_kaggle], df[~is_kaggle]
+
+
+def curated_raw_rows(kaggle: pd.DataFrame) -> int:
+    """
+    Filas de results.csv ya curadas: la última posición en match_key + 1. Con --since el
+    bloque Kaggle empieza en la ventana, pero match_key conserva la posición en results.
+    """
+    if kaggle.empty:
+        return 0
+    return int(kaggle["match_key"].astype(str).str.rsplit("|", n=1).str[1].astype(int).max()) + 1
+
+
+def new_raw_rows(n_curated: int, watermark: pd.Timestamp) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Filas RAW (results, shootouts, goalscorers) posteriores a la marca de agua.
+    Los partidos nuevos deben estar al final de results.csv: su posición forma parte
+    del match_key y tiene que coincidir con la de una reconstrucción completa.
+    `n_curated` es curated_raw_rows() del bloque Kaggle.
+    """
+    results = load_raw_csv("results")
+    new = results[results["date"] > watermark]
+
+    if len(results) < n_curated or not new.index.equals(pd.RangeIndex(n_curated, len(results))):
+        raise FullRebuildRequired(
+            f"results.csv tiene {len(results)} filas, {n_curated} ya curadas y {len(new)} posteriores a "
+            f"{watermark.date()}: no es un append al final"
+        )
+
+    shoot = load_raw_csv("shootouts")
+    goals = load_raw_csv("goalscorers")
+    return new.copy(), shoot[shoot["date"] > watermark].copy(), goals[goals["date"] > watermark].copy()
+
+
+def load_api_rows() -> pd.DataFrame:
+    # Igual que final_concat_kaggle_api.py
+    api = read_table(IN_API_WITH_RANKING)
+    if "source" not in api.columns:
+        api["source"] = API
+    return api
+
+
+def row_keys(df: pd.DataFrame) -> pd.Index:
+    """Identidad estable de cada fila: match_key (Kaggle) o fixture_id (solo API)."""
+    api_key = "api:" + df["fixture_id"].astype("Int64").astype("string")
+    return pd.Index(df["match_key"].astype("string").where(df["source"] == KAGGLE_SOURCE, api_key))
+
+
+def build_kaggle_rows(results: pd.DataFrame, shoot: pd.DataFrame, goals: pd.DataFrame,
+                      reg: TeamRegistry, rank: pd.DataFrame) -> pd.DataFrame:
+    """Mismo camino que integracion_datasets_k.py + integracion_datasets_k+FR.py, para cualquier lote."""
+    df = curate_matches(strip_cols(results, ["home_team", "away_team"]),
+                        prepare_shootouts(shoot, reg), aggregate_goalscorers(goals, reg), reg)
+    df = add_match_outcome(attach_team_ranking(df, rank, reg))
+    # columna source: la añade final_concat_kaggle_api.py
+    df["source"] = KAGGLE_SOURCE
+    return df
+
+
+def check_ranking(kaggle: pd.DataFrame, rank: pd.DataFrame):
+    """
+    El ranking de las filas ya curadas tiene que ser el que saldría hoy: un periodo nuevo
+    en el histórico (o el backfill) cambia el ranking vigente de partidos ya curados, y un
+    append ya no coincidiría con la reconstrucción completa.
+    """
+    cols = [f"{side}_rank_{c}" for side in ("home", "away") for c in ("position", "date")]
+    fresh = attach_ranking_asof(kaggle[["date", "home_team_id", "away_team_id"]], rank,
+                                home_col="home_team_id", away_col="away_team_id",
+                                team_col="team_id")
+    a, b = comparable(kaggle[cols]), comparable(fresh[cols])
+    n_changed = int((~((a == b) | (a.isna() & b.isna())).all(axis=1)).sum())
+    if n_changed:
+        raise FullRebuildRequired(f"el histórico de ranking ha cambiado: {n_changed} partidos ya curados "
+                                  "tendrían otro ranking")
+
+
+def comparable(df: pd.DataFrame) -> pd.DataFrame:
+    # Mismos tipos que al guardar (storage.py) y un único marcador de nulo en texto
+    df = to_storage_dtypes(df.reset_index(drop=True))
+    for c in df.columns:
+        if not pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_datetime64_any_dtype(df[c]):
+            df[c] = df[c].astype(object).where(df[c].notna(), None)
+    return df
+
+
+def same_table(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    try:
+        pd.testing.assert_frame_equal(comparable(a), comparable(b), check_dtype=False, check_categorical=False)
+        return True
+    except AssertionError as e:
+        print(e)
+        return False
+
+
+def update_team_state(final: pd.DataFrame, new_rows: pd.DataFrame, gone: pd.DataFrame, reg: TeamRegistry,
+                      rank: pd.DataFrame, export_csv: bool | None = None):
+    """
+    Almacén por equipo (team_state.py): los partidos nuevos se aplican sobre la matriz en
+    disco (los del día de la marca de agua que aún no estaban, también). Si alguno cae antes
+    de la marca de agua, o desaparece un partido ya jugado, se reconstruye desde
+    matches_final (es barato: solo la ventana desde 1993).
+    """
+    store = TeamStateStore.open(STORE_FILE, mode="r+")
+    try:
+        if gone["home_score"].notna().any():
+            raise ValueError("desaparecen partidos ya incluidos")
+        n_applied = store.apply_matches(new_rows)
+        store.ensure_rows(len(reg.names))
+        store.apply_ranking(rank)
+        how = f"añadidos: {n_applied}"
+    except ValueError as e:
+        store = TeamStateStore.build(final[final["date"] >= pd.Timestamp(SINCE)], rank, reg, STORE_FILE)
+        how = f"reconstruido ({e})"
+    attach_elo(store)
+    store.flush()
+    written = write_table(store.to_frame(reg.names), STATE_FILE, export_csv=export_csv)
+    print(f"OK -> {STORE_FILE}, {', '.join(written)} | {how} | marca de agua: {store.meta['watermark']}")
+
+
+def update_elo(final: pd.DataFrame, changed: pd.DataFrame, export_csv: bool | None = None):
+    """
+    Elo (elo.py): se sigue desde el estado final guardado si los cambios son posteriores a
+    su marca de agua; si no, desde el último checkpoint anual anterior al primer cambio.
+    """
+    ckpt = elo.load_checkpoints()
+    since = changed["date"].min()
+    features, ratings, checkpoints, origin = elo.extend(final, read_table(elo.OUT_FILE), ckpt, since)
+    elo.save_checkpoints(checkpoints, ratings, max(ckpt["watermark"], elo.watermark_of(final)))
+    written = write_table(features, elo.OUT_FILE, export_csv=export_csv)
+    print(f"OK -> {', '.join(written)} | retomado desde {origin}")
+
+
+def update_head_to_head(final: pd.DataFrame, new_rows: pd.DataFrame, gone: pd.DataFrame,
+                        export_csv: bool | None = None):
+    """
+    Índice h2h (head_to_head.py): cada pareja sigue desde su última fila (también los
+    partidos tardíos del día de la marca de agua); si no es un append, se reconstruye.
+    """
+    h2h = head_to_head.HeadToHead.load()
+    try:
+        if gone["home_score"].notna().any():
+            raise ValueError("desaparecen partidos ya incluidos")
+        how = f"añadidos: {h2h.extend(new_rows)}"
+    except ValueError as e:
+        h2h = head_to_head.HeadToHead(head_to_head.build_index(final))
+        how = f"reconstruido ({e})"
+    written = write_table(h2h.index, head_to_head.INDEX_FILE, export_csv=export_csv)
+    written += write_table(h2h.features(final), head_to_head.OUT_FILE, export_csv=export_csv)
+    print(f"OK -> {', '.join(written)} | {how}")
+
+
+def verify_full_rebuild(final: pd.DataFrame, features: pd.DataFrame, reg: TeamRegistry, rank: pd.DataFrame) -> bool:
+    """
+    Reconstruye en memoria desde RAW (ramas Kaggle + API ya curada) y compara. Si
+    matches_final viene de una ejecución con --since, se compara desde su primera fecha.
+    """
+    t0 = time.perf_counter()
+    full_k = build_kaggle_rows(load_raw_csv("results"), load_raw_csv("shootouts"), load_raw_csv("goalscorers"),
+                               reg, rank)
+    full, _ = resolve_sources(full_k, load_api_rows())
+    full = full.loc[full["date"] >= final["date"].min(), final.columns].reset_index(drop=True)
+
+    window = full[full["date"] >= pd.Timestamp(SINCE)].reset_index(drop=True)
+    full_features = add_form_features(window, "home_team_id", "away_team_id")[features.columns]
+
+    ok_final = same_table(final, full)
+    ok_features = same_table(features, full_features)
+    ok_state = ok_elo = ok_h2h = True
+    ratings = None
+    if os.path.exists(elo.CHECKPOINT_FILE) and os.path.exists(elo.OUT_FILE):
+        full_elo, ratings, _ = elo.full_run(full)
+        ok_elo = same_table(read_table(elo.OUT_FILE), full_elo)
+    if os.path.exists(head_to_head.INDEX_FILE):
+        h2h = head_to_head.HeadToHead(head_to_head.build_index(full))
+        ok_h2h = (same_table(read_table(head_to_head.INDEX_FILE), h2h.index)
+                  and same_table(read_table(head_to_head.OUT_FILE), h2h.features(full)))
+    if os.path.exists(STORE_FILE):
+        rebuilt = TeamStateStore.build(window, rank, reg, None)
+        if ratings is not None:
+            rebuilt.set_columns(np.arange(len(ratings)), pd.DataFrame({"elo": ratings}))
+        ok_state = same_table(TeamStateStore.open(STORE_FILE).to_frame(reg.names), rebuilt.to_frame(reg.names))
+    print(f"\n=== VERIFICACION (reconstrucción completa en {time.perf_counter() - t0:.2f}s) ===")
+    print("matches_final_curated:", "OK" if ok_final else "DIFERENTE")
+    print("features:", "OK" if ok_features else "DIFERENTE")
+    if os.path.exists(elo.CHECKPOINT_FILE) and os.path.exists(elo.OUT_FILE):
+        print("elo:", "OK" if ok_elo else "DIFERENTE")
+    if os.path.exists(head_to_head.INDEX_FILE):
+        print("head_to_head:", "OK" if ok_h2h else "DIFERENTE")
+    if os.path.exists(STORE_FILE):
+        print("team_state:", "OK" if ok_state else "DIFERENTE")
+    return ok_final and ok_features and ok_elo and ok_h2h and ok_state
+
+
+def main(verify: bool = False, export_csv: bool | None = None) -> bool:
+    """
+    export_csv=None escribe los mismos formatos que la reconstrucción completa (Parquet +
+    CSV salvo TFM_EXPORT_CSV=0, ver storage.py): los CSV que leen R y las demás etapas no
+    se quedan atrás.
+    """
+    t0 = time.perf_counter()
+
+    final = read_table(FINAL_FILE)
+    final_columns = list(final.columns)
+    kaggle, _ = split_sources(final)
+    watermark = kaggle["date"].max()
+    print(f"Marca de agua (último partido Kaggle curado): {watermark.date()} | filas Kaggle: {len(kaggle)}")
+
+    try:
+        results, shoot, goals = new_raw_rows(curated_raw_rows(kaggle), watermark)
+    except FullRebuildRequired as e:
+        print("ERROR:", e)
+        print("Ejecutar la reconstrucción completa: python src/pipeline.py")
+        return False
+
+    if results.empty:
+        print("Sin partidos nuevos.")
+        return True
+    print(f"Partidos nuevos: {len(results)} ({results['date'].min().date()} -> {results['date'].max().date()})")
+
+    # Equipos nuevos: se registran en el mismo orden que build_registry (alfabético) y se guardan
+    reg = TeamRegistry.load()
+    n_teams = len(reg.names)
+    reg.register(reg.canonical_names(pd.concat([results["home_team"], results["away_team"]])).unique())
+    if len(reg.names) > n_teams:
+        reg.save()
+        print("Equipos nuevos en el registro:", len(reg.names) - n_teams)
+
+    rank = ranking_with_team_ids(load_ranking_history(IN_RANKING_HISTORY), reg)
+    try:
+        check_ranking(kaggle, rank)
+    except FullRebuildRequired as e:
+        print("ERROR:", e)
+        print("Ejecutar la reconstrucción completa: python src/pipeline.py")
+        return False
+    new_rows = build_kaggle_rows(results, shoot, goals, reg, rank)
+
+    # matches_final_curated: los partidos nuevos van al final del bloque Kaggle y se vuelve a
+    # resolver contra API (algún fixture que estaba solo en API puede fusionarse ahora)
+    kaggle = kaggle.drop(columns=RESOLUTION_COLS)
+    final, report = resolve_sources(pd.concat([kaggle, new_rows[kaggle.columns]], ignore_index=True),
+                                    load_api_rows())
+    final = final[final_columns]
+    write_table(report, OUT_REPORT, export_csv=export_csv)
+    written = write_table(final, FINAL_FILE, export_csv=export_csv)
+    print("OK ->", ", ".join(written), "| filas:", len(final), "|",
+          report["resolution"].value_counts().to_dict())
+
+    # Features: filas de la ventana desde 1993 con los valores ya calculados; solo se recalcula
+    # lo que depende de los equipos con partidos nuevos o con fixtures API que desaparecen
+    old = read_table(FEATURES_FILE)
+    window = final[final["date"] >= pd.Timestamp(SINCE)].reset_index(drop=True)
+    old_keys, new_keys = row_keys(old), row_keys(window)
+    feats = old.set_index(old_keys)[feature_columns()]
+    features = pd.concat([window, feats.reindex(new_keys).reset_index(drop=True)], axis=1)[old.columns]
+
+    gone = old[~old_keys.isin(new_keys)]
+    changed = pd.concat([new_rows, gone])
+    teams = pd.unique(pd.concat([changed["home_team_id"], changed["away_team_id"]]))
+    features, n_refreshed = refresh_form_features(features, teams, changed["date"].min(),
+                                                  "home_team_id", "away_team_id")
+    written = write_table(features, FEATURES_FILE, export_csv=export_csv)
+    print(f"OK -> {', '.join(written)} | filas: {len(features)} | recalculadas: {n_refreshed} | equipos: {len(teams)}")
+
+    if os.path.exists(elo.CHECKPOINT_FILE) and os.path.exists(elo.OUT_FILE):
+        update_elo(final, changed, export_csv)
+    if os.path.exists(head_to_head.INDEX_FILE):
+        update_head_to_head(final, new_rows, gone, export_csv)
+    if os.path.exists(STORE_FILE):
+        update_team_state(final, new_rows, gone, reg, rank, export_csv)
+
+    print(f"\nActualización incremental en {time.perf_counter() - t0:.3f}s")
+
+    if verify:
+        return verify_full_rebuild(final, features, reg, rank)
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--verify", action="store_true",
+                        help="Comparar el resultado con una reconstrucción completa en memoria")
+    parser.add_argument("--no-csv", action="store_true",
+                        help="Escribir solo Parquet (como TFM_EXPORT_CSV=0; luego: python src/storage.py data/curated)")
+    args = parser.parse_args()
+    sys.exit(0 if main(verify=args.verify, export_csv=False if args.no_csv else None) else 1)
@@ -0,0 +1,215 @@
+import os
+import sys
+import json
+import time
+import runpy
+import pstats
+import cProfile
+import argparse
+import traceback
+import importlib.util
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Un evento JSON por ejecución de etapa en EVENTS_PATH (JSON lines): tiempos, pico de
+# memoria, filas y bytes leídos/escritos. Las lecturas/escrituras las anotan storage.py
+# y schemas.py, así que los scripts no tienen que hacer nada.
+#   python src/instrumentation.py run --stage process_kaggle -- src/process_kaggle.py
+#   python src/instrumentation.py summary            (última ejecución del pipeline)
+EVENTS_PATH = "data/.runs/events.jsonl"
+PROFILE_DIR = "data/.runs/profiles"
+
+# pipeline.py comparte el run_id con todas las etapas de una ejecución
+RUN_ID_ENV = "TFM_RUN_ID"
+
+HAS_RESOURCE = importlib.util.find_spec("resource") is not None  # no existe en Windows
+HAS_PSUTIL = importlib.util.find_spec("psutil") is not None
+
+PROFILE_TOP = 25
+
+# Lecturas/escrituras de la etapa en curso (None = sin instrumentar: record() no hace nada)
+_current = None
+
+
+# =========================
+# MEDIDAS DEL PROCESO
+# =========================
+def peak_rss_mb() -> float | None:
+    # Linux: VmHWM es el pico de este proceso; ru_maxrss se hereda del padre a través de exec
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if HAS_RESOURCE:
+        import resource
+        # Linux da KB; macOS, bytes
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    if HAS_PSUTIL:
+        import psutil
+        # Windows: peak_wset es el pico del working set
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / (1024 * 1024)
+    return None
+
+
+def children_cpu_s() -> float:
+    # CPU de los procesos que lanza la etapa (p. ej. el pool de process_api_football.py)
+    if not HAS_RESOURCE:
+        return 0.0
+    import resource
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+def file_bytes(paths) -> int:
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+# =========================
+# ANOTACIONES (desde storage.py / schemas.py / scripts)
+# =========================
+def record(kind: str, path: str | list[str], rows: int | None = None):
+    """Anota una lectura ("read") o escritura ("write") de la etapa en curso."""
+    if _current is None:
+        return
+    paths = [path] if isinstance(path, str) else list(path)
+    _current[kind].append({"path": paths[0] if len(paths) == 1 else paths,
+                           "rows": rows, "bytes": file_bytes(paths)})
+
+
+def start():
+    global _current
+    _current = {"read": [], "write": []}
+
+
+def finish() -> dict:
+    global _current
+    io, _current = _current or {"read": [], "write": []}, None
+    return io
+
+
+# =========================
+# EJECUCION INSTRUMENTADA
+# =========================
+def run_script(stage: str, script: str, args: list[str], profile: bool = False,
+               events_path: str = EVENTS_PATH) -> int:
+    """Ejecuta un script como __main__ en este proceso y escribe su evento."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(script)))
+    sys.argv = [script, *args]
+    run_id = os.environ.get(RUN_ID_ENV) or time.strftime("%Y%m%d_%H%M%S")
+
+    prof = cProfile.Profile() if profile else None
+    start()
+    t0, c0 = time.perf_counter(), time.process_time()
+    code = 0
+    try:
+        if prof:
+            prof.enable()
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except Exception:
+        traceback.print_exc()
+        code = 1
+    finally:
+        if prof:
+            prof.disable()
+    wall, cpu = time.perf_counter() - t0, time.process_time() - c0 + children_cpu_s()
+    io = finish()
+
+    event = {
+        "ts": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "run_id": run_id,
+        "stage": stage,
+        "script": script,
+        "args": args,
+        "status": "ok" if code == 0 else "error",
+        "exit_code": code,
+        "wall_s": round(wall, 4),
+        "cpu_s": round(cpu, 4),
+        "peak_rss_mb": None if (m := peak_rss_mb()) is None else round(m, 1),
+        "rows_in": sum(r["rows"] or 0 for r in io["read"]),
+        "rows_out": sum(r["rows"] or 0 for r in io["write"]),
+        "bytes_in": sum(r["bytes"] for r in io["read"]),
+        "bytes_out": sum(r["bytes"] for r in io["write"]),
+        "reads": io["read"],
+        "writes": io["write"],
+        "profile": None,
+    }
+    if prof:
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        event["profile"] = os.path.join(PROFILE_DIR, f"{run_id}_{stage}.prof").replace(os.sep, "/")
+        prof.dump_stats(event["profile"])
+        print(f"\n=== PERFIL {stage} (top {PROFILE_TOP}, tiempo acumulado) ===")
+        pstats.Stats(prof).sort_stats("cumulative").print_stats(PROFILE_TOP)
+
+    write_event(event, events_path)
+    return code
+
+
+def write_event(event: dict, path: str = EVENTS_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+def read_events(path: str = EVENTS_PATH) -> list[dict]:
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+# =========================
+# RESUMEN
+# =========================
+def summary(run_id: str | None = None, path: str = EVENTS_PATH) -> list[dict]:
+    """Dónde se va el tiempo en una ejecución (por defecto la última)."""
+    events = read_events(path)
+    if not events:
+        print("Sin eventos en", path)
+        return []
+    run_id = run_id or events[-1]["run_id"]
+    # Si una etapa se ejecutó varias veces en el mismo run, cuenta la última
+    by_stage = {e["stage"]: e for e in events if e["run_id"] == run_id}
+    rows = sorted(by_stage.values(), key=lambda e: -e["wall_s"])
+    total = sum(e["wall_s"] for e in rows) or 1.0
+
+    print(f"=== RUN {run_id} | {len(rows)} etapas | {total:.2f}s de etapa ===")
+    print(f"{'etapa':<22}{'wall s':>9}{'%':>7}{'cpu s':>9}{'pico MB':>9}{'filas in':>12}{'filas out':>12}{'MB out':>9}  estado")
+    for e in rows:
+        peak = f"{e['peak_rss_mb']:.0f}" if e["peak_rss_mb"] is not None else "n/d"
+        print(f"{e['stage']:<22}{e['wall_s']:>9.2f}{100 * e['wall_s'] / total:>6.1f}%{e['cpu_s']:>9.2f}{peak:>9}"
+              f"{e['rows_in']:>12,}{e['rows_out']:>12,}{e['bytes_out'] / 1e6:>9.2f}  {e['status']}"
+              + (f" | perfil: {e['profile']}" if e.get("profile") else ""))
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Eventos de ejecución por etapa (JSON lines)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="Ejecutar un script instrumentado")
+    p_run.add_argument("--stage", required=True)
+    p_run.add_argument("--profile", action="store_true", help="Capturar cProfile de la etapa")
+    p_run.add_argument("--events", default=EVENTS_PATH)
+    p_run.add_argument("script")
+    p_run.add_argument("args", nargs=argparse.REMAINDER)
+
+    p_sum = sub.add_parser("summary", help="Resumen de una ejecución")
+    p_sum.add_argument("--run", default=None, help="run_id (por defecto el último)")
+    p_sum.add_argument("--events", default=EVENTS_PATH)
+
+    a = parser.parse_args()
+    # storage.py/schemas.py anotan en el módulo `instrumentation`, no en este __main__
+    import instrumentation
+    if a.command == "run":
+        script_args = a.args[1:] if a.args[:1] == ["--"] else a.args
+        sys.exit(instrumentation.run_script(a.stage, a.script, script_args, a.profile, a.events))
+    instrumentation.summary(a.run, a.events)
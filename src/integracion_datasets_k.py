@@ -1,5 +1,13 @@
 import os
+import argparse
+import numpy as np
 import pandas as pd
+from data_quality import check_table, merge_results, print_results
+from match_id import base_match_ids, base_of, match_ids
+from schemas import parse_flag, to_category
+from storage import CHUNK_ROWS, WINDOW_SINCE, TableWriter, iter_table, read_table, write_table
+from streaming import SortedCursor, date_aligned
+from team_registry import TeamRegistry
 
 
 IN_RESULTS = "data/processed/kaggle/results_processed.csv"
@@ -9,128 +17,203 @@ IN_GOALSCORERS = "data/processed/kaggle/goalscorers_processed.csv"
 OUT_DIR = "data/curated"
 OUT_FILE = os.path.join(OUT_DIR, "kaggle_matches_curated.csv")
 
+# Columnas que se leen de cada tabla (el resto no se llega a cargar)
+SHOOTOUT_COLS = ["date", "home_team", "away_team", "winner"]
+GOALSCORER_COLS = ["date", "home_team", "away_team", "penalty", "own_goal"]
 
-def main():
-    os.makedirs(OUT_DIR, exist_ok=True)
 
-    # -------------------------
-    # 1) Cargar RESULTS (base)
-    # -------------------------
-    df_results = pd.read_csv(IN_RESULTS, parse_dates=["date"])
-    for c in ["home_team", "away_team"]:
-        df_results[c] = df_results[c].astype(str).str.strip()
+def strip_cols(df: pd.DataFrame, cols: list[str]) -> pd.DataFrame:
+    # Strip sobre las categorías (los nulos siguen siendo nulos, no la cadena 'nan')
+    for c in cols:
+        if c in df.columns:
+            df[c] = to_category(df[c])
+    return df
 
-    base_n = len(df_results)
-    print("Results base:", base_n)
 
-    # Llave estándar del partido
-    key_cols = ["date", "home_team", "away_team"]
+def key_ids(df: pd.DataFrame, reg: TeamRegistry) -> np.ndarray:
+    """Llave (date, home_team, away_team) como match_id base: un int64 en lugar de tres strings."""
+    return base_match_ids(df["date"],
+                          reg.resolve(df["home_team"], dates=df["date"]),
+                          reg.resolve(df["away_team"], dates=df["date"]))
 
-    # --------------------------------
-    # 2) JOIN con SHOOTOUTS (penales)
-    # --------------------------------
-    df_shoot = pd.read_csv(IN_SHOOTOUTS, parse_dates=["date"])
-    for c in ["home_team", "away_team", "winner"]:
-        if c in df_shoot.columns:
-            df_shoot[c] = df_shoot[c].astype(str).str.strip()
 
-    # Dejar solo columnas necesarias
-    keep_shoot = key_cols + (["winner"] if "winner" in df_shoot.columns else [])
-    df_shoot = df_shoot[keep_shoot].copy()
+def prepare_shootouts(df_shoot: pd.DataFrame, reg: TeamRegistry) -> pd.Series:
+    """Ganador de la tanda de penales indexado por match_id base."""
+    df_shoot = strip_cols(df_shoot, ["home_team", "away_team", "winner"])
+    winner = df_shoot["winner"] if "winner" in df_shoot.columns else pd.Series(pd.NA, index=df_shoot.index)
+    winner = pd.Series(winner.to_numpy(), index=pd.Index(key_ids(df_shoot, reg), name="match_key_id"),
+                       name="shootout_winner")
 
     # Evitar duplicados accidentales
-    df_shoot = df_shoot.drop_duplicates(subset=key_cols)
-
-    df = df_results.merge(df_shoot, on=key_cols, how="left")
-
-    # Crear columnas útiles
-    df = df.rename(columns={"winner": "shootout_winner"})
-    df["has_shootout"] = df["shootout_winner"].notna()
-
-    print("Shootouts total:", len(df_shoot))
-    print("Matches con shootout (después del join):", int(df["has_shootout"].sum()))
-
-    # Detectar shootouts que no hicieron match con results
-    df_results_keys = df_results[key_cols].drop_duplicates()
-    df_shoot_keys = df_shoot[key_cols].drop_duplicates()
+    return winner[~winner.index.duplicated()]
 
-    missing_shoot = df_shoot_keys.merge(df_results_keys, on=key_cols, how="left", indicator=True)
-    missing_shoot = missing_shoot[missing_shoot["_merge"] == "left_only"]
 
-    print("\nShootouts sin match en results:", len(missing_shoot))
-    print(missing_shoot.head(20))
+def aggregate_goalscorers(df_goals: pd.DataFrame, reg: TeamRegistry) -> pd.DataFrame:
+    """Agregados por partido (goles registrados, penales, autogoles) indexados por match_id base."""
+    df_goals = strip_cols(df_goals, ["home_team", "away_team", "team", "scorer"])
 
-    # ---------------------------------------------------
-    # 3) Integrar GOALSCORERS agregando a nivel partido
-    # ---------------------------------------------------
-    df_goals = pd.read_csv(IN_GOALSCORERS, parse_dates=["date"])
-    for c in ["home_team", "away_team", "team", "scorer"]:
-        if c in df_goals.columns:
-            df_goals[c] = df_goals[c].astype(str).str.strip()
-
-    # Normalizar flags si vienen como strings
+    # Flags como boolean (ya lo son si la tabla viene con su esquema); nulo cuenta como False
     for flag in ["penalty", "own_goal"]:
         if flag in df_goals.columns:
-            # puede venir como True/False o 'True'/'False'
-            df_goals[flag] = df_goals[flag].astype(str).str.lower().isin(["true", "1", "yes"])
-
-    # Agregados por partido: conteo total de goles registrados, penales, autogoles
-    agg = {"scorer": "count"}
-    if "penalty" in df_goals.columns:
-        agg["penalty"] = "sum"
-    if "own_goal" in df_goals.columns:
-        agg["own_goal"] = "sum"
-
-    df_goals_agg = (
-        df_goals
-        .groupby(key_cols, as_index=False)
-        .agg(agg)
-        .rename(columns={
-            "scorer": "goalscorers_rows",
-            "penalty": "penalty_goals_count" if "penalty" in agg else "penalty_goals_count",
-            "own_goal": "own_goals_count" if "own_goal" in agg else "own_goals_count",
-        })
-    )
+            df_goals[flag] = parse_flag(df_goals[flag]).fillna(False)
+
+    # Agregados por partido: conteo total de goles registrados (filas, también sin goleador
+    # conocido), penales, autogoles
+    flags = [c for c in ["penalty", "own_goal"] if c in df_goals.columns]
+    groups = df_goals[flags].groupby(key_ids(df_goals, reg))
+    df_goals_agg = groups.sum().rename(columns={"penalty": "penalty_goals_count", "own_goal": "own_goals_count"})
+    df_goals_agg.insert(0, "goalscorers_rows", groups.size())
+    df_goals_agg.index.name = "match_key_id"
 
     # Si no existían columnas en origen, aseguramos que existan con 0
     if "penalty_goals_count" not in df_goals_agg.columns:
         df_goals_agg["penalty_goals_count"] = 0
     if "own_goals_count" not in df_goals_agg.columns:
         df_goals_agg["own_goals_count"] = 0
+    return df_goals_agg
+
 
-    df = df.merge(df_goals_agg, on=key_cols, how="left")
+def curate_matches(df_results: pd.DataFrame, shoot_winner: pd.Series, df_goals_agg: pd.DataFrame,
+                   reg: TeamRegistry) -> pd.DataFrame:
+    """
+    RESULTS + shootouts + agregados de goleadores, unidos por match_id (búsqueda en índice).
+    match_id no depende del orden de las filas; match_key (texto, con la posición en results)
+    se mantiene porque lo usan los scripts de R.
+    """
+    df = df_results.copy()
+    df["match_id"] = match_ids(df["date"], reg.resolve(df["home_team"], dates=df["date"]),
+                               reg.resolve(df["away_team"], dates=df["date"]))
+    base = base_of(df["match_id"])
+
+    # Crear columnas útiles
+    df["shootout_winner"] = shoot_winner.reindex(base).to_numpy()
+    df["has_shootout"] = df["shootout_winner"].notna()
 
     # Rellenar NaN de agregados con 0 (partidos sin registros de goleadores)
+    goals = df_goals_agg.reindex(base)
     for c in ["goalscorers_rows", "penalty_goals_count", "own_goals_count"]:
-        df[c] = df[c].fillna(0).astype(int)
+        df[c] = goals[c].fillna(0).astype(int).to_numpy()
+
+    df["match_key"] = (
+        df["date"].dt.strftime("%Y-%m-%d") + "|" +
+        df["home_team"].astype(str) + "|" +
+        df["away_team"].astype(str) + "|" +
+        df.index.astype(str)
+    )
+    # match_id al final, junto a match_key
+    return df[[c for c in df.columns if c != "match_id"] + ["match_id"]]
+
 
+def add_match_outcome(df: pd.DataFrame) -> pd.DataFrame:
+    # 1 gana local, 0 empate, -1 gana visitante
+    df["match_outcome"] = 0
+    df.loc[df["home_score"] > df["away_score"], "match_outcome"] = 1
+    df.loc[df["home_score"] < df["away_score"], "match_outcome"] = -1
+    return df
+
+
+def main_chunked(chunksize: int, since: str | None = None):
+    """
+    Mismo resultado que main() pero por bloques: results se recorre en bloques cerrados en
+    una fecha completa y shootouts/goalscorers (también ordenadas por fecha) avanzan a la
+    par, así que la unión por match_id es un merge en una sola pasada (streaming.py).
+    Las validaciones se evalúan por bloque y se suman al final.
+    """
+    os.makedirs(OUT_DIR, exist_ok=True)
+    reg = TeamRegistry.load()
+    shoot_cursor = SortedCursor(iter_table(IN_SHOOTOUTS, chunksize, SHOOTOUT_COLS, "shootouts", since), "shootouts")
+    goals_cursor = SortedCursor(iter_table(IN_GOALSCORERS, chunksize, GOALSCORER_COLS, "goalscorers", since),
+                                "goalscorers")
+
+    n = n_shoot = n_with_shoot = n_with_goals = 0
+    checks, last_chunk = [], None
+    with TableWriter(OUT_FILE) as out:
+        # El índice de cada bloque es la posición de la fila en results (match_key la lleva)
+        for df_results in date_aligned(iter_table(IN_RESULTS, chunksize, schema="results", since=since), "results"):
+            df_results = strip_cols(df_results, ["home_team", "away_team"])
+            last = df_results["date"].iloc[-1]
+            df_shoot = shoot_cursor.take_until(last)
+            shoot_winner = prepare_shootouts(df_shoot, reg)
+            df_goals_agg = aggregate_goalscorers(goals_cursor.take_until(last), reg)
+
+            df = curate_matches(df_results, shoot_winner, df_goals_agg, reg)
+            checks.append(check_table("results", df_results)
+                          + check_table("shootouts", df_shoot, refs={"results": df_results})
+                          + check_table("kaggle_matches_curated", df))
+            out.write(df)
+
+            n += len(df)
+            n_shoot += len(shoot_winner)
+            n_with_shoot += int(df["has_shootout"].sum())
+            n_with_goals += int((df["goalscorers_rows"] > 0).sum())
+            last_chunk = df_results
+
+        # Tandas posteriores al último partido: no tienen match en results
+        rest = shoot_cursor.take_until(None)
+        if len(rest) and last_chunk is not None:
+            checks.append(check_table("shootouts", rest, refs={"results": last_chunk.iloc[:0]}))
+            n_shoot += len(prepare_shootouts(rest, reg))
+
+    print("Results base:", n, "| bloques de", chunksize)
+    print("Shootouts total:", n_shoot)
+    print("Matches con shootout (después del join):", n_with_shoot)
+    print("Partidos con alguna fila en goalscorers:", n_with_goals)
+    print("\n=== VALIDACIONES ===")
+    print_results(merge_results(checks))
+    print("\nCURATED guardado en:", OUT_FILE)
+
+
+def main(chunksize: int | None = None, since: str | None = None):
+    if chunksize:
+        return main_chunked(chunksize, since)
+    os.makedirs(OUT_DIR, exist_ok=True)
+
+    # -------------------------
+    # 1) Cargar RESULTS (base)
+    # -------------------------
+    # Con `since` solo se leen los partidos de la ventana (el índice sigue siendo la
+    # posición en results, así match_key no cambia)
+    df_results = strip_cols(read_table(IN_RESULTS, schema="results", since=since), ["home_team", "away_team"])
+
+    base_n = len(df_results)
+    print("Results base:", base_n)
+
+    # --------------------------------
+    # 2) SHOOTOUTS (penales) y 3) GOALSCORERS agregados a nivel partido
+    # --------------------------------
+    reg = TeamRegistry.load()
+    df_shoot = read_table(IN_SHOOTOUTS, SHOOTOUT_COLS, "shootouts", since=since)
+    shoot_winner = prepare_shootouts(df_shoot, reg)
+    df_goals_agg = aggregate_goalscorers(read_table(IN_GOALSCORERS, GOALSCORER_COLS, "goalscorers", since=since), reg)
+
+    df = curate_matches(df_results, shoot_winner, df_goals_agg, reg)
+
+    print("Shootouts total:", len(shoot_winner))
+    print("Matches con shootout (después del join):", int(df["has_shootout"].sum()))
     print("Partidos con alguna fila en goalscorers:", int((df["goalscorers_rows"] > 0).sum()))
 
     # -------------------------
-    # 4) Validaciones rápidas
+    # 4) Validaciones (reglas declaradas en data_quality.py: shootouts sin match en
+    #    results, duplicados por llave, goleadores vs marcador...)
     # -------------------------
     print("\n=== VALIDACIONES ===")
     print("Total filas final (debe ser igual a results):", len(df), "| base:", base_n)
-
-    # comprobar duplicados por llave
-    dup = df.duplicated(subset=key_cols).sum()
-    print("Duplicados por llave (date,home,away):", int(dup))
-    dups_df = df[df.duplicated(subset=key_cols, keep=False)].sort_values(key_cols)
-    print("\nDuplicados (muestra completa):")
-    print(dups_df[key_cols + ["tournament", "city", "country", "home_score", "away_score"]].head(50))
-    df["match_key"] = (
-    df["date"].dt.strftime("%Y-%m-%d") + "|" +
-    df["home_team"].astype(str) + "|" +
-    df["away_team"].astype(str) + "|" +
-    df.index.astype(str)
-    )
+    print_results(check_table("results", df_results)
+                  + check_table("shootouts", df_shoot, refs={"results": df_results})
+                  + check_table("kaggle_matches_curated", df))
 
     # -------------------------
     # 5) Guardar CURATED
     # -------------------------
-    df.to_csv(OUT_FILE, index=False, encoding="utf-8")
+    write_table(df, OUT_FILE)
     print("\nCURATED guardado en:", OUT_FILE)
 
-if __name__ == "__main__":
-    main()
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RESULTS + shootouts + goleadores -> kaggle_matches_curated")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS,
+                        help="Filas por bloque (modo out-of-core; por defecto TFM_CHUNK_ROWS o todo en memoria)")
+    parser.add_argument("--since", default=WINDOW_SINCE,
+                        help="Solo partidos desde esta fecha (por defecto TFM_SINCE o histórico completo)")
+    args = parser.parse_args()
+    main(args.chunksize, args.since)
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+
+# =========================
+# MATCH ID (entero de 64 bits)
+# =========================
+# Layout: | días desde 1970 + offset (36 bits) | home team_id (12) | away team_id (12) | secuencia (4) |
+# Mismo partido -> mismo ID, independientemente del orden de las filas. La secuencia solo
+# distingue partidos repetidos (misma fecha y mismos equipos) y sigue el orden de aparición.
+DAY_OFFSET = 1 << 20        # fechas del s. XIX en positivo
+TEAM_BITS = 12
+SEQ_BITS = 4
+
+MAX_TEAM_ID = (1 << TEAM_BITS) - 1
+MAX_SEQ = (1 << SEQ_BITS) - 1
+SEQ_MASK = np.int64(MAX_SEQ)
+
+
+def _days(dates) -> np.ndarray:
+    d = pd.Series(dates)
+    if not pd.api.types.is_datetime64_any_dtype(d):
+        d = pd.to_datetime(d)
+    d = d.to_numpy(dtype="datetime64[D]")
+    if np.isnat(d).any():
+        raise ValueError("match_id: hay fechas vacías")
+    return d.astype(np.int64) + DAY_OFFSET
+
+
+def _team_ids(ids) -> np.ndarray:
+    s = pd.Series(ids)
+    if s.isna().any():
+        raise ValueError("match_id: hay equipos sin team_id")
+    arr = s.to_numpy(dtype=np.int64)
+    if (arr < 0).any() or (arr > MAX_TEAM_ID).any():
+        raise ValueError(f"match_id: team_id fuera de rango (0..{MAX_TEAM_ID})")
+    return arr
+
+
+def base_match_ids(dates, home_ids, away_ids) -> np.ndarray:
+    """ID del partido con secuencia 0: la llave (fecha, home, away) como un único int64."""
+    return (
+        (_days(dates) << (2 * TEAM_BITS + SEQ_BITS))
+        | (_team_ids(home_ids) << (TEAM_BITS + SEQ_BITS))
+        | (_team_ids(away_ids) << SEQ_BITS)
+    )
+
+
+def match_ids(dates, home_ids, away_ids) -> np.ndarray:
+    """base_match_ids + nº de orden entre partidos repetidos (0 para el primero)."""
+    return resequence(base_match_ids(dates, home_ids, away_ids))
+
+
+def resequence(ids) -> np.ndarray:
+    """Vuelve a numerar la secuencia en orden de aparición (p. ej. al unir dos tablas con IDs propios)."""
+    base = base_of(ids)
+    seq = pd.Series(base).groupby(base, sort=False).cumcount().to_numpy()
+    if (seq > MAX_SEQ).any():
+        raise ValueError(f"match_id: más de {MAX_SEQ + 1} partidos con la misma fecha y equipos")
+    return base | seq
+
+
+def base_of(ids) -> np.ndarray:
+    """Quita la secuencia: para unir con tablas que solo conocen (fecha, home, away)."""
+    return np.asarray(ids, dtype=np.int64) & ~SEQ_MASK
+
+
+def split_match_ids(ids) -> pd.DataFrame:
+    ids = np.asarray(ids, dtype=np.int64)
+    team_mask = np.int64(MAX_TEAM_ID)
+    return pd.DataFrame({
+        "date": ((ids >> (2 * TEAM_BITS + SEQ_BITS)) - DAY_OFFSET).astype("datetime64[D]").astype("datetime64[ns]"),
+        "home_team_id": (ids >> (TEAM_BITS + SEQ_BITS)) & team_mask,
+        "away_team_id": (ids >> SEQ_BITS) & team_mask,
+        "seq": ids & SEQ_MASK,
+    })
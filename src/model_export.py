@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import time
+import argparse
+import importlib.util
+import numpy as np
+import pandas as pd
+from storage import read_table
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Se ajusta una regresión logística multinomial (local / empate / visitante) sobre las
+# filas del modelo A (partidos desde 1993 con ranking y forma completos) de la salida de
+# features_form.py y se exporta a JSON: predict_fixtures.py la puntúa solo con numpy, sin
+# sesión de R. Solo entran partidos con el ranking publicado antes del partido; el .rds de
+# 07_modeloA_final (ranking estático, con fuga) solo se usa con --from-rds.
+FEATURES_FILE = "data_to_model/06_datos_features_1993.csv"
+MODEL_RDS = "models/output/07_modeloA_final.rds"
+MODEL_JSON = "models/output/07_modeloA_multinomial.json"
+
+HAS_PYREADR = importlib.util.find_spec("pyreadr") is not None
+
+TARGET = "match_outcome"
+CLASSES = [-1, 0, 1]
+CLASS_NAMES = ["away", "draw", "home"]
+
+# Solo información previa al partido (nada de goles ni tandas del propio partido)
+FEATURES = [
+    "neutral",
+    "home_rank_position", "home_rank_points", "away_rank_position", "away_rank_points",
+    "rank_points_diff", "rank_points_ratio", "rank_pos_diff", "rank_form_composite",
+    "home_last5_gf", "home_last5_ga", "home_last5_winrate",
+    "home_last10_gf", "home_last10_ga", "home_last10_winrate",
+    "away_last5_gf", "away_last5_ga", "away_last5_winrate",
+    "away_last10_gf", "away_last10_ga", "away_last10_winrate",
+    "form_gf_diff_5", "form_ga_diff_5", "form_win_diff_5",
+]
+
+L2 = 1.0
+HOLDOUT_FROM = "2022-01-01"   # validación temporal: se entrena antes y se evalúa después
+MAX_ITER = 50
+TOL = 1e-8
+
+
+class NoRankingHistory(ValueError):
+    """Ningún partido tiene un ranking publicado antes de jugarse: falta el histórico (--backfill)."""
+
+
+# =========================
+# FEATURES DERIVADAS (las del script de R del modelo A)
+# =========================
+def add_rank_features(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["rank_points_diff"] = df["home_rank_points"] - df["away_rank_points"]
+    df["rank_points_ratio"] = df["home_rank_points"] / df["away_rank_points"]
+    df["rank_pos_diff"] = df["away_rank_position"] - df["home_rank_position"]
+    df["rank_form_composite"] = (df["rank_points_ratio"] * (df["home_last10_winrate"] + 0.01)
+                                 / (df["away_last10_winrate"] + 0.01))
+    return df
+
+
+def load_training_data(from_rds: bool = False) -> tuple[pd.DataFrame, str]:
+    """
+    Filas del modelo A a partir de la salida de features_form (o del .rds de R con
+    from_rds). Se descartan las filas con un ranking publicado después del partido (join
+    estático). NoRankingHistory si el histórico tiene un solo periodo (sin backfill);
+    ValueError si no queda ninguna fila por otro motivo.
+    """
+    if from_rds:
+        if not HAS_PYREADR:
+            raise ValueError("pyreadr no está instalado: no se puede leer el .rds de R")
+        import pyreadr
+        df = next(iter(pyreadr.read_r(MODEL_RDS).values()))
+        source = MODEL_RDS
+    else:
+        df = add_rank_features(read_table(FEATURES_FILE))
+        source = FEATURES_FILE
+    df["date"] = pd.to_datetime(df["date"])
+    df["neutral"] = pd.to_numeric(df["neutral"].astype("float"), errors="coerce")
+
+    rank_dates = [c for c in ("home_rank_date", "away_rank_date") if c in df.columns]
+    if rank_dates and not from_rds:
+        published = pd.concat([pd.to_datetime(df[c]) for c in rank_dates]).dropna()
+        if published.nunique() <= 1:
+            raise NoRankingHistory(f"{source}: el ranking de los partidos sale de un solo periodo publicado; "
+                                   "sin histórico no hay filas de entrenamiento sin fuga "
+                                   "(descargar el histórico: datos_football_ranking.py --backfill)")
+        leak = np.zeros(len(df), dtype=bool)
+        for c in rank_dates:
+            leak |= (pd.to_datetime(df[c]) > df["date"]).to_numpy()
+        if leak.any():
+            print(f"Filas con ranking posterior al partido (fuga, descartadas): {int(leak.sum())}")
+        df = df[~leak]
+
+    df = df.dropna(subset=FEATURES + [TARGET])
+    if df.empty:
+        raise ValueError(f"Sin filas de entrenamiento en {source}: ningún partido con ranking previo y forma "
+                         "completos")
+    return df.sort_values("date", kind="stable").reset_index(drop=True), source
+
+
+# =========================
+# REGRESION LOGISTICA MULTINOMIAL (Newton, numpy)
+# =========================
+def softmax(z: np.ndarray) -> np.ndarray:
+    z = z - z.max(axis=1, keepdims=True)
+    e = np.exp(z)
+    return e / e.sum(axis=1, keepdims=True)
+
+
+def design(X: np.ndarray) -> np.ndarray:
+    return np.hstack([np.ones((len(X), 1)), X])
+
+
+def fit_multinomial(X: np.ndarray, y: np.ndarray, l2: float = L2, max_iter: int = MAX_ITER,
+                    tol: float = TOL) -> np.ndarray:
+    """
+    Coeficientes (1 + p, k) con intercepto en la fila 0. X ya estandarizada; y con
+    índices de clase 0..k-1. Penalización L2 sin el intercepto (softmax completo: con
+    la penalización el problema es estrictamente convexo y Newton converge en pocas
+    iteraciones).
+    """
+    A = design(X)
+    n, d = A.shape
+    k = int(y.max()) + 1
+    Y = np.eye(k)[y]
+    W = np.zeros((d, k))
+    pen = np.full(d, l2)
+    pen[0] = 0.0
+
+    for _ in range(max_iter):
+        P = softmax(A @ W)
+        grad = A.T @ (P - Y) + pen[:, None] * W
+        # Hessiano por bloques (k*d x k*d): A' diag(p_a (δ_ab - p_b)) A
+        H = np.empty((k * d, k * d))
+        for a in range(k):
+            for b in range(a, k):
+                w = P[:, a] * ((a == b) - P[:, b])
+                block = (A * w[:, None]).T @ A
+                H[a * d:(a + 1) * d, b * d:(b + 1) * d] = block
+                H[b * d:(b + 1) * d, a * d:(a + 1) * d] = block.T
+        H[np.diag_indices_from(H)] += np.tile(pen, k) + 1e-9
+        step = np.linalg.solve(H, grad.T.reshape(-1)).reshape(k, d).T
+        W -= step
+        if np.abs(step).max() < tol:
+            break
+    return W
+
+
+def log_loss(P: np.ndarray, y: np.ndarray) -> float:
+    return float(-np.mean(np.log(np.clip(P[np.arange(len(y)), y], 1e-15, None))))
+
+
+def standardize(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    mean, std = X.mean(axis=0), X.std(axis=0)
+    return mean, np.where(std > 0, std, 1.0)
+
+
+def evaluate(df: pd.DataFrame, holdout_from: str = HOLDOUT_FROM, l2: float = L2) -> dict:
+    """Entrena antes de `holdout_from` y evalúa después (log-loss, accuracy, baseline de frecuencias)."""
+    y = np.searchsorted(CLASSES, df[TARGET].to_numpy(dtype=int))
+    X = df[FEATURES].to_numpy(dtype=float)
+    test = (df["date"] >= pd.Timestamp(holdout_from)).to_numpy()
+    if test.all() or not test.any():
+        return {}
+    mean, std = standardize(X[~test])
+    W = fit_multinomial((X[~test] - mean) / std, y[~test], l2)
+    P = softmax(design((X[test] - mean) / std) @ W)
+    prior = np.bincount(y[~test], minlength=len(CLASSES)) / (~test).sum()
+    return {
+        "holdout_from": holdout_from,
+        "n_train": int((~test).sum()),
+        "n_test": int(test.sum()),
+        "log_loss": round(log_loss(P, y[test]), 5),
+        "accuracy": round(float((P.argmax(axis=1) == y[test]).mean()), 5),
+        "baseline_log_loss": round(log_loss(np.tile(prior, (test.sum(), 1)), y[test]), 5),
+    }
+
+
+# =========================
+# EXPORT
+# =========================
+def export_model(df: pd.DataFrame, source: str, path: str = MODEL_JSON, l2: float = L2) -> dict:
+    t0 = time.perf_counter()
+    metrics = evaluate(df, l2=l2)
+
+    y = np.searchsorted(CLASSES, df[TARGET].to_numpy(dtype=int))
+    X = df[FEATURES].to_numpy(dtype=float)
+    mean, std = standardize(X)
+    W = fit_multinomial((X - mean) / std, y, l2)
+    P = softmax(design((X - mean) / std) @ W)
+
+    model = {
+        "model": "multinomial_logit",
+        "classes": CLASS_NAMES,
+        "features": FEATURES,
+        "mean": mean.round(10).tolist(),
+        "std": std.round(10).tolist(),
+        "coef": W.round(10).tolist(),        # (1 + n_features) x n_classes, fila 0 = intercepto
+        "l2": l2,
+        "trained_on": source,
+        "n_rows": len(df),
+        "date_range": [str(df["date"].min().date()), str(df["date"].max().date())],
+        "train_log_loss": round(log_loss(P, y), 5),
+        "validation": metrics,
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(model, f, indent=1)
+    print(f"OK -> {path} | filas: {len(df)} | features: {len(FEATURES)} | {time.perf_counter() - t0:.2f}s")
+    return model
+
+
+def main(l2: float = L2, from_rds: bool = False):
+    try:
+        df, source = load_training_data(from_rds)
+    except NoRankingHistory as e:
+        # Sin histórico de ranking no hay modelo sin fuga que entrenar: la etapa no falla
+        print("AVISO:", e)
+        print("No se exporta el modelo:", MODEL_JSON)
+        return
+    print("Datos de entrenamiento:", source, "| filas:", len(df))
+    model = export_model(df, source, l2=l2)
+    v = model["validation"]
+    if v:
+        print(f"Validación temporal (desde {v['holdout_from']}): log-loss {v['log_loss']:.4f} "
+              f"(baseline {v['baseline_log_loss']:.4f}) | accuracy {v['accuracy']:.3f} | test: {v['n_test']}")
+    print(f"Log-loss entrenamiento: {model['train_log_loss']:.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ajusta y exporta a JSON el modelo A (logística multinomial)")
+    parser.add_argument("--l2", type=float, default=L2, help="Penalización L2 (sobre features estandarizadas)")
+    parser.add_argument("--from-rds", action="store_true",
+                        help=f"Entrenar con {MODEL_RDS} (data frame de R, ranking estático con fuga)")
+    args = parser.parse_args()
+    if args.l2 < 0:
+        sys.exit("--l2 debe ser >= 0")
+    try:
+        main(args.l2, args.from_rds)
+    except ValueError as e:
+        sys.exit(str(e))
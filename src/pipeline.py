@@ -0,0 +1,432 @@
+import os
+import ast
+import sys
+import json
+import glob
+import time
+import hashlib
+import argparse
+import subprocess
+from dataclasses import dataclass, field, replace
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from storage import WINDOW_SINCE, csv_path, parquet_path
+from instrumentation import RUN_ID_ENV, summary
+
+
+# =========================
+# CONFIGURACION
+# =========================
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SRC_DIR)
+STATE_PATH = "data/.pipeline_state.json"
+
+# Cada etapa se ejecuta a través de instrumentation.py (evento JSON por etapa)
+INSTRUMENT = os.path.join(SRC_DIR, "instrumentation.py")
+
+
+def table(path: str) -> list[str]:
+    # Tabla de la capa processed/curated: CSV + Parquet (ver storage.py)
+    return [path, parquet_path(path)]
+
+
+@dataclass
+class Stage:
+    name: str
+    script: str
+    inputs: list[str]             # rutas o globs relativos a la raíz del repo
+    outputs: list[str]
+    args: list[str] = field(default_factory=list)
+    windowed: bool = False        # acepta --since (ventana del modelo, filtro al leer)
+
+
+# Las extracciones (datos_api.py, datos_football_ranking.py) van contra la red y
+# quedan fuera: sus RAW son las fuentes del grafo.
+STAGES = [
+    # --- Rama Kaggle ---
+    Stage("process_kaggle", "src/process_kaggle.py",
+          inputs=["data/raw/kaggle/results.csv", "data/raw/kaggle/shootouts.csv",
+                  "data/raw/kaggle/goalscorers.csv", "data/raw/kaggle/former_names.csv"],
+          outputs=[*table("data/processed/kaggle/results_processed.csv"),
+                   *table("data/processed/kaggle/shootouts_processed.csv"),
+                   *table("data/processed/kaggle/goalscorers_processed.csv"),
+                   *table("data/processed/kaggle/former_names_processed.csv")]),
+    Stage("integracion_kaggle", "src/integracion_datasets_k.py",
+          inputs=[*table("data/processed/kaggle/results_processed.csv"),
+                  *table("data/processed/kaggle/shootouts_processed.csv"),
+                  *table("data/processed/kaggle/goalscorers_processed.csv"),
+                  "data/processed/mappings/team_registry.csv"],
+          outputs=[*table("data/curated/kaggle_matches_curated.csv")], windowed=True),
+
+    # --- Rama ranking ---
+    Stage("process_ranking", "src/process_football_ranking.py",
+          inputs=["data/raw/fifa_ranking/football_ranking_raw_*.csv",
+                  "data/raw/fifa_ranking/history/rank_date=*/ranking.csv"],
+          outputs=[*table("data/processed/football_ranking/ranking_processed.csv"),
+                   *table("data/processed/football_ranking/ranking_history.csv")]),
+
+    # --- Rama API-Football ---
+    Stage("process_api", "src/process_api_football.py",
+          inputs=["data/raw/api_football/fixtures/**/fixtures_*.json",
+                  "data/raw/api_football/fixtures/manifest_fixtures.csv"],
+          outputs=[*table("data/processed/api_football/fixtures_processed.csv")]),
+    Stage("curated_api", "src/curated_api_as_kaggle.py",
+          inputs=[*table("data/processed/api_football/fixtures_processed.csv"),
+                  "data/processed/mappings/api_to_kaggle_mapping.csv"],
+          outputs=[*table("data/curated/api_matches_curated.csv")], windowed=True),
+
+    # --- Registro canónico de equipos (IDs estables) ---
+    Stage("team_registry", "src/team_registry.py",
+          inputs=[*table("data/processed/kaggle/results_processed.csv"),
+                  *table("data/processed/api_football/fixtures_processed.csv"),
+                  *table("data/processed/football_ranking/ranking_history.csv"),
+                  "data/processed/mappings/api_to_kaggle_mapping.csv",
+                  "data/processed/mappings/team_name_mapping.csv",
+                  "data/raw/kaggle/former_names.csv"],
+          outputs=["data/processed/mappings/team_registry.csv"]),
+
+    # --- Joins con ranking y concatenación final ---
+    Stage("kaggle_ranking", "src/integracion_datasets_k+FR.py",
+          inputs=[*table("data/curated/kaggle_matches_curated.csv"),
+                  *table("data/processed/football_ranking/ranking_history.csv"),
+                  "data/processed/mappings/team_name_mapping.csv",
+                  "data/processed/mappings/team_registry.csv"],
+          outputs=[*table("data/curated/kaggle_matches_with_ranking.csv")], windowed=True),
+    Stage("api_ranking", "src/api_with_ranking.py",
+          inputs=[*table("data/curated/api_matches_curated.csv"),
+                  *table("data/processed/football_ranking/ranking_history.csv"),
+                  "data/processed/mappings/team_name_mapping.csv",
+                  "data/processed/mappings/team_registry.csv"],
+          outputs=[*table("data/curated/api_matches_with_ranking.csv")], windowed=True),
+    Stage("final_concat", "src/final_concat_kaggle_api.py",
+          inputs=[*table("data/curated/kaggle_matches_with_ranking.csv"),
+                  *table("data/curated/api_matches_with_ranking.csv")],
+          outputs=[*table("data/curated/matches_final_curated.csv"),
+                   *table("data/curated/matches_resolution_report.csv")], windowed=True),
+
+    # --- Features para el modelo ---
+    Stage("features_form", "src/features_form.py",
+          inputs=[*table("data/curated/matches_final_curated.csv")],
+          outputs=[*table("data_to_model/06_datos_features_1993.csv")]),
+
+    # --- Rating Elo sobre el histórico completo (falla si matches_final viene con --since) ---
+    Stage("elo", "src/elo.py",
+          inputs=[*table("data/curated/matches_final_curated.csv")],
+          outputs=[*table("data_to_model/06_elo_features.csv"), "data/curated/elo_checkpoints.npz"]),
+
+    # --- Enfrentamientos directos (índice por pareja de equipos; también sin --since) ---
+    Stage("head_to_head", "src/head_to_head.py",
+          inputs=[*table("data/curated/matches_final_curated.csv")],
+          outputs=[*table("data/curated/h2h_index.csv"), *table("data_to_model/06_h2h_features.csv")]),
+
+    # --- Estado por equipo y modelo exportado (predict_fixtures.py) ---
+    Stage("team_state", "src/team_state.py",
+          inputs=[*table("data/curated/matches_final_curated.csv"), "data/curated/elo_checkpoints.npz",
+                  *table("data/processed/football_ranking/ranking_history.csv"),
+                  "data/processed/mappings/team_name_mapping.csv",
+                  "data/processed/mappings/team_registry.csv"],
+          outputs=[*table("data/curated/team_state.csv"),
+                   "data/curated/team_state.npy", "data/curated/team_state.json"]),
+    Stage("model_export", "src/model_export.py",
+          inputs=[*table("data_to_model/06_datos_features_1993.csv")],
+          outputs=["models/output/07_modeloA_multinomial.json"]),
+
+    # --- Calidad de datos (reglas de data_quality.py; falla si se supera un umbral "error") ---
+    Stage("data_quality", "src/data_quality.py",
+          inputs=[*table("data/processed/kaggle/results_processed.csv"),
+                  *table("data/processed/kaggle/shootouts_processed.csv"),
+                  *table("data/processed/kaggle/goalscorers_processed.csv"),
+                  *table("data/processed/football_ranking/ranking_history.csv"),
+                  *table("data/processed/api_football/fixtures_processed.csv"),
+                  *table("data/curated/kaggle_matches_curated.csv"),
+                  *table("data/curated/kaggle_matches_with_ranking.csv"),
+                  *table("data/curated/matches_final_curated.csv"),
+                  "data/processed/mappings/team_registry.csv"],
+          outputs=["data/curated/data_quality_report.json"]),
+]
+
+
+# =========================
+# HASHES
+# =========================
+class FileHasher:
+    """
+    sha256 de ficheros con caché por (mtime, tamaño) para no releer lo que no cambió.
+    """
+
+    def __init__(self, cache: dict | None = None):
+        self.cache = cache or {}
+
+    def file(self, path: str) -> str | None:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+        hit = self.cache.get(path)
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            return hit[2]
+
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self.cache[path] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+
+def expand(patterns: list[str]) -> list[str]:
+    files = []
+    for p in patterns:
+        if any(ch in p for ch in "*?["):
+            files.extend(sorted(glob.glob(p, recursive=True)))
+        else:
+            files.append(p)
+    return [f.replace(os.sep, "/") for f in files]
+
+
+def local_modules(script: str) -> list[str]:
+    """
+    Script + módulos de src/ que importa (transitivamente): si cambia el código
+    compartido (p.ej. ranking_asof.py) también cambia la firma de la etapa.
+    """
+    seen, pending = [], [script]
+    while pending:
+        path = pending.pop()
+        if path in seen or not os.path.exists(path):
+            continue
+        seen.append(path)
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        for node in ast.walk(tree):
+            names = []
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module:
+                names = [node.module]
+            for n in names:
+                candidate = f"src/{n.split('.')[0]}.py"
+                if os.path.exists(candidate):
+                    pending.append(candidate)
+    return sorted(seen)
+
+
+def stage_signature(stage: Stage, hasher: FileHasher) -> tuple[str, list[str]]:
+    h = hashlib.sha256()
+    missing = []
+    for path in local_modules(stage.script) + expand(stage.inputs):
+        digest = hasher.file(path)
+        # Basta con una de las dos versiones de la tabla (CSV o Parquet)
+        if digest is None and not any(os.path.exists(p) for p in (csv_path(path), parquet_path(path))):
+            missing.append(path)
+        h.update(f"{path}:{digest}\n".encode("utf-8"))
+    h.update(json.dumps(stage.args).encode("utf-8"))
+    return h.hexdigest(), missing
+
+
+# =========================
+# GRAFO
+# =========================
+def build_graph(stages: list[Stage]) -> dict[str, set[str]]:
+    """
+    {etapa: etapas de las que depende}, deducido de qué etapa produce cada input.
+    """
+    producers = {out: s.name for s in stages for out in s.outputs}
+    deps = {}
+    for s in stages:
+        inputs = set(expand(s.inputs)) | {i for i in s.inputs if i in producers}
+        deps[s.name] = {producers[i] for i in inputs if i in producers and producers[i] != s.name}
+    return deps
+
+
+def topo_order(deps: dict[str, set[str]]) -> list[str]:
+    order, done = [], set()
+    pending = dict(deps)
+    while pending:
+        ready = sorted(n for n, d in pending.items() if d <= done)
+        if not ready:
+            raise ValueError(f"Ciclo en el grafo de etapas: {sorted(pending)}")
+        for n in ready:
+            order.append(n)
+            done.add(n)
+            del pending[n]
+    return order
+
+
+def select_stages(deps: dict[str, set[str]], targets: list[str] | None) -> set[str]:
+    # Objetivos + todo lo que tienen aguas arriba
+    if not targets:
+        return set(deps)
+    selected, pending = set(), list(targets)
+    while pending:
+        n = pending.pop()
+        if n not in deps:
+            raise ValueError(f"Etapa desconocida: {n}")
+        if n not in selected:
+            selected.add(n)
+            pending.extend(deps[n])
+    return selected
+
+
+# =========================
+# EJECUCION
+# =========================
+def load_state(path: str = STATE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {"stages": {}, "files": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state: dict, path: str = STATE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=1)
+    os.replace(tmp, path)
+
+
+def is_up_to_date(stage: Stage, signature: str, state: dict, hasher: FileHasher) -> bool:
+    prev = state["stages"].get(stage.name)
+    if not prev or prev["signature"] != signature:
+        return False
+    # Las salidas deben seguir existiendo y no haber sido editadas a mano
+    return all(hasher.file(o) == prev["outputs"].get(o) for o in stage.outputs)
+
+
+def run_stage(stage: Stage, run_id: str, profile: bool = False) -> tuple[int, float, str]:
+    t0 = time.perf_counter()
+    cmd = [sys.executable, INSTRUMENT, "run", "--stage", stage.name, *(["--profile"] if profile else []),
+           stage.script, "--", *stage.args]
+    proc = subprocess.run(cmd, env=dict(os.environ, **{RUN_ID_ENV: run_id}),
+                          capture_output=True, text=True, encoding="utf-8", errors="replace")
+    return proc.returncode, time.perf_counter() - t0, proc.stdout + proc.stderr
+
+
+def with_window(stages: list[Stage], since: str | None) -> list[Stage]:
+    """Pasa --since a las etapas de integración; al ir en los args, cambia también su firma."""
+    if not since:
+        return stages
+    return [replace(s, args=[*s.args, "--since", since]) if s.windowed else s for s in stages]
+
+
+def run_pipeline(targets: list[str] | None = None, jobs: int = 3, force: bool = False,
+                 dry_run: bool = False, verbose: bool = False, profile: list[str] | None = None,
+                 since: str | None = None, stages: list[Stage] = STAGES) -> bool:
+    stages = with_window(stages, since)
+    by_name = {s.name: s for s in stages}
+    deps = build_graph(stages)
+    selected = select_stages(deps, targets)
+    order = [n for n in topo_order(deps) if n in selected]
+
+    state = load_state()
+    hasher = FileHasher(state.get("files"))
+
+    done, failed, status = set(), set(), {}
+    running = {}
+    run_id = time.strftime("%Y%m%d_%H%M%S")
+    profile = set(profile or [])
+
+    def launch_ready(pool):
+        for name in order:
+            if name in done or name in failed or name in running or name in status:
+                continue
+            if any(d in failed for d in deps[name] if d in selected):
+                status[name] = "bloqueada"
+                failed.add(name)
+                continue
+            if not all(d in done for d in deps[name] if d in selected):
+                continue
+
+            stage = by_name[name]
+            signature, missing = stage_signature(stage, hasher)
+            if missing and not dry_run:
+                status[name] = "ERROR"
+                failed.add(name)
+                print(f"[ERROR] {name} | faltan inputs: {missing[:5]}")
+                continue
+            upstream_pending = any(status.get(d) == "pendiente" for d in deps[name])
+            if not force and not upstream_pending and is_up_to_date(stage, signature, state, hasher):
+                status[name] = "sin cambios"
+                done.add(name)
+                print(f"[SKIP] {name} | sin cambios")
+                continue
+            if dry_run:
+                status[name] = "pendiente"
+                done.add(name)  # aguas abajo también se recalcularía
+                print(f"[PLAN] {name} -> {stage.script}")
+                continue
+
+            print(f"[RUN ] {name} -> {stage.script}")
+            running[name] = (pool.submit(run_stage, stage, run_id, name in profile), signature)
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+        launch_ready(pool)
+        while running:
+            finished, _ = wait([f for f, _ in running.values()], return_when=FIRST_COMPLETED)
+            for name in [n for n, (f, _) in running.items() if f in finished]:
+                fut, signature = running.pop(name)
+                code, elapsed, output = fut.result()
+                stage = by_name[name]
+                if verbose or code != 0:
+                    print(output.rstrip())
+                if code != 0:
+                    status[name] = "ERROR"
+                    failed.add(name)
+                    print(f"[ERROR] {name} | exit={code} | {elapsed:.1f}s")
+                    continue
+
+                state["stages"][name] = {
+                    "signature": signature,
+                    "outputs": {o: hasher.file(o) for o in stage.outputs},
+                    "finished_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "seconds": round(elapsed, 3),
+                }
+                state["files"] = hasher.cache
+                save_state(state)
+                status[name] = "OK"
+                done.add(name)
+                print(f"[OK  ] {name} | {elapsed:.1f}s")
+            launch_ready(pool)
+
+    state["files"] = hasher.cache
+    if not dry_run:
+        save_state(state)
+
+    print("\n=== RESUMEN PIPELINE ===")
+    for name in order:
+        print(f"{name:<20} {status.get(name, '-')}")
+    if any(v in ("OK", "ERROR") for v in status.values()):
+        print()
+        summary(run_id)
+    return not failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Ejecuta las etapas de src/ como un DAG con caché por hash")
+    parser.add_argument("targets", nargs="*", help="Etapas objetivo (por defecto todas)")
+    parser.add_argument("-j", "--jobs", type=int, default=3, help="Etapas en paralelo")
+    parser.add_argument("--force", action="store_true", help="Ignorar hashes y recalcular todo")
+    parser.add_argument("--dry-run", action="store_true", help="Mostrar qué se ejecutaría")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Mostrar la salida de cada etapa")
+    parser.add_argument("--list", action="store_true", help="Listar etapas y dependencias")
+    parser.add_argument("--since", default=WINDOW_SINCE, metavar="AAAA-MM-DD",
+                        help="Integrar solo la ventana del modelo (p. ej. 1993-01-01); sin él, histórico completo")
+    parser.add_argument("--profile", nargs="+", default=None, metavar="STAGE",
+                        help="Capturar cProfile de estas etapas (data/.runs/profiles)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    os.chdir(ROOT_DIR)
+
+    if args.list:
+        graph = build_graph(STAGES)
+        for name in topo_order(graph):
+            print(f"{name:<20} <- {', '.join(sorted(graph[name])) or '(RAW)'}")
+        sys.exit(0)
+
+    ok = run_pipeline(args.targets or None, jobs=args.jobs, force=args.force,
+                      dry_run=args.dry_run, verbose=args.verbose, profile=args.profile,
+                      since=args.since)
+    sys.exit(0 if ok else 1)
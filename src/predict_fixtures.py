@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from features_form import DIFF_WINDOW, DIFFS
+from model_export import MODEL_JSON, add_rank_features, design, softmax
+from schemas import parse_flag
+from storage import read_table, write_table
+from team_registry import IN_API_FIXTURES, TeamRegistry
+from team_state import STORE_FILE, TeamStateStore, state_columns
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Puntuación por lotes de partidos futuros: el modelo exportado (model_export.py) se
+# carga una vez y el estado por equipo se lee del almacén memmap de team_state.py; cada
+# lote es una búsqueda de filas por team_id + un producto de matrices. Con --warm el
+# proceso queda abierto leyendo partidos por stdin (consultas "what-if" sin volver a
+# cargar nada).
+FIXTURE_COLS = ["home_team", "away_team", "date", "neutral"]
+RANK_COLS = ["rank_position", "rank_points"]
+
+WC_LEAGUE_ID = 1       # API-Football: World Cup
+WC_SEASON = 2026
+
+
+# =========================
+# PARTIDOS DE ENTRADA
+# =========================
+def as_fixtures(fixtures) -> pd.DataFrame:
+    """DataFrame o lista de tuplas (home_team, away_team, date, neutral) -> DataFrame tipado."""
+    df = fixtures if isinstance(fixtures, pd.DataFrame) else pd.DataFrame(list(fixtures), columns=FIXTURE_COLS)
+    missing = [c for c in FIXTURE_COLS[:3] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en los partidos: {missing}")
+    df = df.reset_index(drop=True)
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    # Sin la columna (o vacía) el partido se trata como no neutral, igual que en RESULTS
+    neutral = df["neutral"] if "neutral" in df.columns else pd.Series(False, index=df.index)
+    df["neutral"] = parse_flag(neutral).fillna(False).astype(bool)
+    return df
+
+
+def load_fixtures_file(path: str) -> pd.DataFrame:
+    return as_fixtures(pd.read_csv(path) if path.endswith(".csv") else read_table(path))
+
+
+def load_api_fixtures(league_id: int = WC_LEAGUE_ID, season: int = WC_SEASON) -> pd.DataFrame:
+    """Partidos sin jugar de una liga/temporada de API-Football (fixtures_processed)."""
+    api = read_table(IN_API_FIXTURES)
+    api = api[(api["league_id"] == league_id) & (api["season"] == season) & api["home_score"].isna()]
+    reg = TeamRegistry.load()
+    df = pd.DataFrame({
+        "home_team": reg.api_names_to_kaggle(api["home_team"]).to_numpy(),
+        "away_team": reg.api_names_to_kaggle(api["away_team"]).to_numpy(),
+        "date": api["date"].to_numpy(),
+        # Mundial: todo es neutral salvo los partidos del anfitrión en casa (no viene en la API)
+        "neutral": True,
+    })
+    return as_fixtures(df)
+
+
+# =========================
+# SCORER
+# =========================
+class Scorer:
+    """Modelo + estado por equipo en memoria; predict() puntúa un lote de partidos."""
+
+    def __init__(self, model_path: str = MODEL_JSON, store_path: str = STORE_FILE,
+                 reg: TeamRegistry | None = None):
+        if not os.path.exists(model_path):
+            # model_export.py no exporta nada mientras no haya histórico de ranking
+            raise FileNotFoundError(f"No hay modelo exportado en {model_path}: python src/model_export.py "
+                                    "(necesita el histórico de ranking: datos_football_ranking.py --backfill)")
+        with open(model_path, encoding="utf-8") as f:
+            model = json.load(f)
+        self.features = model["features"]
+        self.classes = model["classes"]
+        self.mean = np.asarray(model["mean"])
+        self.std = np.asarray(model["std"])
+        self.coef = np.asarray(model["coef"])
+        self.reg = reg or TeamRegistry.load()
+
+        # Los equipos del registro sin fila en el almacén (añadidos después de construirlo)
+        # salen con NaN
+        self.store = TeamStateStore.open(store_path)
+        self.state_cols = RANK_COLS + state_columns()
+        self.last_match = self.store.watermark
+
+    def team_state(self, names: pd.Series, dates: pd.Series) -> np.ndarray:
+        # Sin registrar: un nombre desconocido (o mal escrito) es un error, no un equipo medio
+        ids = self.reg.lookup(names, dates=dates)
+        if ids.isna().any():
+            raise ValueError(f"Equipos desconocidos: {sorted(names[ids.isna()].astype(str).unique())}")
+        return self.store.lookup(ids.to_numpy(dtype=float), self.state_cols)
+
+    def build_features(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Mismas columnas que el entrenamiento (forma con lag + ranking) a partir del estado."""
+        home = self.team_state(df["home_team"], df["date"])
+        away = self.team_state(df["away_team"], df["date"])
+        X = pd.DataFrame({"neutral": df["neutral"].to_numpy(dtype=float)})
+        for j, col in enumerate(self.state_cols):
+            X[f"home_{col}"] = home[:, j]
+            X[f"away_{col}"] = away[:, j]
+        for suffix, name in DIFFS:
+            X[f"{name}_{DIFF_WINDOW}"] = X[f"home_last{DIFF_WINDOW}_{suffix}"] - X[f"away_last{DIFF_WINDOW}_{suffix}"]
+        return add_rank_features(X)
+
+    def predict(self, fixtures) -> pd.DataFrame:
+        """
+        Probabilidades p_home / p_draw / p_away por partido. Las features sin valor (equipo
+        sin ranking o con pocos partidos) se imputan con la media de entrenamiento y el
+        partido queda con complete=False.
+        """
+        df = as_fixtures(fixtures)
+        X = self.build_features(df)[self.features].to_numpy(dtype=float)
+        complete = ~np.isnan(X).any(axis=1)
+        Z = np.where(np.isnan(X), 0.0, (X - self.mean) / self.std)
+        P = softmax(design(Z) @ self.coef)
+
+        out = df[FIXTURE_COLS].copy()
+        for c in ("home", "draw", "away"):
+            out[f"p_{c}"] = P[:, self.classes.index(c)].round(4)
+        out["complete"] = complete
+        return out
+
+
+def print_predictions(pred: pd.DataFrame, elapsed: float):
+    with pd.option_context("display.max_rows", 200, "display.width", 120):
+        print(pred.assign(date=pred["date"].dt.strftime("%Y-%m-%d")).to_string(index=False))
+    print(f"Partidos: {len(pred)} | incompletos: {int((~pred['complete']).sum())} | {elapsed * 1000:.1f} ms")
+
+
+def warn_stale(scorer: Scorer, pred: pd.DataFrame):
+    if pd.notna(scorer.last_match) and (pred["date"] <= scorer.last_match).any():
+        print(f"AVISO: hay partidos con fecha <= último partido del estado ({scorer.last_match}); "
+              "la forma usada es la actual, no la de esa fecha")
+
+
+def parse_line(line: str) -> tuple:
+    parts = [p.strip() for p in line.split(",")]
+    if len(parts) not in (3, 4):
+        raise ValueError("formato: LOCAL,VISITANTE,FECHA[,NEUTRAL]")
+    return tuple(parts) if len(parts) == 4 else (*parts, False)
+
+
+def warm_loop(scorer: Scorer):
+    """
+    Modo residente: una línea por consulta. 'LOCAL,VISITANTE,FECHA[,NEUTRAL]' puntúa un
+    partido; '@fichero' puntúa un lote. Línea vacía o EOF para salir.
+    """
+    print("Listo. LOCAL,VISITANTE,FECHA[,NEUTRAL] o @fichero (línea vacía para salir)", flush=True)
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            break
+        try:
+            fixtures = load_fixtures_file(line[1:].strip()) if line.startswith("@") else [parse_line(line)]
+            t0 = time.perf_counter()
+            pred = scorer.predict(fixtures)
+            print_predictions(pred, time.perf_counter() - t0)
+        except (ValueError, OSError) as e:
+            print("ERROR:", e)
+        sys.stdout.flush()
+
+
+def main(fixtures: pd.DataFrame | None, out: str | None = None, warm: bool = False):
+    t0 = time.perf_counter()
+    try:
+        scorer = Scorer()
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+    print(f"Modelo y estado cargados en {(time.perf_counter() - t0) * 1000:.1f} ms "
+          f"| equipos: {scorer.store.n_teams}")
+
+    if fixtures is not None and len(fixtures):
+        t0 = time.perf_counter()
+        pred = scorer.predict(fixtures)
+        elapsed = time.perf_counter() - t0
+        print_predictions(pred, elapsed)
+        warn_stale(scorer, pred)
+        if out:
+            os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+            write_table(pred, out)
+            print("OK ->", out)
+    elif fixtures is not None:
+        print("No hay partidos que puntuar")
+
+    if warm:
+        warm_loop(scorer)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Probabilidades local/empate/visitante para un lote de partidos")
+    src = parser.add_mutually_exclusive_group()
+    src.add_argument("--fixtures", help="Fichero con home_team, away_team, date[, neutral] (CSV o tabla)")
+    src.add_argument("--match", nargs=4, action="append", metavar=("LOCAL", "VISITANTE", "FECHA", "NEUTRAL"),
+                     help="Un partido (repetible)")
+    src.add_argument("--api-season", type=int, nargs="?", const=WC_SEASON,
+                     help=f"Partidos sin jugar de API-Football (liga {WC_LEAGUE_ID}, por defecto temporada {WC_SEASON})")
+    parser.add_argument("--api-league", type=int, default=WC_LEAGUE_ID, help="Liga de API-Football para --api-season")
+    parser.add_argument("--out", help="Guardar las probabilidades (CSV + Parquet)")
+    parser.add_argument("--warm", action="store_true", help="Quedarse en memoria leyendo partidos por stdin")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = load_fixtures_file(args.fixtures)
+    elif args.match:
+        fixtures = as_fixtures([tuple(m) for m in args.match])
+    elif args.api_season:
+        fixtures = load_api_fixtures(args.api_league, args.api_season)
+    else:
+        fixtures = None
+    if fixtures is None and not args.warm:
+        parser.error("indica --fixtures, --match, --api-season o --warm")
+    main(fixtures, args.out, args.warm)
@@ -1,44 +1,169 @@
 import os
+import re
 import json
 import glob
+import argparse
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
+from schemas import apply_schema
+from storage import write_table
+from instrumentation import record
+
+# orjson es opcional (bastante más rápido que json para estos payloads)
+if importlib.util.find_spec("orjson"):
+    import orjson
+
+    def load_json_bytes(raw: bytes):
+        return orjson.loads(raw)
+else:
+    def load_json_bytes(raw: bytes):
+        return json.loads(raw)
 
 RAW_GLOB = "data/raw/api_football/fixtures/**/fixtures_*.json"
+MANIFEST_PATH = "data/raw/api_football/fixtures/manifest_fixtures.csv"
 OUT_DIR = "data/processed/api_football"
 OUT_FILE = os.path.join(OUT_DIR, "fixtures_processed.csv")
 
-os.makedirs(OUT_DIR, exist_ok=True)
+SNAPSHOT_RE = re.compile(r"fixtures_league_(\d+)_season_(\d+)_(\d{4}-\d{2}-\d{2}_\d{6})\.json$")
+
+# Por debajo de este nº de ficheros el pool de procesos no compensa
+MIN_FILES_FOR_POOL = 64
+
+COLUMNS = ["fixture_id", "date", "home_team", "away_team", "home_score", "away_score",
+           "tournament", "league_id", "season"]
+
+
+def norm_path(path: str) -> str:
+    # El manifest puede traer rutas de Windows
+    return os.path.normpath(path.replace("\\", "/"))
+
 
-rows = []
-files = glob.glob(RAW_GLOB, recursive=True)
+def snapshot_timestamp(path: str) -> str:
+    m = SNAPSHOT_RE.search(os.path.basename(path))
+    return m.group(3) if m else ""
 
-print("Archivos RAW encontrados:", len(files))
 
-for file in files:
-    with open(file, "r", encoding="utf-8") as f:
-        data = json.load(f)
+def has_api_errors(path: str) -> bool:
+    # Payload con `errors` no vacío (p.ej. rateLimit guardado como OK por un run antiguo)
+    with open(path, "rb") as f:
+        return bool(load_json_bytes(f.read()).get("errors"))
 
+
+def select_latest_snapshots(files: list[str], manifest_path: str = MANIFEST_PATH) -> list[str]:
+    """
+    Un único snapshot por (league, season): el de la última extracción OK del manifest
+    y, para lo que no esté en el manifest, el de timestamp más reciente en el nombre.
+    Los payloads con `errors` se saltan (se usa el snapshot anterior sin errores).
+    """
+    # (league, season) -> [(prioridad, timestamp, ruta)]; el manifest manda sobre el nombre
+    candidates = {}
+    for f in files:
+        m = SNAPSHOT_RE.search(os.path.basename(f))
+        if not m:
+            continue
+        key = (int(m.group(1)), int(m.group(2)))
+        candidates.setdefault(key, []).append((0, m.group(3), norm_path(f)))
+
+    if os.path.exists(manifest_path):
+        man = pd.read_csv(manifest_path, usecols=["extract_timestamp", "league_id", "season", "status", "raw_file_path"])
+        ok = man[man["status"] == "OK"].sort_values("extract_timestamp").groupby(["league_id", "season"]).tail(1)
+        for row in ok.itertuples(index=False):
+            path = norm_path(row.raw_file_path)
+            if os.path.exists(path):
+                candidates.setdefault((int(row.league_id), int(row.season)), []).append(
+                    (1, row.extract_timestamp, path))
+
+    latest, skipped = [], set()
+    for options in candidates.values():
+        for _, _, path in sorted(options, reverse=True):
+            if path in skipped:
+                continue
+            if not has_api_errors(path):
+                latest.append(path)
+                break
+            skipped.add(path)
+    if skipped:
+        print("Snapshots con errors en el payload (omitidos):", len(skipped))
+    return sorted(latest)
+
+
+def flatten_file(path: str) -> dict:
+    """
+    Aplana un JSON de fixtures directamente a columnas (sin un dict por fila).
+    """
+    with open(path, "rb") as f:
+        data = load_json_bytes(f.read())
+
+    cols = {c: [] for c in COLUMNS}
     for m in data.get("response", []):
-        rows.append({
-            "fixture_id": m["fixture"]["id"],
-            # ISO: YYYY-MM-DD
-            "date": m["fixture"]["date"][:10],
-            "home_team": m["teams"]["home"]["name"],
-            "away_team": m["teams"]["away"]["name"],
-            # usar "goals" de la API como score final
-            "home_score": m["goals"]["home"],
-            "away_score": m["goals"]["away"],
-            "tournament": m["league"]["name"],
-            "league_id": m["league"]["id"],
-            "season": m["league"]["season"],
-            "source": "api_football"
-        })
-
-df = pd.DataFrame(rows)
-
-# Convertir date a datetime (para joins/orden)
-df["date"] = pd.to_datetime(df["date"], errors="coerce")
-
-df.to_csv(OUT_FILE, index=False, encoding="utf-8")
-print("OK ->", OUT_FILE, "| filas:", len(df))
-print(df.head(5))
+        fixture, teams, goals, league = m["fixture"], m["teams"], m["goals"], m["league"]
+        cols["fixture_id"].append(fixture["id"])
+        # ISO: YYYY-MM-DD
+        cols["date"].append(fixture["date"][:10])
+        cols["home_team"].append(teams["home"]["name"])
+        cols["away_team"].append(teams["away"]["name"])
+        # usar "goals" de la API como score final
+        cols["home_score"].append(goals["home"])
+        cols["away_score"].append(goals["away"])
+        cols["tournament"].append(league["name"])
+        cols["league_id"].append(league["id"])
+        cols["season"].append(league["season"])
+    return cols
+
+
+def flatten_files(files: list[str], workers: int | None = None) -> pd.DataFrame:
+    cols = {c: [] for c in COLUMNS}
+
+    def collect(parts):
+        for part in parts:
+            for c in COLUMNS:
+                cols[c].extend(part[c])
+
+    if workers == 1 or len(files) < MIN_FILES_FOR_POOL:
+        collect(map(flatten_file, files))
+    else:
+        workers = workers or os.cpu_count()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            collect(pool.map(flatten_file, files, chunksize=max(1, len(files) // (workers * 8))))
+
+    df = pd.DataFrame(cols, columns=COLUMNS)
+    df["source"] = "api_football"
+    return df
+
+
+def main(workers: int | None = None, all_snapshots: bool = False):
+    os.makedirs(OUT_DIR, exist_ok=True)
+
+    files = glob.glob(RAW_GLOB, recursive=True)
+    print("Archivos RAW encontrados:", len(files))
+
+    if all_snapshots:
+        files = sorted(files, key=snapshot_timestamp)
+    else:
+        files = select_latest_snapshots(files)
+        print("Snapshots usados (último por liga/temporada):", len(files))
+
+    df = flatten_files(files, workers=workers)
+    record("read", files, len(df))
+
+    # Si un fixture aparece en varios snapshots, gana el último (ficheros en orden de extracción)
+    n_before = len(df)
+    df = df.drop_duplicates(subset=["fixture_id"], keep="last").reset_index(drop=True)
+    print("Duplicados por fixture_id eliminados:", n_before - len(df))
+
+    # Tipos del esquema: date a datetime (para joins/orden), marcadores Int8, texto como category
+    df = apply_schema(df, "api_fixtures")
+
+    write_table(df, OUT_FILE)
+    print("OK ->", OUT_FILE, "| filas:", len(df))
+    print(df.head(5))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=None, help="Procesos para aplanar (por defecto nº de CPUs)")
+    parser.add_argument("--all-snapshots", action="store_true",
+                        help="Ingerir todos los snapshots (comportamiento antiguo; se deduplica igualmente)")
+    args = parser.parse_args()
+    main(workers=args.workers, all_snapshots=args.all_snapshots)
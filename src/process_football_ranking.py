@@ -1,14 +1,94 @@
+import os
+import re
 import glob
 import pandas as pd
+from schemas import apply_schema
+from storage import write_table
+from instrumentation import record
 
-files = glob.glob("data/raw/football_ranking/*.csv")
-dfs = [pd.read_csv(f) for f in files]
+RAW_GLOB = "data/raw/fifa_ranking/football_ranking_raw_*.csv"
+HISTORY_GLOB = "data/raw/fifa_ranking/history/rank_date=*/ranking.csv"
 
-df_rank = pd.concat(dfs, ignore_index=True)
+OUT_DIR = "data/processed/football_ranking"
+OUT_FILE = os.path.join(OUT_DIR, "ranking_processed.csv")
+OUT_HISTORY = os.path.join(OUT_DIR, "ranking_history.csv")
 
-df_rank["points"] = df_rank["points"].astype(str).str.replace(",", "").astype(float)
-df_rank["team"] = df_rank["team"].str.replace(r"\s*\(.*\)", "", regex=True)
+# football_ranking_raw_<extraccion>_<periodo>_page_<n>.csv -> periodo '19_January_2026'
+PERIOD_IN_NAME_RE = re.compile(r"football_ranking_raw_\d{4}-\d{2}-\d{2}_(.+)_page_\d+\.csv$")
+TEAM_CODE_RE = re.compile(r"\(([A-Z]{3})\)")
 
-df_rank = df_rank.drop_duplicates(subset=["team"])
 
-df_rank.to_csv("data/processed/football_ranking/ranking_processed.csv", index=False)
+def clean_ranking(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df["points"] = df["points"].astype(str).str.replace(",", "").astype(float)
+    df["team_code"] = df["team"].str.extract(TEAM_CODE_RE, expand=False)
+    df["team"] = df["team"].str.replace(r"\s*\(.*\)", "", regex=True)
+    return df
+
+
+def period_from_filename(path: str):
+    m = PERIOD_IN_NAME_RE.search(os.path.basename(path))
+    if not m:
+        return pd.NaT
+    return pd.to_datetime(m.group(1).replace("_", " "), format="%d %B %Y", errors="coerce")
+
+
+def build_current(files: list[str]) -> pd.DataFrame:
+    # Snapshot actual: un registro por equipo (el más reciente gana)
+    dfs = [pd.read_csv(f) for f in files]
+    df_rank = pd.concat(dfs, ignore_index=True)
+
+    df_rank["points"] = df_rank["points"].astype(str).str.replace(",", "").astype(float)
+    df_rank["team"] = df_rank["team"].str.replace(r"\s*\(.*\)", "", regex=True)
+
+    df_rank = df_rank.drop_duplicates(subset=["team"], keep="last")
+    return df_rank.sort_values("position", kind="stable")
+
+
+def build_history(files: list[str], history_files: list[str]) -> pd.DataFrame:
+    """
+    Tabla histórica compacta: una fila por (rank_date, equipo), ordenada por fecha y posición.
+    Incluye las particiones del backfill y el snapshot actual (fecha tomada del nombre).
+    """
+    parts = [pd.read_csv(f, dtype={"team": str, "points": str}) for f in history_files]
+    for f in files:
+        df = pd.read_csv(f, dtype={"team": str, "points": str})
+        df.insert(0, "rank_date", period_from_filename(f))
+        parts.append(df)
+    if not parts:
+        return pd.DataFrame(columns=["rank_date", "team", "team_code", "position", "points"])
+
+    hist = clean_ranking(pd.concat(parts, ignore_index=True))
+    hist["points"] = hist["points"].round(2)
+    hist = apply_schema(hist, "ranking_history").dropna(subset=["rank_date"])
+
+    hist = (
+        hist[["rank_date", "team", "team_code", "position", "points"]]
+        .drop_duplicates(subset=["rank_date", "team"])
+        .sort_values(["rank_date", "position"])
+        .reset_index(drop=True)
+    )
+    return hist
+
+
+def main():
+    os.makedirs(OUT_DIR, exist_ok=True)
+
+    # Orden por nombre -> el snapshot más reciente queda al final
+    files = sorted(glob.glob(RAW_GLOB))
+    history_files = sorted(glob.glob(HISTORY_GLOB))
+
+    if files:
+        df_rank = build_current(files)
+        write_table(df_rank, OUT_FILE)
+        print("OK ->", OUT_FILE, "| filas:", len(df_rank))
+
+    hist = build_history(files, history_files)
+    record("read", files + history_files, len(hist))
+    write_table(hist, OUT_HISTORY, date_format="%Y-%m-%d", float_format="%.2f")
+    print("OK ->", OUT_HISTORY, "| filas:", len(hist),
+          "| periodos:", hist["rank_date"].nunique(), "| equipos:", hist["team"].nunique())
+
+
+if __name__ == "__main__":
+    main()
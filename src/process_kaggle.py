@@ -1,92 +1,89 @@
 import os
+import argparse
 import pandas as pd
+from schemas import apply_schema, iter_csv_schema, read_csv_schema
+from storage import CHUNK_ROWS, TableWriter, write_table
 
 RAW_DIR = "data/raw/kaggle"
 OUT_DIR = "data/processed/kaggle"
 
-os.makedirs(OUT_DIR, exist_ok=True)
 
-def load_raw_csv(basename: str) -> pd.DataFrame:
+def raw_path(basename: str) -> str:
     """
-    Carga un CSV desde RAW con nombre exacto (sin o con .csv).
+    Ruta de un CSV de RAW con nombre exacto (sin o con .csv).
     Soporta que en Windows a veces se vea como 'results' pero realmente sea 'results.csv'.
     """
     p1 = os.path.join(RAW_DIR, f"{basename}.csv")
     p2 = os.path.join(RAW_DIR, basename)
 
     if os.path.exists(p1):
-        return pd.read_csv(p1)
+        return p1
     if os.path.exists(p2):
-        return pd.read_csv(p2)
+        return p2
 
     raise FileNotFoundError(f"No encontré {basename}.csv ni {basename} dentro de {RAW_DIR}")
 
 
+def load_raw_csv(basename: str) -> pd.DataFrame:
+    """Carga un CSV de RAW con los tipos de su esquema (schemas.py: el esquema se llama como el fichero)."""
+    return read_csv_schema(raw_path(basename), basename)
+
+
 def save_processed(df: pd.DataFrame, out_name: str):
     out_path = os.path.join(OUT_DIR, out_name)
-    df.to_csv(out_path, index=False, encoding="utf-8")
+    write_table(df, out_path)
     print(f"OK -> {out_name} | filas={len(df)}")
 
 
-# =========================
-# 1) RESULTS (partidos)
-# =========================
-df_results = load_raw_csv("results")
-
-# Fecha
-if "date" in df_results.columns:
-    df_results["date"] = pd.to_datetime(df_results["date"], errors="coerce")
-
-# Strings comunes
-for c in ["home_team", "away_team", "tournament", "city", "country", "neutral"]:
-    if c in df_results.columns:
-        df_results[c] = df_results[c].astype(str).str.strip()
-
-save_processed(df_results, "results_processed.csv")
+def process_chunked(basename: str, out_name: str, chunksize: int):
+    """RAW -> processed por bloques: leer, tipar y escribir sin tener la tabla entera en memoria."""
+    with TableWriter(os.path.join(OUT_DIR, out_name)) as out:
+        for chunk in iter_csv_schema(raw_path(basename), basename, chunksize):
+            out.write(chunk)
+    print(f"OK -> {out_name} | filas={out.rows} | bloques de {chunksize}")
 
 
-# =========================
-# 2) SHOOTOUTS (penales)
-# =========================
-df_shoot = load_raw_csv("shootouts")
+def process(basename: str, out_name: str, chunksize: int | None):
+    if chunksize:
+        process_chunked(basename, out_name, chunksize)
+    else:
+        save_processed(load_raw_csv(basename), out_name)
 
-if "date" in df_shoot.columns:
-    df_shoot["date"] = pd.to_datetime(df_shoot["date"], errors="coerce")
 
-for c in ["home_team", "away_team", "winner"]:
-    if c in df_shoot.columns:
-        df_shoot[c] = df_shoot[c].astype(str).str.strip()
+def main(chunksize: int | None = None):
+    os.makedirs(OUT_DIR, exist_ok=True)
 
-save_processed(df_shoot, "shootouts_processed.csv")
+    # =========================
+    # 1) RESULTS (partidos)
+    # =========================
+    process("results", "results_processed.csv", chunksize)
 
 
-# =========================
-# 3) GOALSCORERS (goles individuales)
-# =========================
-df_goals = load_raw_csv("goalscorers")
+    # =========================
+    # 2) SHOOTOUTS (penales)
+    # =========================
+    process("shootouts", "shootouts_processed.csv", chunksize)
 
-if "date" in df_goals.columns:
-    df_goals["date"] = pd.to_datetime(df_goals["date"], errors="coerce")
 
-for c in ["home_team", "away_team", "team", "scorer", "minute", "own_goal", "penalty"]:
-    if c in df_goals.columns:
-        df_goals[c] = df_goals[c].astype(str).str.strip()
+    # =========================
+    # 3) GOALSCORERS (goles individuales)
+    # =========================
+    process("goalscorers", "goalscorers_processed.csv", chunksize)
 
-save_processed(df_goals, "goalscorers_processed.csv")
 
+    # =========================
+    # 4) FORMER_NAMES (nombres históricos)
+    # =========================
+    df_names = load_raw_csv("former_names")
 
-# =========================
-# 4) FORMER_NAMES (nombres históricos)
-# =========================
-df_names = load_raw_csv("former_names")
+    # El dataset a veces usa 'from' y 'to' en lugar de start_date / end_date
+    df_names = apply_schema(df_names.rename(columns={"from": "start_date", "to": "end_date"}), "former_names")
 
-# Fechas (el dataset a veces usa 'from' y 'to')
-for col in ["from", "to", "start_date", "end_date"]:
-    if col in df_names.columns:
-        df_names[col] = pd.to_datetime(df_names[col], errors="coerce")
+    save_processed(df_names, "former_names_processed.csv")
 
-for c in df_names.columns:
-    if df_names[c].dtype == "object":
-        df_names[c] = df_names[c].astype(str).str.strip()
 
-save_processed(df_names, "former_names_processed.csv")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="RAW de Kaggle -> processed con tipos")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_ROWS,
+                        help="Filas por bloque (modo out-of-core; por defecto TFM_CHUNK_ROWS o todo en memoria)")
+    main(parser.parse_args().chunksize)
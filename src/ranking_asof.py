@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from storage import read_table
+
+
+IN_RANKING_HISTORY = "data/processed/football_ranking/ranking_history.csv"
+
+# Columnas del histórico que usa el join as-of (team_code no hace falta)
+RANKING_COLS = ["rank_date", "team", "position", "points"]
+
+# Desplazamiento para que los días (desde 1970) de partidos del s. XIX sean positivos
+_DAY_OFFSET = 1 << 20
+
+
+def load_ranking_history(path: str = IN_RANKING_HISTORY) -> pd.DataFrame:
+    hist = read_table(path, RANKING_COLS, schema="ranking_history")
+    # El histórico guarda float32 (2 decimales): volver a float64 sin arrastrar ruido
+    hist["points"] = hist["points"].astype("float64").round(2)
+    return hist
+
+
+class RankingIndex:
+    """
+    Índice ordenado (equipo, fecha de publicación) sobre el histórico del ranking.
+    Cada consulta es un searchsorted: O(log n) por partido y sin merges de pandas.
+    """
+
+    def __init__(self, history: pd.DataFrame, team_col: str = "team_norm"):
+        h = history.dropna(subset=[team_col, "rank_date"])
+        codes, self.teams = pd.factorize(h[team_col])
+        days = h["rank_date"].to_numpy(dtype="datetime64[D]").astype(np.int64)
+
+        keys = (codes.astype(np.int64) << 32) | (days + _DAY_OFFSET)
+        order = np.argsort(keys, kind="stable")
+
+        self.keys = keys[order]
+        self.position = h["position"].to_numpy(dtype=float)[order]
+        self.points = h["points"].to_numpy(dtype=float)[order]
+        self.rank_date = h["rank_date"].to_numpy()[order]
+
+    def lookup(self, teams: pd.Series, dates: pd.Series | None) -> pd.DataFrame:
+        """
+        Último ranking publicado estrictamente antes de cada fecha.
+        Con dates=None devuelve el último ranking disponible (modo estático).
+        """
+        codes = self.teams.get_indexer(teams)
+        if len(self.keys) == 0:
+            return pd.DataFrame({"position": np.nan, "points": np.nan, "rank_date": pd.NaT}, index=teams.index)
+
+        if dates is None:
+            days = np.full(len(codes), np.iinfo(np.int32).max - _DAY_OFFSET, dtype=np.int64)
+            has_date = np.ones(len(codes), dtype=bool)
+        else:
+            d = pd.to_datetime(dates).to_numpy(dtype="datetime64[D]")
+            has_date = ~np.isnat(d)
+            days = np.where(has_date, d.astype(np.int64), 0)
+
+        q = (np.maximum(codes, 0).astype(np.int64) << 32) | (days + _DAY_OFFSET)
+        # side="left" -> solo publicaciones con fecha < fecha del partido
+        idx = np.searchsorted(self.keys, q, side="left") - 1
+
+        valid = (codes >= 0) & has_date & (idx >= 0)
+        valid[valid] = (self.keys[idx[valid]] >> 32) == codes[valid]
+
+        safe = np.where(valid, idx, 0)
+        return pd.DataFrame({
+            "position": np.where(valid, self.position[safe], np.nan),
+            "points": np.where(valid, self.points[safe], np.nan),
+            "rank_date": pd.Series(self.rank_date[safe], index=teams.index).where(valid),
+        }, index=teams.index)
+
+
+def attach_ranking_asof(df: pd.DataFrame, history: pd.DataFrame, date_col: str = "date",
+                        home_col: str = "home_team_norm", away_col: str = "away_team_norm",
+                        team_col: str = "team_norm", static: bool = False) -> pd.DataFrame:
+    """
+    Añade home/away_rank_position, home/away_rank_points, home/away_rank_date y
+    rank_points_diff con el ranking vigente antes de cada partido (sin fuga de información).
+    `team_col` es la clave de equipo en el histórico (nombre normalizado o team_id del registro).
+    static=True reproduce el join antiguo: el último ranking disponible para todos los partidos.
+    """
+    index = RankingIndex(history, team_col=team_col)
+    dates = None if static else df[date_col]
+
+    out = df.copy()
+    for side, col in (("home", home_col), ("away", away_col)):
+        r = index.lookup(df[col], dates)
+        out[f"{side}_rank_position"] = r["position"]
+        out[f"{side}_rank_points"] = r["points"]
+        out[f"{side}_rank_date"] = r["rank_date"]
+
+    out["rank_points_diff"] = out["home_rank_points"] - out["away_rank_points"]
+    return out
+
+
+def ranking_with_team_ids(history: pd.DataFrame, registry) -> pd.DataFrame:
+    """Histórico con la clave team_id del registro de equipos (team_registry.TeamRegistry)."""
+    rank = history.copy()
+    rank["team_id"] = registry.resolve(rank["team"], source="ranking")
+    return rank[["team_id", "rank_date", "position", "points"]]
+
+
+def attach_team_ranking(df: pd.DataFrame, rank: pd.DataFrame, registry, static: bool = False) -> pd.DataFrame:
+    """
+    Resuelve home/away_team_id (alias + nombres históricos), añade los nombres del
+    ranking (*_team_norm, informativos) y hace el join as-of por team_id.
+    `rank` es la salida de ranking_with_team_ids. Sin histórico (un solo periodo) los
+    partidos anteriores a esa publicación quedan sin ranking, nunca con uno posterior.
+    """
+    df = df.copy()
+    df["home_team_id"] = registry.resolve(df["home_team"], dates=df["date"])
+    df["away_team_id"] = registry.resolve(df["away_team"], dates=df["date"])
+    df["home_team_norm"] = registry.ranking_names(df["home_team"])
+    df["away_team_norm"] = registry.ranking_names(df["away_team"])
+    return attach_ranking_asof(df, rank, home_col="home_team_id", away_col="away_team_id",
+                               team_col="team_id", static=static)
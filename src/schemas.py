@@ -0,0 +1,200 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+from instrumentation import record
+
+
+# =========================
+# ESQUEMAS (tipos por tabla)
+# =========================
+# Un único sitio con los dtypes de cada tabla. Tipos lógicos:
+#   date      -> datetime64 (errores -> NaT)
+#   category  -> texto repetido (equipos, torneos, ciudades...), sin 'nan' como texto
+#   str       -> texto libre, nulos como nulos
+#   minute    -> minuto del gol como Int16; el tiempo añadido se trunca ("90+2" -> 90, ver parse_minute)
+#   boolean   -> flags TRUE/FALSE/1/0/yes/no como boolean nullable
+#   resto     -> dtype de pandas tal cual (Int8 para marcadores: nullable y 1 byte)
+SCHEMAS = {
+    # --- Kaggle (RAW y processed) ---
+    "results": {
+        "date": "date", "home_team": "category", "away_team": "category",
+        "home_score": "Int8", "away_score": "Int8",
+        "tournament": "category", "city": "category", "country": "category", "neutral": "boolean",
+    },
+    "shootouts": {
+        "date": "date", "home_team": "category", "away_team": "category",
+        "winner": "category", "first_shooter": "category",
+    },
+    "goalscorers": {
+        "date": "date", "home_team": "category", "away_team": "category", "team": "category",
+        "scorer": "category", "minute": "minute", "own_goal": "boolean", "penalty": "boolean",
+    },
+    "former_names": {
+        "current": "str", "former": "str", "start_date": "date", "end_date": "date",
+    },
+    # --- API-Football (processed) ---
+    "api_fixtures": {
+        "fixture_id": "int64", "date": "date", "home_team": "category", "away_team": "category",
+        "home_score": "Int8", "away_score": "Int8", "tournament": "category",
+        "league_id": "int32", "season": "int16", "source": "category",
+    },
+    # --- Ranking FIFA (processed) ---
+    "ranking_history": {
+        "rank_date": "date", "team": "category", "team_code": "category",
+        "position": "int16", "points": "float32",
+    },
+}
+
+# Tablas del informe de memoria: (esquema, ruta CSV)
+REPORT_TABLES = [
+    ("results", "data/raw/kaggle/results.csv"),
+    ("shootouts", "data/raw/kaggle/shootouts.csv"),
+    ("goalscorers", "data/raw/kaggle/goalscorers.csv"),
+    ("former_names", "data/raw/kaggle/former_names.csv"),
+    ("api_fixtures", "data/processed/api_football/fixtures_processed.csv"),
+    ("ranking_history", "data/processed/football_ranking/ranking_history.csv"),
+]
+
+FLAG_VALUES = {"true": True, "1": True, "yes": True, "false": False, "0": False, "no": False}
+
+
+# =========================
+# CONVERSIONES (sobre valores únicos cuando hay texto)
+# =========================
+def to_category(s: pd.Series) -> pd.Series:
+    """Texto -> category con strip; el strip se hace sobre las categorías, no fila a fila."""
+    if s.dtype != "category":
+        s = s.astype("category")
+    cats = s.cat.categories.astype(str).str.strip()
+    codes, uniques = pd.factorize(cats)
+    row_codes = s.cat.codes.to_numpy()
+    new_codes = np.where(row_codes >= 0, codes[row_codes], -1)
+    return pd.Series(pd.Categorical.from_codes(new_codes, categories=uniques), index=s.index, name=s.name)
+
+
+def to_text(s: pd.Series) -> pd.Series:
+    return s.astype("string").str.strip()
+
+
+def parse_minute(s: pd.Series) -> pd.Series:
+    """
+    Minuto del gol como Int16. El goalscorers.csv de Kaggle ya trae los goles del tiempo
+    añadido en el minuto base (90, no 92) y sin "+": aquí solo se convierte el float del
+    CSV. Si llega texto tipo "90+2" se trunca igual, a 90: los minutos añadidos se pierden
+    (no hay columna para ellos) y el minuto queda comparable con el resto del dataset.
+    """
+    if pd.api.types.is_numeric_dtype(s):
+        return s.astype("Float64").round().astype("Int16")
+    base = s.astype("str").str.extract(r"^\s*(\d+)", expand=False)
+    return pd.to_numeric(base, errors="coerce").astype("Int16")
+
+
+def parse_flag(s: pd.Series) -> pd.Series:
+    if pd.api.types.is_bool_dtype(s):
+        return s.astype("boolean")
+    codes, uniques = pd.factorize(s)
+    mapped = pd.Series(uniques).astype(str).str.strip().str.lower().map(FLAG_VALUES)
+    values = mapped.to_numpy(dtype=object)[codes]
+    values[codes < 0] = None
+    return pd.Series(values, index=s.index, name=s.name).astype("boolean")
+
+
+def convert(s: pd.Series, kind: str) -> pd.Series:
+    if kind == "date":
+        return s if pd.api.types.is_datetime64_any_dtype(s) else pd.to_datetime(s, errors="coerce")
+    if kind == "category":
+        return to_category(s)
+    if kind == "str":
+        return to_text(s)
+    if kind == "minute":
+        return parse_minute(s)
+    if kind == "boolean":
+        return parse_flag(s)
+    if not pd.api.types.is_numeric_dtype(s):
+        s = pd.to_numeric(s.astype("str").str.replace(",", "", regex=False), errors="coerce")
+    return s.astype(kind)
+
+
+def apply_schema(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """Aplica el esquema `name` a las columnas presentes; el resto no se toca."""
+    schema = SCHEMAS[name]
+    for c, kind in schema.items():
+        if c in df.columns:
+            df[c] = convert(df[c], kind)
+    return df
+
+
+def read_dtypes(name: str) -> dict:
+    # dtypes para read_csv: el texto repetido entra ya como category (sin columnas object)
+    out = {}
+    for c, kind in SCHEMAS[name].items():
+        if kind == "category":
+            out[c] = "category"
+        elif kind in ("str", "minute", "boolean"):
+            out[c] = "str"
+    return out
+
+
+def read_csv_schema(path: str, name: str, **kwargs) -> pd.DataFrame:
+    header = pd.read_csv(path, nrows=0, **kwargs).columns
+    dtypes = {c: t for c, t in read_dtypes(name).items() if c in header}
+    df = apply_schema(pd.read_csv(path, dtype=dtypes, **kwargs), name)
+    record("read", path, len(df))
+    return df
+
+
+def iter_csv_schema(path: str, name: str, chunksize: int, **kwargs):
+    """read_csv_schema por bloques de `chunksize` filas."""
+    header = pd.read_csv(path, nrows=0, **kwargs).columns
+    dtypes = {c: t for c, t in read_dtypes(name).items() if c in header}
+    n = 0
+    for df in pd.read_csv(path, dtype=dtypes, chunksize=chunksize, **kwargs):
+        n += len(df)
+        yield apply_schema(df, name)
+    record("read", path, n)
+
+
+# =========================
+# INFORME DE MEMORIA
+# =========================
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1e6
+
+
+def memory_report(tables: list[tuple[str, str]] = REPORT_TABLES) -> pd.DataFrame:
+    """Memoria con la inferencia por defecto de pandas vs con el esquema, por tabla."""
+    rows = []
+    for name, path in tables:
+        if not os.path.exists(path):
+            continue
+        before = pd.read_csv(path)
+        after = read_csv_schema(path, name)
+        rows.append({
+            "table": name,
+            "rows": len(after),
+            "default_mb": memory_mb(before),
+            "schema_mb": memory_mb(after),
+            # nulos de texto que antes acababan como la cadena 'nan'
+            "text_nulls": int(sum(after[c].isna().sum() for c in read_dtypes(name) if c in after.columns)),
+        })
+    report = pd.DataFrame(rows)
+    if len(report):
+        report["ratio"] = report["default_mb"] / report["schema_mb"]
+    return report
+
+
+def main():
+    report = memory_report()
+    if report.empty:
+        sys.exit("No hay tablas para el informe (¿faltan los RAW o src/pipeline.py?).")
+    with pd.option_context("display.float_format", "{:.2f}".format, "display.width", 120):
+        print(report.to_string(index=False))
+    total = report[["default_mb", "schema_mb"]].sum()
+    print(f"\nTotal: {total['default_mb']:.2f} MB -> {total['schema_mb']:.2f} MB")
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Informe de memoria por tabla (inferencia por defecto vs esquema)").parse_args()
+    main()
@@ -0,0 +1,330 @@
+import os
+import sys
+import time
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from team_registry import TeamRegistry
+from team_state import STORE_FILE, TeamStateStore
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Monte Carlo del Mundial 2026 (48 equipos): 12 grupos de 4, pasan los dos primeros y
+# los 8 mejores terceros a dieciseisavos, y eliminatorias a partido único con penales.
+# Cada bloque simula miles de torneos a la vez con arrays de NumPy; los bloques se
+# reparten en procesos y cada uno tiene su propia semilla (SeedSequence.spawn), así el
+# resultado depende de --seed y no del número de procesos.
+OUT_FILE = "models/output/wc2026_simulation.csv"
+
+N_SIMS = 100_000
+CHUNK = 20_000                 # torneos por bloque (memoria ~ CHUNK * 12 * 4 * 4)
+SEED = 2026
+TOURNAMENT_START = "2026-06-11"
+
+GROUPS = list("ABCDEFGHIJKL")
+GROUP_SIZE = 4
+N_TEAMS = len(GROUPS) * GROUP_SIZE
+N_THIRDS = 8
+
+HOSTS = {"United States", "Mexico", "Canada"}   # juegan con ventaja de campo
+
+# Probabilidades desde el Elo: p_draw = DRAW_BASE * (1 - |2E - 1|) (máxima entre iguales)
+HOME_ADVANTAGE = 100.0
+DRAW_BASE = 0.28
+PENALTY_WIN = 0.5              # probabilidad de ganar una tanda
+
+# Marcador condicionado al resultado (medias aproximadas del fútbol de selecciones):
+# perdedor ~ Poisson(LOSER_GOALS), margen ~ 1 + Poisson(MARGIN_EXTRA), empate ~ Poisson(DRAW_GOALS)
+LOSER_GOALS = 0.5
+MARGIN_EXTRA = 0.7
+DRAW_GOALS = 0.9
+
+# Cuadro de dieciseisavos (partidos 73-88 del calendario): "1E" = primero del grupo E,
+# "2A" = segundo del A, "3" = uno de los 8 mejores terceros (ver THIRD_SLOTS)
+R32 = [
+    ("2A", "2B"), ("1E", "3"), ("1F", "2C"), ("1C", "2F"),
+    ("1I", "3"), ("2E", "2I"), ("1A", "3"), ("1L", "3"),
+    ("1D", "3"), ("1G", "3"), ("2K", "2L"), ("1H", "2J"),
+    ("1B", "3"), ("1J", "2H"), ("1K", "3"), ("2D", "2G"),
+]
+# Grupos de los que puede venir el tercero de cada cruce con "3", en orden de R32
+THIRD_SLOTS = ["ABCDF", "CDFGH", "CEFHI", "EHIJK", "BEFIJ", "AEHIJ", "EFGIJ", "DEIJL"]
+
+# Siguientes rondas: pares de índices de partido de la ronda anterior
+R16 = [(1, 4), (0, 2), (3, 5), (6, 7), (10, 11), (8, 9), (13, 15), (12, 14)]
+QF = [(0, 1), (4, 5), (2, 3), (6, 7)]
+SF = [(0, 1), (2, 3)]
+
+STAGES = ["group_1st", "r32", "r16", "qf", "sf", "final", "champion"]
+PAIRS = list(itertools.combinations(range(GROUP_SIZE), 2))
+
+
+# =========================
+# TERCEROS: tabla de asignación
+# =========================
+def third_place_table() -> np.ndarray:
+    """
+    Para cada combinación de 8 grupos con tercero clasificado (máscara de 12 bits), el
+    grupo del tercero que va a cada cruce de THIRD_SLOTS. Se toma la primera asignación
+    válida (búsqueda con vuelta atrás en el orden de los cruces): cumple las
+    restricciones del cuadro, aunque puede no coincidir con la tabla oficial de FIFA.
+    """
+    allowed = [[GROUPS.index(g) for g in s] for s in THIRD_SLOTS]
+    table = np.full((1 << len(GROUPS), N_THIRDS), -1, dtype=np.int8)
+
+    def assign(slot, free, out):
+        if slot == N_THIRDS:
+            return True
+        for g in allowed[slot]:
+            if g in free:
+                out.append(g)
+                if assign(slot + 1, free - {g}, out):
+                    return True
+                out.pop()
+        return False
+
+    for combo in itertools.combinations(range(len(GROUPS)), N_THIRDS):
+        out = []
+        if not assign(0, set(combo), out):
+            raise ValueError(f"Sin asignación válida de terceros para los grupos {combo}")
+        table[sum(1 << g for g in combo)] = out
+    return table
+
+
+# =========================
+# PROBABILIDADES POR PARTIDO (matriz 48 x 48)
+# =========================
+def elo_probabilities(ratings: np.ndarray, host: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Victoria y empate de i contra j desde el Elo (ventaja de campo para los anfitriones)."""
+    adv = HOME_ADVANTAGE * (host[:, None].astype(float) - host[None, :])
+    e = 1 / (10 ** (-(ratings[:, None] - ratings[None, :] + adv) / 400) + 1)
+    draw = DRAW_BASE * (1 - np.abs(2 * e - 1))
+    return e - draw / 2, draw
+
+
+def model_probabilities(names: list[str], host: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Victoria y empate desde el modelo exportado (predict_fixtures.Scorer), en un solo lote
+    con todos los pares ordenados. En campo neutral se promedian las dos orientaciones; si
+    juega un anfitrión se usa solo la orientación con el anfitrión como local. Como en la
+    ruta Elo, si a algún equipo le falta estado (ranking o forma) se sale con error.
+    """
+    from predict_fixtures import Scorer
+    i, j = np.where(~np.eye(len(names), dtype=bool))
+    fixtures = pd.DataFrame({"home_team": np.asarray(names)[i], "away_team": np.asarray(names)[j],
+                             "date": TOURNAMENT_START, "neutral": ~host[i]})
+    try:
+        scorer = Scorer()
+    except FileNotFoundError as e:
+        sys.exit(str(e))
+    pred = scorer.predict(fixtures)
+    bad = ~pred["complete"].to_numpy()
+    if bad.any():
+        # Un equipo sin estado deja incompletos todos sus partidos
+        n_bad = np.bincount(np.concatenate([i[bad], j[bad]]), minlength=len(names))
+        missing = [n for n, c in zip(names, n_bad) if c == 2 * (len(names) - 1)]
+        missing = missing or sorted(set(fixtures["home_team"][bad]))
+        sys.exit(f"Equipos sin ranking o forma en el almacén (python src/team_state.py): {missing}")
+    home, draw, away = (np.zeros((len(names), len(names))) for _ in range(3))
+    home[i, j], draw[i, j], away[i, j] = pred["p_home"], pred["p_draw"], pred["p_away"]
+
+    win = (home + away.T) / 2
+    tie = (draw + draw.T) / 2
+    host_home = host[:, None] & ~host[None, :]
+    win = np.where(host_home, home, np.where(host_home.T, away.T, win))
+    tie = np.where(host_home, draw, np.where(host_home.T, draw.T, tie))
+    return win, tie
+
+
+# =========================
+# SIMULACION (un bloque de torneos)
+# =========================
+def knockout(rng: np.random.Generator, a: np.ndarray, b: np.ndarray, advance: np.ndarray) -> np.ndarray:
+    return np.where(rng.random(a.shape) < advance[a, b], a, b)
+
+
+def simulate_chunk(task: tuple) -> np.ndarray:
+    """Simula n torneos; devuelve cuántas veces alcanza cada equipo cada fase (48 x STAGES)."""
+    win, draw, groups, n, seed, table = task
+    rng = np.random.default_rng(seed)
+    advance = win + draw * PENALTY_WIN
+    G = groups                                     # (12, 4) índices de equipo
+    n_groups = len(G)
+
+    # --- Fase de grupos: 6 partidos por grupo, todos los torneos a la vez ---
+    pa = np.array([p[0] for p in PAIRS])
+    pb = np.array([p[1] for p in PAIRS])
+    ti, tj = G[:, pa], G[:, pb]                    # (12, 6)
+    u = rng.random((n, n_groups, len(PAIRS)))
+    i_wins = u < win[ti, tj]
+    drawn = ~i_wins & (u < win[ti, tj] + draw[ti, tj])
+    loser = rng.poisson(LOSER_GOALS, u.shape)
+    margin = 1 + rng.poisson(MARGIN_EXTRA, u.shape)
+    level = rng.poisson(DRAW_GOALS, u.shape)
+    gi = np.where(drawn, level, np.where(i_wins, loser + margin, loser))
+    gj = np.where(drawn, level, np.where(i_wins, loser, loser + margin))
+    pi = np.where(i_wins, 3, np.where(drawn, 1, 0))
+    pj = np.where(i_wins, 0, np.where(drawn, 1, 3))
+
+    # Resultados cara a cara (n, 12, 4, 4): puntos, diferencia y goles de a contra b
+    h2h = np.zeros((3, n, n_groups, GROUP_SIZE, GROUP_SIZE), dtype=np.int16)
+    for p, (a, b) in enumerate(PAIRS):
+        h2h[:, :, :, a, b] = pi[..., p], gi[..., p] - gj[..., p], gi[..., p]
+        h2h[:, :, :, b, a] = pj[..., p], gj[..., p] - gi[..., p], gj[..., p]
+    pts, gd, gf = h2h.sum(axis=-1)
+
+    # Desempates: puntos, mini-liga entre empatados a puntos (puntos, diferencia, goles),
+    # diferencia y goles totales, sorteo
+    tied = pts[..., :, None] == pts[..., None, :]
+    m_pts, m_gd, m_gf = (h2h * tied).sum(axis=-1)
+    lots = rng.random(pts.shape)
+    order = np.lexsort((lots, -gf, -gd, -m_gf, -m_gd, -m_pts, -pts), axis=-1)
+    ranked = np.take_along_axis(np.broadcast_to(G, pts.shape), order, axis=-1)   # (n, 12, 4)
+
+    # --- Mejores terceros: puntos, diferencia, goles, sorteo ---
+    third = order[..., 2:3]
+    t_pts, t_gd, t_gf = (np.take_along_axis(x, third, axis=-1)[..., 0] for x in (pts, gd, gf))
+    best = np.lexsort((rng.random(t_pts.shape), -t_gf, -t_gd, -t_pts), axis=-1)[:, :N_THIRDS]
+    mask = (1 << best).sum(axis=1)
+    third_groups = table[mask]                                                  # (n, 8)
+    thirds = np.take_along_axis(ranked[..., 2], third_groups.astype(np.int64), axis=1)
+
+    # --- Dieciseisavos ---
+    def slot(code: str, k: int) -> np.ndarray:
+        if code == "3":
+            return thirds[:, k]
+        return ranked[:, GROUPS.index(code[1]), int(code[0]) - 1]
+
+    a, b, k = [], [], 0
+    for x, y in R32:
+        a.append(slot(x, 0))
+        if y == "3":
+            b.append(slot(y, k))
+            k += 1
+        else:
+            b.append(slot(y, 0))
+    a, b = np.stack(a, axis=1), np.stack(b, axis=1)
+
+    counts = np.zeros((N_TEAMS, len(STAGES)), dtype=np.int64)
+    counts[:, 0] = np.bincount(ranked[..., 0].ravel(), minlength=N_TEAMS)
+    counts[:, 1] = np.bincount(np.concatenate([a.ravel(), b.ravel()]), minlength=N_TEAMS)
+
+    winners = knockout(rng, a, b, advance)
+    for stage, bracket in enumerate([R16, QF, SF], start=2):
+        counts[:, stage] = np.bincount(winners.ravel(), minlength=N_TEAMS)
+        idx_a, idx_b = np.array(bracket).T
+        winners = knockout(rng, winners[:, idx_a], winners[:, idx_b], advance)
+    counts[:, 5] = np.bincount(winners.ravel(), minlength=N_TEAMS)
+    champion = knockout(rng, winners[:, 0], winners[:, 1], advance)
+    counts[:, 6] = np.bincount(champion, minlength=N_TEAMS)
+    return counts
+
+
+def simulate(win: np.ndarray, draw: np.ndarray, groups: np.ndarray, n_sims: int = N_SIMS,
+             seed: int = SEED, workers: int | None = None, chunk: int = CHUNK) -> np.ndarray:
+    """Reparte n_sims en bloques (una semilla hija por bloque) y suma los conteos."""
+    sizes = [chunk] * (n_sims // chunk) + ([n_sims % chunk] if n_sims % chunk else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    table = third_place_table()
+    tasks = [(win, draw, groups, n, s, table) for n, s in zip(sizes, seeds)]
+
+    workers = workers or os.cpu_count()
+    if workers == 1 or len(tasks) == 1:
+        return sum(map(simulate_chunk, tasks))
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        return sum(pool.map(simulate_chunk, tasks))
+
+
+# =========================
+# ENTRADA: grupos
+# =========================
+def load_groups(path: str) -> pd.DataFrame:
+    """Fichero con columnas group (A-L) y team: 12 grupos de 4."""
+    df = pd.read_csv(path)
+    df["group"] = df["group"].astype(str).str.strip().str.upper()
+    df["team"] = df["team"].astype(str).str.strip()
+    sizes = df.groupby("group").size()
+    if sorted(sizes.index) != GROUPS or (sizes != GROUP_SIZE).any() or df["team"].duplicated().any():
+        raise ValueError(f"{path}: se esperan los grupos {GROUPS[0]}-{GROUPS[-1]} con {GROUP_SIZE} equipos distintos")
+    return df.sort_values("group", kind="stable").reset_index(drop=True)
+
+
+def demo_groups(store: TeamStateStore, reg: TeamRegistry, seed: int = SEED) -> pd.DataFrame:
+    """
+    Grupos de DEMOSTRACIÓN (no es el sorteo real): los 48 mejores Elo con ranking FIFA
+    actual (sin selecciones desaparecidas ni no FIFA) en 4 bombos de 12, uno de cada
+    bombo por grupo, al azar con la semilla dada.
+    """
+    elo = store.data[:, store.cols["elo"]]
+    ranked = ~np.isnan(store.data[:, store.cols["rank_points"]])
+    top = [int(i) for i in np.argsort(np.where(np.isnan(elo) | ~ranked, -np.inf, elo))[::-1][:N_TEAMS]]
+    rng = np.random.default_rng(seed)
+    rows = []
+    for pot in range(GROUP_SIZE):
+        teams = rng.permutation(top[pot * len(GROUPS):(pot + 1) * len(GROUPS)])
+        rows += [(g, reg.names[t]) for g, t in zip(GROUPS, teams)]
+    return pd.DataFrame(rows, columns=["group", "team"]).sort_values("group", kind="stable").reset_index(drop=True)
+
+
+def main(groups_file: str | None, demo: bool = False, n_sims: int = N_SIMS, seed: int = SEED,
+         workers: int | None = None, source: str = "elo", out: str = OUT_FILE):
+    reg = TeamRegistry.load()
+    store = TeamStateStore.open(STORE_FILE)
+
+    if demo:
+        groups = demo_groups(store, reg, seed)
+        print("DEMO: grupos generados a partir del Elo (no es el sorteo real del Mundial 2026)")
+    else:
+        groups = load_groups(groups_file)
+
+    names = groups["team"].tolist()
+    ids = reg.lookup(groups["team"])
+    if ids.isna().any():
+        sys.exit(f"Equipos desconocidos en los grupos: {groups.loc[ids.isna(), 'team'].tolist()}")
+    ids = ids.to_numpy(dtype=float)
+    host = groups["team"].isin(HOSTS).to_numpy()
+
+    if source == "model":
+        win, draw = model_probabilities(names, host)
+    else:
+        ratings = store.lookup(ids, ["elo"])[:, 0]
+        if np.isnan(ratings).any():
+            missing = groups.loc[np.isnan(ratings), "team"].tolist()
+            sys.exit(f"Equipos sin Elo en el almacén (python src/elo.py && python src/team_state.py): {missing}")
+        groups["elo"] = ratings.round(1)
+        win, draw = elo_probabilities(ratings, host)
+
+    t0 = time.perf_counter()
+    counts = simulate(win, draw, np.arange(N_TEAMS).reshape(len(GROUPS), GROUP_SIZE), n_sims, seed, workers)
+    elapsed = time.perf_counter() - t0
+
+    result = groups.copy()
+    for j, stage in enumerate(STAGES):
+        result[f"p_{stage}"] = (counts[:, j] / n_sims).round(5)
+    result = result.sort_values("p_champion", ascending=False, kind="stable")
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    result.to_csv(out, index=False)
+
+    with pd.option_context("display.width", 140):
+        print(result.head(16).to_string(index=False))
+    print(f"\nOK -> {out} | simulaciones: {n_sims:,} | fuente: {source} | semilla: {seed} | "
+          f"{elapsed:.1f}s ({n_sims / elapsed:,.0f} torneos/s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monte Carlo del Mundial 2026 (48 equipos)")
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--groups", help="CSV con columnas group (A-L) y team")
+    src.add_argument("--demo", action="store_true", help="Grupos de ejemplo con los 48 mejores Elo (no es el sorteo real)")
+    parser.add_argument("-n", "--sims", type=int, default=N_SIMS, help=f"Torneos a simular (por defecto {N_SIMS:,})")
+    parser.add_argument("--seed", type=int, default=SEED, help="Semilla (el resultado no depende de --workers)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto nº de CPUs)")
+    parser.add_argument("--source", choices=["elo", "model"], default="elo",
+                        help="Probabilidades por partido: Elo del almacén o modelo exportado")
+    parser.add_argument("--out", default=OUT_FILE, help="CSV de salida")
+    args = parser.parse_args()
+    main(args.groups, args.demo, args.sims, args.seed, args.workers, args.source, args.out)
@@ -0,0 +1,287 @@
+import os
+import sys
+import glob
+import importlib.util
+import pandas as pd
+from schemas import apply_schema
+from instrumentation import record
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Capa processed/curated: Parquet tipado y comprimido (zstd) + CSV opcional para revisión.
+# pyarrow es opcional: sin él todo sigue funcionando solo con CSV.
+HAS_PARQUET = importlib.util.find_spec("pyarrow") is not None
+PARQUET_COMPRESSION = "zstd"
+
+# TFM_EXPORT_CSV=0 desactiva el CSV (ejecuciones rápidas en desarrollo)
+EXPORT_CSV = os.environ.get("TFM_EXPORT_CSV", "1") != "0"
+
+# TFM_CHUNK_ROWS=N activa el modo por bloques (out-of-core) en las etapas que lo soportan
+CHUNK_ROWS = int(os.environ.get("TFM_CHUNK_ROWS", "0")) or None
+
+# TFM_SINCE=AAAA-MM-DD limita las etapas de integración a la ventana del modelo: el filtro
+# de fecha se aplica al leer (read_table(since=...)). Sin definir -> histórico completo.
+WINDOW_SINCE = os.environ.get("TFM_SINCE") or None
+
+# Row groups del Parquet: con tablas ordenadas por fecha, el filtro `since` descarta los
+# grupos enteros anteriores a la ventana sin leerlos (estadísticas min/max)
+ROW_GROUP_ROWS = 65_536
+
+# Columnas con pocos valores distintos y muy repetidos -> category
+CATEGORY_COLUMNS = {
+    "home_team", "away_team", "team", "winner", "first_shooter", "shootout_winner",
+    "home_team_norm", "away_team_norm", "team_norm", "team_code",
+    "tournament", "city", "country", "source", "current", "former", "sources", "resolution",
+}
+
+DATE_COLUMNS = {"date", "rank_date", "home_rank_date", "away_rank_date", "start_date", "end_date"}
+
+
+def parquet_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".parquet"
+
+
+def csv_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".csv"
+
+
+def to_storage_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    out = df.copy()
+    for c in out.columns:
+        if c in CATEGORY_COLUMNS and out[c].dtype != "category":
+            out[c] = out[c].astype("category")
+        elif c in DATE_COLUMNS and not pd.api.types.is_datetime64_any_dtype(out[c]):
+            out[c] = pd.to_datetime(out[c], errors="coerce")
+    return out
+
+
+def write_table(df: pd.DataFrame, path: str, export_csv: bool | None = None, **csv_kwargs) -> list[str]:
+    """
+    Guarda una tabla de la capa processed/curated.
+    `path` es la ruta .csv histórica; el Parquet se escribe al lado con el mismo nombre.
+    Devuelve las rutas escritas.
+    """
+    export_csv = EXPORT_CSV if export_csv is None else export_csv
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    written = []
+
+    # CSV primero: así el Parquet nunca queda más viejo que el CSV que acompaña
+    if export_csv or not HAS_PARQUET:
+        csv_kwargs.setdefault("index", False)
+        csv_kwargs.setdefault("encoding", "utf-8")
+        df.to_csv(csv_path(path), **csv_kwargs)
+        written.append(csv_path(path))
+
+    if HAS_PARQUET:
+        to_storage_dtypes(df).to_parquet(parquet_path(path), index=False, compression=PARQUET_COMPRESSION,
+                                         row_group_size=ROW_GROUP_ROWS)
+        written.append(parquet_path(path))
+
+    record("write", written, len(df))
+    return written
+
+
+def use_parquet(path: str) -> bool:
+    pq, csv = parquet_path(path), csv_path(path)
+    return HAS_PARQUET and os.path.exists(pq) and (
+        not os.path.exists(csv) or os.path.getmtime(pq) >= os.path.getmtime(csv)
+    )
+
+
+def with_date(columns: list[str] | None, date_col: str) -> list[str] | None:
+    return None if columns is None else list(dict.fromkeys([*columns, date_col]))
+
+
+def row_groups_since(pf, since: pd.Timestamp | None, date_col: str) -> tuple[list[int], list[int]]:
+    """Row groups que pueden tener filas con fecha >= since y la posición de su primera fila."""
+    j = pf.schema_arrow.get_field_index(date_col) if since is not None else -1
+    groups, starts, start = [], [], 0
+    for i in range(pf.metadata.num_row_groups):
+        rg = pf.metadata.row_group(i)
+        st = rg.column(j).statistics if j >= 0 else None
+        if st is None or not st.has_min_max or st.max is None or pd.Timestamp(st.max) >= since:
+            groups.append(i)
+            starts.append(start)
+        start += rg.num_rows
+    return groups, starts
+
+
+def filter_since(df: pd.DataFrame, since: pd.Timestamp, date_col: str, columns: list[str] | None) -> pd.DataFrame:
+    df = df[(df[date_col] >= since).to_numpy()]
+    return df[columns] if columns is not None else df
+
+
+def read_table(path: str, columns: list[str] | None = None, schema: str | None = None,
+               since: str | None = None, date_col: str = "date", **csv_kwargs) -> pd.DataFrame:
+    """
+    Lee una tabla escrita con write_table. Usa el Parquet si existe y no es más viejo
+    que el CSV (proyección de columnas incluida); si no, el CSV con fechas parseadas
+    y, si se indica, los tipos del esquema (schemas.py).
+    Con `since` solo se devuelven las filas con `date_col` >= since (los row groups
+    anteriores del Parquet ni se leen); el índice es la posición de cada fila en la
+    tabla completa, igual que sin filtro.
+    """
+    pq, csv = parquet_path(path), csv_path(path)
+    since = None if since is None else pd.Timestamp(since)
+    if use_parquet(path):
+        if since is None:
+            df = pd.read_parquet(pq, columns=columns)
+        else:
+            import pyarrow.parquet as papq
+            pf = papq.ParquetFile(pq)
+            groups, starts = row_groups_since(pf, since, date_col)
+            parts = []
+            for g, start in zip(groups, starts):
+                part = pf.read_row_group(g, columns=with_date(columns, date_col)).to_pandas()
+                part.index = pd.RangeIndex(start, start + len(part))
+                parts.append(filter_since(part, since, date_col, columns))
+            empty = pf.schema_arrow.empty_table().to_pandas()
+            df = pd.concat(parts) if parts else (empty[columns] if columns is not None else empty)
+        record("read", pq, len(df))
+        return df
+
+    header = pd.read_csv(csv, nrows=0, **csv_kwargs).columns
+    wanted = [c for c in header if columns is None or c in columns or (since is not None and c == date_col)]
+    parse_dates = [c for c in wanted if c in DATE_COLUMNS]
+    if since is None:
+        df = pd.read_csv(csv, usecols=wanted, parse_dates=parse_dates, **csv_kwargs)
+    else:
+        # Por bloques: las filas fuera de la ventana no llegan a acumularse
+        chunks = pd.read_csv(csv, usecols=wanted, parse_dates=parse_dates, chunksize=ROW_GROUP_ROWS, **csv_kwargs)
+        df = pd.concat([c[(c[date_col] >= since).to_numpy()] for c in chunks])
+    if schema is not None:
+        df = apply_schema(df, schema)
+    record("read", csv, len(df))
+    return df[columns] if columns is not None else df
+
+
+def iter_table(path: str, chunksize: int, columns: list[str] | None = None, schema: str | None = None,
+               since: str | None = None, date_col: str = "date", **csv_kwargs):
+    """
+    Igual que read_table pero por bloques de `chunksize` filas (lotes del Parquet o
+    trozos del CSV), para no tener la tabla entera en memoria. Mismo `since` e índice
+    (posición en la tabla completa) que read_table.
+    """
+    pq, csv = parquet_path(path), csv_path(path)
+    since = None if since is None else pd.Timestamp(since)
+    n = 0
+    if use_parquet(path):
+        import pyarrow.parquet as papq
+        pf = papq.ParquetFile(pq)
+        groups, starts = row_groups_since(pf, since, date_col)
+        read_cols = columns if since is None else with_date(columns, date_col)
+        for g, start in zip(groups, starts):
+            for batch in pf.iter_batches(batch_size=chunksize, row_groups=[g], columns=read_cols):
+                df = batch.to_pandas()
+                df.index = pd.RangeIndex(start, start + len(df))
+                start += len(df)
+                if since is not None:
+                    df = filter_since(df, since, date_col, columns)
+                n += len(df)
+                yield df
+        record("read", pq, n)
+        return
+
+    header = pd.read_csv(csv, nrows=0, **csv_kwargs).columns
+    wanted = [c for c in header if columns is None or c in columns or (since is not None and c == date_col)]
+    parse_dates = [c for c in wanted if c in DATE_COLUMNS]
+    for df in pd.read_csv(csv, usecols=wanted, parse_dates=parse_dates, chunksize=chunksize, **csv_kwargs):
+        if since is not None:
+            df = df[(df[date_col] >= since).to_numpy()]
+        if schema is not None:
+            df = apply_schema(df, schema)
+        n += len(df)
+        yield df[columns] if columns is not None else df
+    record("read", csv, n)
+
+
+class TableWriter:
+    """
+    Escritura incremental de una tabla (modo por bloques): mismas rutas y formatos que
+    write_table, un row group de Parquet por bloque. Se escribe en ficheros temporales que
+    sustituyen a los finales al cerrar, así una ejecución a medias no deja tablas cortadas.
+    """
+
+    def __init__(self, path: str, export_csv: bool | None = None, **csv_kwargs):
+        export_csv = EXPORT_CSV if export_csv is None else export_csv
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.csv = csv_path(path) if export_csv or not HAS_PARQUET else None
+        self.pq = parquet_path(path) if HAS_PARQUET else None
+        self.csv_kwargs = {"index": False, "encoding": "utf-8", **csv_kwargs}
+        self.schema = None
+        self.pq_writer = None
+        self.rows = 0
+
+    def write(self, df: pd.DataFrame):
+        if self.csv:
+            df.to_csv(self.csv + ".tmp", mode="a" if self.rows else "w", header=not self.rows, **self.csv_kwargs)
+        if self.pq:
+            import pyarrow as pa
+            import pyarrow.parquet as papq
+            table = pa.Table.from_pandas(to_storage_dtypes(df), preserve_index=False)
+            if self.schema is None:
+                # Índices de diccionario a int32 (cada bloque trae sus propias categorías) y
+                # columnas todo-nulas del primer bloque como texto
+                def fixed(t):
+                    if pa.types.is_dictionary(t):
+                        return pa.dictionary(pa.int32(), fixed(t.value_type))
+                    return pa.large_string() if pa.types.is_null(t) else t
+                self.schema = pa.schema([f.with_type(fixed(f.type)) for f in table.schema],
+                                        metadata=table.schema.metadata)
+                self.pq_writer = papq.ParquetWriter(self.pq + ".tmp", self.schema, compression=PARQUET_COMPRESSION)
+            self.pq_writer.write_table(table.cast(self.schema), row_group_size=ROW_GROUP_ROWS)
+        self.rows += len(df)
+
+    def close(self) -> list[str]:
+        written = []
+        if self.pq_writer is not None:
+            self.pq_writer.close()
+        for path in (self.csv, self.pq):
+            if path and os.path.exists(path + ".tmp"):
+                os.replace(path + ".tmp", path)
+                written.append(path)
+        record("write", written, self.rows)
+        return written
+
+    def abort(self):
+        if self.pq_writer is not None:
+            self.pq_writer.close()
+        for path in (self.csv, self.pq):
+            if path and os.path.exists(path + ".tmp"):
+                os.remove(path + ".tmp")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def table_columns(path: str) -> list[str]:
+    """Columnas de una tabla sin leer los datos (esquema del Parquet o cabecera del CSV)."""
+    pq = parquet_path(path)
+    if HAS_PARQUET and os.path.exists(pq):
+        import pyarrow.parquet as papq
+        return papq.read_schema(pq).names
+    return list(pd.read_csv(csv_path(path), nrows=0).columns)
+
+
+def export_csv_dir(directory: str):
+    """
+    Exporta a CSV todos los Parquet de un directorio (para revisión).
+    """
+    for pq in sorted(glob.glob(os.path.join(directory, "**", "*.parquet"), recursive=True)):
+        df = pd.read_parquet(pq)
+        df.to_csv(csv_path(pq), index=False, encoding="utf-8")
+        print("CSV ->", csv_path(pq), "| filas:", len(df))
+
+
+if __name__ == "__main__":
+    # python src/storage.py data/curated  -> regenera los CSV desde Parquet
+    for d in sys.argv[1:] or ["data/processed", "data/curated"]:
+        export_csv_dir(d)
@@ -0,0 +1,97 @@
+import pandas as pd
+
+
+# =========================
+# MODO POR BLOQUES (out-of-core)
+# =========================
+# Las tablas de Kaggle vienen ordenadas por fecha y la llave de partido empieza por la
+# fecha (match_id.py), así que results, shootouts y goalscorers se pueden unir en una
+# sola pasada: cada bloque de results se cierra en una fecha completa y de las otras
+# tablas se toma solo lo que llega hasta esa fecha. La memoria depende del tamaño del
+# bloque, no del de la tabla.
+DATE_COL = "date"
+
+
+def concat_chunks(frames: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    concat que conserva las category (une las categorías en vez de pasar a texto) y el
+    índice (posición de cada fila en la tabla completa, ver storage.iter_table).
+    """
+    frames = [f for f in frames if len(f)] or frames[:1]
+    if len(frames) == 1:
+        return frames[0]
+    out = {}
+    for c in frames[0].columns:
+        cols = [f[c] for f in frames]
+        if all(isinstance(s.dtype, pd.CategoricalDtype) for s in cols):
+            out[c] = pd.api.types.union_categoricals(cols, ignore_order=True)
+        else:
+            out[c] = pd.concat(cols).array
+    return pd.DataFrame(out, index=frames[0].index.append([f.index for f in frames[1:]]))
+
+
+def check_sorted(df: pd.DataFrame, last, source: str, date_col: str = DATE_COL):
+    dates = df[date_col]
+    if dates.isna().any() or not dates.is_monotonic_increasing or (last is not None and len(df) and dates.iloc[0] < last):
+        raise ValueError(f"{source}: el modo por bloques necesita la tabla ordenada por {date_col} y sin fechas nulas "
+                         "(usa el modo en memoria o reordena el RAW)")
+
+
+def date_aligned(chunks, source: str, date_col: str = DATE_COL):
+    """
+    Reagrupa los bloques para que ninguna fecha quede partida entre dos: las filas de la
+    última fecha de cada bloque pasan al siguiente. Así los duplicados por llave (y la
+    secuencia de match_id) caen siempre en el mismo bloque.
+    """
+    carry, last = None, None
+    for df in chunks:
+        if carry is not None:
+            df = concat_chunks([carry, df])
+        if not len(df):
+            continue
+        check_sorted(df, last, source, date_col)
+        last = df[date_col].iloc[-1]
+        tail = (df[date_col] == last).to_numpy()
+        carry = df[tail]
+        if not tail.all():
+            yield df[~tail]
+    if carry is not None and len(carry):
+        yield carry
+
+
+class SortedCursor:
+    """Lector por bloques de una tabla ordenada por fecha: entrega las filas hasta una fecha dada."""
+
+    def __init__(self, chunks, source: str, date_col: str = DATE_COL):
+        self.chunks = iter(chunks)
+        self.source = source
+        self.date_col = date_col
+        self.buffer = None
+        self.empty = pd.DataFrame()
+        self.last = None
+        self.done = False
+
+    def _pull(self) -> bool:
+        for df in self.chunks:
+            if not len(df):
+                continue
+            check_sorted(df, self.last, self.source, self.date_col)
+            self.last = df[self.date_col].iloc[-1]
+            self.empty = df.iloc[:0]
+            self.buffer = df if self.buffer is None else concat_chunks([self.buffer, df])
+            return True
+        self.done = True
+        return False
+
+    def take_until(self, date) -> pd.DataFrame:
+        """Filas con fecha <= `date` (todas las pendientes si `date` es None)."""
+        while not self.done and (self.buffer is None or date is None or self.last <= date):
+            self._pull()
+        if self.buffer is None:
+            return self.empty
+        if date is None:
+            out, self.buffer = self.buffer, None
+            return out
+        cut = int(self.buffer[self.date_col].searchsorted(date, side="right"))
+        out, self.buffer = self.buffer.iloc[:cut], self.buffer.iloc[cut:]
+        return out
@@ -0,0 +1,145 @@
+import json
+import glob
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+# =========================
+# CONFIGURACION
+# =========================
+RAW_GLOB = "data/raw/api_football/fixtures/**/fixtures_league_*_season_*.json"
+
+
+# =========================
+# STUB LOCAL DE API-FOOTBALL
+# =========================
+# Sirve /fixtures?league=&season= a partir de los JSON RAW ya descargados,
+# con latencia simulada y cabeceras de rate limit como las de la API real.
+# Uso (benchmark del extractor sin gastar cuota):
+#   python src/stub_api_football.py --port 8765 --latency 0.3 --rate-per-minute 300
+#   python src/datos_api.py --base-url http://127.0.0.1:8765 --workers 8 --out-dir /tmp/api_bench
+
+def load_payloads(raw_glob: str = RAW_GLOB) -> dict:
+    """
+    Devuelve {(league, season): payload} quedándose con el snapshot más reciente.
+    Los payloads guardados con `errors` (p.ej. un rateLimit) no se sirven.
+    """
+    payloads = {}
+    for path in sorted(glob.glob(raw_glob, recursive=True)):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("errors"):
+            continue
+        params = data.get("parameters", {})
+        key = (str(params.get("league")), str(params.get("season")))
+        payloads[key] = data  # sorted -> el último timestamp gana
+    return payloads
+
+
+class MinuteWindow:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.window_start = time.monotonic()
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def hit(self) -> int:
+        """Registra una request y devuelve las restantes en la ventana (<0 si se excede)."""
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 60:
+                self.window_start = now
+                self.count = 0
+            self.count += 1
+            return self.limit - self.count
+
+
+def make_handler(payloads: dict, latency: float, window: MinuteWindow, page_size: int):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, para medir el efecto del pool
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, status: int, payload: dict, remaining: int):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("X-RateLimit-Limit", str(window.limit))
+            self.send_header("X-RateLimit-Remaining", str(max(remaining, 0)))
+            self.send_header("x-ratelimit-requests-limit", "7500")
+            self.send_header("x-ratelimit-requests-remaining", "7500")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            time.sleep(latency)
+            remaining = window.hit()
+            if remaining < 0:
+                # Igual que la API real: HTTP 200 con el error en `errors` y `response` vacío
+                self._send(200, {
+                    "get": "fixtures",
+                    "parameters": {},
+                    "errors": {"rateLimit": f"Too many requests. Your rate limit is {window.limit} requests per minute."},
+                    "results": 0,
+                    "paging": {"current": 1, "total": 1},
+                    "response": [],
+                }, remaining)
+                return
+
+            url = urlparse(self.path)
+            q = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path != "/fixtures":
+                self._send(404, {"errors": {"endpoint": url.path}}, remaining)
+                return
+
+            base = payloads.get((q.get("league"), q.get("season")))
+            response = base.get("response", []) if base else []
+            params = {k: v for k, v in q.items() if k != "page"}
+
+            # Paginación opcional para probar el seguimiento de paging.total
+            page = int(q.get("page", 1))
+            total = max(1, -(-len(response) // page_size)) if page_size else 1
+            if page_size:
+                response = response[(page - 1) * page_size: page * page_size]
+
+            self._send(200, {
+                "get": "fixtures",
+                "parameters": params,
+                "errors": [],
+                "results": len(response),
+                "paging": {"current": page, "total": total},
+                "response": response,
+            }, remaining)
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub local de API-Football para benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="Segundos de latencia por request")
+    parser.add_argument("--rate-per-minute", type=int, default=300)
+    parser.add_argument("--page-size", type=int, default=0, help="0 = sin paginar")
+    args = parser.parse_args()
+
+    payloads = load_payloads()
+    print(f"Stub API-Football | payloads={len(payloads)} | http://{args.host}:{args.port}")
+
+    handler = make_handler(payloads, args.latency, MinuteWindow(args.rate_per_minute), args.page_size)
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import os
+import sys
+import glob
+import json
+import shutil
+import argparse
+import numpy as np
+import pandas as pd
+from process_football_ranking import period_from_filename
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Datos sintéticos para benchmarks: el RAW real se replica `scale` veces. La copia c
+# va c años hacia atrás (mismos equipos y torneos, fechas y fixture_id distintos), así
+# que las llaves (fecha, home, away) siguen siendo únicas y cada etapa hace el mismo
+# trabajo que con datos reales, multiplicado.
+SRC_ROOT = "."
+BENCH_ROOT = "data/.bench"
+
+KAGGLE_RAW = "data/raw/kaggle"
+KAGGLE_FILES = ["results.csv", "shootouts.csv", "goalscorers.csv"]
+RANKING_GLOB = "data/raw/fifa_ranking/football_ranking_raw_*.csv"
+RANKING_HISTORY_DIR = "data/raw/fifa_ranking/history"
+API_FIXTURES_DIR = "data/raw/api_football/fixtures"
+
+# Ficheros que se copian tal cual (mapeos, registro, nombres históricos, manifest API)
+STATIC_FILES = [
+    "data/raw/kaggle/former_names.csv",
+    "data/processed/mappings/api_to_kaggle_mapping.csv",
+    "data/processed/mappings/team_name_mapping.csv",
+    "data/processed/mappings/team_registry.csv",
+    "data/raw/api_football/fixtures/manifest_fixtures.csv",
+]
+
+# Los fixture_id de la copia c se desplazan c * FIXTURE_ID_STRIDE
+FIXTURE_ID_STRIDE = 10_000_000
+
+# Periodos de ranking históricos por copia (uno al mes hacia atrás desde el snapshot)
+RANKING_PERIOD_STEP_DAYS = 28
+
+
+def workspace_dir(scale: int, root: str = BENCH_ROOT) -> str:
+    return os.path.join(root, f"scale_{scale}")
+
+
+# =========================
+# KAGGLE
+# =========================
+def shift_years(dates: pd.Series, years: int) -> pd.Series:
+    # DateOffset lleva el 29-feb al 28-feb: nunca genera fechas inválidas
+    return dates if years == 0 else dates - pd.DateOffset(years=years)
+
+
+def replicate_kaggle(src_path: str, out_path: str, scale: int) -> int:
+    df = pd.read_csv(src_path, dtype=str, keep_default_na=False)
+    dates = pd.to_datetime(df["date"])
+    parts = []
+    for c in range(scale):
+        part = df.copy()
+        part["date"] = shift_years(dates, c).dt.strftime("%Y-%m-%d")
+        parts.append(part)
+    # Orden por fecha, como el dataset original
+    out = pd.concat(parts, ignore_index=True)
+    out = out.iloc[np.argsort(out["date"].to_numpy(), kind="stable")]
+    out.to_csv(out_path, index=False, encoding="utf-8")
+    return len(out)
+
+
+# =========================
+# RANKING
+# =========================
+def replicate_ranking(src_root: str, out_root: str, scale: int) -> int:
+    """Páginas del snapshot actual tal cual + (scale - 1) periodos históricos con puntos perturbados."""
+    pages = sorted(glob.glob(os.path.join(src_root, RANKING_GLOB)))
+    out_dir = os.path.join(out_root, os.path.dirname(RANKING_GLOB))
+    os.makedirs(out_dir, exist_ok=True)
+    for p in pages:
+        shutil.copy2(p, out_dir)
+    if not pages:
+        return 0
+
+    snap = pd.concat([pd.read_csv(p, dtype=str) for p in pages], ignore_index=True)
+    points = snap["points"].str.replace(",", "", regex=False).astype(float).to_numpy()
+    rng = np.random.default_rng(0)
+    # Fecha del snapshot (nombre del fichero), para que los periodos no dependan del día de hoy
+    last = period_from_filename(pages[-1])
+    if pd.isna(last):
+        last = pd.Timestamp("2026-01-19")
+    n = len(snap) * scale
+    for c in range(1, scale):
+        rank_date = (last - pd.Timedelta(days=RANKING_PERIOD_STEP_DAYS * c)).strftime("%Y-%m-%d")
+        noisy = points * rng.normal(1.0, 0.02, len(points))
+        order = np.argsort(-noisy, kind="stable")
+        period = pd.DataFrame({
+            "rank_date": rank_date,
+            "position": np.arange(1, len(snap) + 1),
+            "team": snap["team"].to_numpy()[order],
+            "points": [f"{v:,.2f}" for v in noisy[order]],
+        })
+        path = os.path.join(out_root, RANKING_HISTORY_DIR, f"rank_date={rank_date}", "ranking.csv")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        period.to_csv(path, index=False, encoding="utf-8")
+    return n
+
+
+# =========================
+# API-FOOTBALL
+# =========================
+def shift_iso_year(iso: str, years: int) -> str:
+    y = int(iso[:4]) - years
+    rest = iso[4:]
+    if rest.startswith("-02-29"):
+        rest = "-02-28" + rest[6:]
+    return f"{y:04d}{rest}"
+
+
+def replicate_api(src_root: str, out_root: str, scale: int) -> int:
+    """Mismo fichero por (liga, temporada), con `scale` copias de cada fixture dentro."""
+    n = 0
+    for src in glob.glob(os.path.join(src_root, API_FIXTURES_DIR, "**", "fixtures_*.json"), recursive=True):
+        with open(src, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        base = payload.get("response", [])
+        response = []
+        for c in range(scale):
+            for m in base:
+                m = json.loads(json.dumps(m)) if c else m
+                m["fixture"]["id"] += c * FIXTURE_ID_STRIDE
+                m["fixture"]["date"] = shift_iso_year(m["fixture"]["date"], c)
+                response.append(m)
+        payload["response"] = response
+        payload["results"] = len(response)
+        n += len(response)
+
+        out = os.path.join(out_root, os.path.relpath(src, src_root))
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        with open(out, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+    return n
+
+
+# =========================
+# MAIN
+# =========================
+def generate(scale: int, out_root: str | None = None, src_root: str = SRC_ROOT) -> dict:
+    """Crea un espacio de trabajo con el RAW (y los mapeos) a escala `scale`. Devuelve filas por fuente."""
+    out_root = out_root or workspace_dir(scale)
+    if os.path.exists(out_root):
+        shutil.rmtree(out_root)
+    os.makedirs(os.path.join(out_root, KAGGLE_RAW), exist_ok=True)
+
+    for rel in STATIC_FILES:
+        src = os.path.join(src_root, rel)
+        if os.path.exists(src):
+            os.makedirs(os.path.dirname(os.path.join(out_root, rel)), exist_ok=True)
+            shutil.copy2(src, os.path.join(out_root, rel))
+
+    counts = {}
+    for name in KAGGLE_FILES:
+        counts[name] = replicate_kaggle(os.path.join(src_root, KAGGLE_RAW, name),
+                                        os.path.join(out_root, KAGGLE_RAW, name), scale)
+    counts["ranking"] = replicate_ranking(src_root, out_root, scale)
+    counts["api_fixtures"] = replicate_api(src_root, out_root, scale)
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--scale", type=int, default=1, help="Múltiplo del tamaño actual (1, 10, 100...)")
+    parser.add_argument("--out", default=None, help=f"Directorio de salida (por defecto {BENCH_ROOT}/scale_<n>)")
+    args = parser.parse_args()
+    if args.scale < 1:
+        sys.exit("--scale debe ser >= 1")
+
+    out = args.out or workspace_dir(args.scale)
+    counts = generate(args.scale, out)
+    print(f"OK -> {out} | escala {args.scale}x |", " | ".join(f"{k}: {v}" for k, v in counts.items()))
@@ -0,0 +1,242 @@
+import os
+import numpy as np
+import pandas as pd
+from schemas import read_csv_schema
+from storage import read_table
+from instrumentation import record
+
+
+# =========================
+# CONFIGURACION
+# =========================
+REGISTRY_PATH = "data/processed/mappings/team_registry.csv"
+API_MAPPING_PATH = "data/processed/mappings/api_to_kaggle_mapping.csv"
+RANKING_MAPPING_PATH = "data/processed/mappings/team_name_mapping.csv"
+FORMER_NAMES_PATH = "data/raw/kaggle/former_names.csv"
+
+# Fuentes de nombres que alimentan el registro al construirlo
+IN_RESULTS = "data/processed/kaggle/results_processed.csv"
+IN_API_FIXTURES = "data/processed/api_football/fixtures_processed.csv"
+IN_RANKING_HISTORY = "data/processed/football_ranking/ranking_history.csv"
+
+
+# =========================
+# NORMALIZACION (una vez por nombre único)
+# =========================
+def fix_mojibake(name: str) -> str:
+    """
+    'CuraÃ§ao' -> 'Curaçao' (UTF-8 leído como latin1). Un nombre limpio ('Curaçao',
+    'Türkiye') no sobrevive el viaje latin1 -> UTF-8 y se deja tal cual.
+    """
+    try:
+        return name.encode("latin1").decode("utf-8")
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return name
+
+
+def normalize_team_name(s: pd.Series) -> pd.Series:
+    """
+    Arreglo de encoding + limpieza de espacios. Se aplica sobre los valores únicos
+    y se expande con los códigos de factorize: el trabajo de strings es O(nº de nombres).
+    """
+    codes, uniques = pd.factorize(s, use_na_sentinel=False)
+    norm = (
+        pd.Series(uniques, dtype=object).astype(str)
+        .map(fix_mojibake)
+        .str.strip()
+        .str.replace(r"\s+", " ", regex=True)
+    )
+    return pd.Series(norm.to_numpy()[codes], index=s.index)
+
+
+def clean_team_name(s: pd.Series) -> pd.Series:
+    # Limpieza ligera (sin tocar el encoding) para nombres que se muestran tal cual
+    codes, uniques = pd.factorize(s, use_na_sentinel=False)
+    norm = pd.Series(uniques, dtype=object).astype(str).str.strip().str.replace(r"\s+", " ", regex=True)
+    return pd.Series(norm.to_numpy()[codes], index=s.index)
+
+
+def map_unique(s: pd.Series, mapping: dict) -> pd.Series:
+    """Equivalente a s.replace(mapping), resuelto sobre los valores únicos."""
+    if not mapping:
+        return s
+    codes, uniques = pd.factorize(s)
+    mapped = pd.Series(uniques, dtype=object).map(lambda v: mapping.get(v, v))
+    out = pd.Series(mapped.to_numpy()[codes], index=s.index, dtype=object)
+    return out.where(codes >= 0, s)
+
+
+def read_mapping_csv(path: str) -> pd.DataFrame | None:
+    if not os.path.exists(path):
+        return None
+    # Intentar UTF-8 primero; si falla, usar cp1252 (Windows)
+    try:
+        return pd.read_csv(path, encoding="utf-8")
+    except UnicodeDecodeError:
+        return pd.read_csv(path, encoding="cp1252")
+
+
+# =========================
+# REGISTRO
+# =========================
+class TeamRegistry:
+    """
+    Registro canónico de selecciones: un team_id entero y estable por equipo
+    (nombre canónico = nombre Kaggle normalizado) y resolución de alias:
+      - API-Football -> Kaggle (api_to_kaggle_mapping.csv)
+      - Ranking -> Kaggle (team_name_mapping.csv, en sentido inverso)
+      - Nombres históricos -> actual, solo dentro de su periodo de validez (former_names.csv)
+    Los IDs se guardan en team_registry.csv y nunca se renumeran; los nombres nuevos
+    se añaden al final.
+    """
+
+    def __init__(self, names: list[str] | None = None):
+        self.names = list(names or [])
+        self.ids = {n: i for i, n in enumerate(self.names)}
+        self.api_to_kaggle = {}
+        self.kaggle_to_ranking = {}
+        self.ranking_to_kaggle = {}
+        self.former = pd.DataFrame(columns=["current", "former", "start_date", "end_date"])
+
+    # ---------- carga / guardado ----------
+    @classmethod
+    def load(cls, path: str = REGISTRY_PATH) -> "TeamRegistry":
+        names = []
+        if os.path.exists(path):
+            reg = pd.read_csv(path, encoding="utf-8").sort_values("team_id")
+            if not reg["team_id"].tolist() == list(range(len(reg))):
+                raise ValueError(f"{path}: los team_id deben ser 0..n-1 sin huecos")
+            names = reg["team_name"].tolist()
+        out = cls(names)
+        out.load_aliases()
+        return out
+
+    def load_aliases(self):
+        m = read_mapping_csv(API_MAPPING_PATH)
+        if m is not None:
+            self.api_to_kaggle = dict(zip(clean_team_name(m["api_name"]), clean_team_name(m["kaggle_name"])))
+
+        m = read_mapping_csv(RANKING_MAPPING_PATH)
+        if m is not None:
+            required = {"kaggle_name", "ranking_name"}
+            if not required.issubset(set(m.columns)):
+                raise ValueError(f"El mapping debe tener columnas {required}. Columnas encontradas: {list(m.columns)}")
+            k, r = normalize_team_name(m["kaggle_name"]), normalize_team_name(m["ranking_name"])
+            self.kaggle_to_ranking = dict(zip(k, r))
+            self.ranking_to_kaggle = dict(zip(r, k))
+
+        if os.path.exists(FORMER_NAMES_PATH):
+            f = read_csv_schema(FORMER_NAMES_PATH, "former_names", encoding="utf-8")
+            f["current"] = normalize_team_name(f["current"])
+            f["former"] = normalize_team_name(f["former"])
+            self.former = f
+
+    def save(self, path: str = REGISTRY_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pd.DataFrame({"team_id": range(len(self.names)), "team_name": self.names}).to_csv(
+            path, index=False, encoding="utf-8"
+        )
+        record("write", path, len(self.names))
+
+    # ---------- nombres ----------
+    def canonical_names(self, names: pd.Series, source: str = "kaggle") -> pd.Series:
+        """
+        Nombre canónico (Kaggle normalizado) para nombres de 'kaggle', 'api' o 'ranking'.
+        """
+        if source == "api":
+            return normalize_team_name(map_unique(clean_team_name(names), self.api_to_kaggle))
+        norm = normalize_team_name(names)
+        if source == "ranking":
+            return map_unique(norm, self.ranking_to_kaggle)
+        if source != "kaggle":
+            raise ValueError(f"Fuente desconocida: {source}")
+        return norm
+
+    def ranking_names(self, names: pd.Series) -> pd.Series:
+        """Nombre tal como aparece en el ranking (el antiguo *_team_norm)."""
+        return map_unique(normalize_team_name(names), self.kaggle_to_ranking)
+
+    def api_names_to_kaggle(self, names: pd.Series) -> pd.Series:
+        """Nombres API-Football limpiados y traducidos a Kaggle (el antiguo mapping API->Kaggle)."""
+        return map_unique(clean_team_name(names), self.api_to_kaggle)
+
+    # ---------- IDs ----------
+    def register(self, names) -> int:
+        """Añade los nombres que falten (en orden alfabético). Devuelve cuántos se añadieron."""
+        new = sorted({n for n in names if isinstance(n, str) and n not in self.ids})
+        for n in new:
+            self.ids[n] = len(self.names)
+            self.names.append(n)
+        return len(new)
+
+    def resolve(self, names: pd.Series, source: str = "kaggle", dates: pd.Series | None = None) -> pd.Series:
+        """
+        team_id (Int32) para cada nombre. Con `dates`, los nombres históricos se
+        resuelven al equipo actual solo si la fecha cae en su periodo de validez.
+        Un nombre sin registrar es un error: solo build_registry (etapa team_registry) e
+        incremental_update añaden equipos, y guardan el registro antes de asignar IDs.
+        """
+        ids = self.lookup(names, source, dates)
+        unknown = ids.isna() & names.notna()
+        if unknown.any():
+            missing = sorted(names[unknown].astype(str).unique())
+            raise ValueError(f"Equipos sin registrar ({len(missing)}): {missing[:10]} "
+                             "(ejecutar python src/team_registry.py)")
+        return ids
+
+    def lookup(self, names: pd.Series, source: str = "kaggle", dates: pd.Series | None = None) -> pd.Series:
+        """
+        Como resolve() pero sin fallar: los nombres desconocidos salen como NA.
+        Para consumidores de solo lectura (predicción, consultas, simulación).
+        """
+        canon = self.canonical_names(names, source)
+        codes, uniques = pd.factorize(canon)
+        ids_u = pd.array([self.ids.get(u) for u in uniques], dtype="Int32")
+        ids = pd.Series(ids_u.take(codes, allow_fill=True), index=names.index)
+
+        if dates is not None and len(self.former):
+            is_former = pd.Series(uniques).isin(self.former["former"]).to_numpy()
+            rows = np.flatnonzero(is_former[codes]) if is_former.any() else []
+            if len(rows):
+                # Solo las filas con un nombre histórico: normalmente una fracción mínima
+                sub_canon = canon.to_numpy()[rows]
+                sub_dates = pd.to_datetime(pd.Series(dates).to_numpy()[rows])
+                for f in self.former[self.former["former"].isin(sub_canon)].itertuples(index=False):
+                    hit = (sub_canon == f.former) & (sub_dates >= f.start_date) & (sub_dates <= f.end_date)
+                    if hit.any() and f.current in self.ids:
+                        ids.iloc[rows[hit]] = self.ids[f.current]
+        return ids
+
+    def categorical(self, ids: pd.Series) -> pd.Series:
+        """team_id -> Categorical con los nombres canónicos como categorías (códigos = team_id)."""
+        cat = pd.Categorical.from_codes(ids.fillna(-1).astype(int), categories=self.names)
+        return pd.Series(cat, index=ids.index)
+
+
+def build_registry(path: str = REGISTRY_PATH) -> TeamRegistry:
+    """
+    Carga el registro existente y añade los nombres nuevos de Kaggle, API-Football
+    y ranking. Los IDs ya asignados no cambian.
+    """
+    reg = TeamRegistry.load(path)
+    before = len(reg.names)
+
+    results = read_table(IN_RESULTS, columns=["home_team", "away_team"])
+    reg.register(reg.canonical_names(pd.concat([results["home_team"], results["away_team"]]).astype(str)).unique())
+    reg.register(reg.former["current"])
+
+    if os.path.exists(IN_API_FIXTURES) or os.path.exists(IN_API_FIXTURES.replace(".csv", ".parquet")):
+        api = read_table(IN_API_FIXTURES, columns=["home_team", "away_team"])
+        reg.register(reg.canonical_names(pd.concat([api["home_team"], api["away_team"]]).astype(str), "api").unique())
+
+    if os.path.exists(IN_RANKING_HISTORY) or os.path.exists(IN_RANKING_HISTORY.replace(".csv", ".parquet")):
+        rank = read_table(IN_RANKING_HISTORY, columns=["team"])
+        reg.register(reg.canonical_names(rank["team"].astype(str), "ranking").unique())
+
+    reg.save(path)
+    print(f"OK -> {path} | equipos: {len(reg.names)} | nuevos: {len(reg.names) - before}")
+    return reg
+
+
+if __name__ == "__main__":
+    build_registry()
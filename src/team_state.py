@@ -0,0 +1,413 @@
+import os
+import json
+import argparse
+import numpy as np
+import pandas as pd
+from elo import CHECKPOINT_FILE as ELO_CHECKPOINTS, load_checkpoints
+from features_form import METRICS, SINCE, WINDOWS, group_starts, team_long
+from ranking_asof import IN_RANKING_HISTORY, load_ranking_history, ranking_with_team_ids
+from storage import read_table, write_table
+from team_registry import TeamRegistry
+
+
+# =========================
+# CONFIGURACION
+# =========================
+# Estado más reciente de cada equipo (una fila por team_id): último ranking publicado y
+# forma de sus últimos partidos jugados. Es lo que necesita un partido futuro para
+# construir sus features sin recalcular el histórico (predict_fixtures.py).
+IN_MATCHES = "data/curated/matches_final_curated.csv"
+OUT_FILE = "data/curated/team_state.csv"
+
+# Almacén binario: matriz float64 (fila = team_id) en un .npy abierto con memmap y
+# metadatos (columnas, marca de agua) en un JSON al lado. Leer un equipo es leer una fila.
+STORE_FILE = "data/curated/team_state.npy"
+STORE_META = "data/curated/team_state.json"
+
+MATCH_COLS = ["date", "home_team_id", "away_team_id", "home_score", "away_score", "match_outcome", "match_id"]
+
+# Últimos partidos que se guardan por equipo (buffer circular): basta con la ventana
+# más larga para recalcular la forma al añadir partidos
+RING = max(WINDOWS)
+
+RANK_STATE = ["rank_position", "rank_points", "rank_date"]
+RATING_STATE = ["elo"]                    # lo rellena el motor de rating
+DATE_STATE = ["last_match_date", "rank_date"]
+
+
+def state_columns(windows: tuple = WINDOWS) -> list[str]:
+    return [f"last{w}_{suffix}" for w in windows for _, suffix in METRICS]
+
+
+def ring_columns() -> list[str]:
+    return [f"ring_{metric}_{k}" for metric, _ in METRICS for k in range(RING)]
+
+
+STORE_COLS = ["n_matches", "last_match_date", *RANK_STATE, *RATING_STATE, *state_columns(), *ring_columns()]
+
+
+# =========================
+# FORMA (últimos partidos)
+# =========================
+def latest_form(matches: pd.DataFrame, windows: tuple = WINDOWS) -> pd.DataFrame:
+    """
+    Media de los últimos w partidos jugados de cada equipo, igual que la feature con lag
+    de features_form.py evaluada en un partido posterior a todos ellos: los NaN se ignoran
+    y no hay valor si el equipo tiene menos de w-1 partidos.
+    """
+    long = team_long(matches, "home_team_id", "away_team_id")
+    _, team_ids = pd.factorize(pd.concat([matches["home_team_id"], matches["away_team_id"]], ignore_index=True))
+
+    # Última fila de cada equipo (el array está ordenado por equipo y fecha)
+    team = long["team"]
+    is_end = np.ones(len(team), dtype=bool)
+    is_end[:-1] = team[1:] != team[:-1]
+    end = np.flatnonzero(is_end) + 1
+    start = group_starts(team)[end - 1]
+
+    out = pd.DataFrame({
+        "team_id": np.asarray(team_ids)[team[end - 1]].astype("int32"),
+        "n_matches": (end - start).astype("int32"),
+        "last_match_date": matches["date"].to_numpy()[long["row"][end - 1]],
+    })
+    for w in windows:
+        lo = np.maximum(start, end - w)
+        for metric, suffix in METRICS:
+            v = long[metric]
+            valid = ~np.isnan(v)
+            cs = np.concatenate([[0.0], np.cumsum(np.where(valid, v, 0.0))])
+            cn = np.concatenate([[0], np.cumsum(valid)])
+            total, count = cs[end] - cs[lo], cn[end] - cn[lo]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = total / count
+            mean[(count == 0) | (end - start < w - 1)] = np.nan
+            out[f"last{w}_{suffix}"] = mean
+    return out
+
+
+def recent_matches(matches: pd.DataFrame) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Partidos en formato largo (orden de team_long) con su número de partido dentro del
+    equipo: (team_id, k, k desde el final, métricas). Con matches ya jugados.
+    """
+    long = team_long(matches, "home_team_id", "away_team_id")
+    _, team_ids = pd.factorize(pd.concat([matches["home_team_id"], matches["away_team_id"]], ignore_index=True))
+    team = long["team"]
+    starts = group_starts(team)
+    k = np.arange(len(team)) - starts
+    count = np.bincount(team)[team]
+    values = np.column_stack([long[metric] for metric, _ in METRICS])
+    return np.asarray(team_ids)[team].astype(np.int64), k, count - 1 - k, values
+
+
+# =========================
+# RANKING (última publicación)
+# =========================
+def latest_ranking(rank: pd.DataFrame) -> pd.DataFrame:
+    """Última publicación del ranking de cada team_id (salida de ranking_with_team_ids)."""
+    rank = rank.dropna(subset=["team_id"]).sort_values("rank_date", kind="stable")
+    last = rank.groupby("team_id", sort=False).tail(1)
+    return pd.DataFrame({
+        "team_id": last["team_id"].astype("int32").to_numpy(),
+        "rank_position": last["position"].to_numpy(dtype=float),
+        "rank_points": last["points"].to_numpy(dtype=float),
+        "rank_date": last["rank_date"].to_numpy(),
+    })
+
+
+def build_team_state(matches: pd.DataFrame, rank: pd.DataFrame, reg: TeamRegistry) -> pd.DataFrame:
+    """Una fila por equipo del registro: nombre, ranking y forma más recientes."""
+    played = matches.dropna(subset=["home_team_id", "away_team_id", "home_score", "away_score"])
+    state = pd.DataFrame({"team_id": np.arange(len(reg.names), dtype="int32"), "team": reg.names})
+    state = state.merge(latest_ranking(rank), on="team_id", how="left")
+    state = state.merge(latest_form(played.reset_index(drop=True)), on="team_id", how="left")
+    state["n_matches"] = state["n_matches"].fillna(0).astype("int32")
+    return state
+
+
+def load_team_state(path: str = OUT_FILE) -> pd.DataFrame:
+    return read_table(path).set_index("team_id")
+
+
+# =========================
+# ALMACEN (memmap por team_id)
+# =========================
+def to_days(dates) -> np.ndarray:
+    d = pd.to_datetime(pd.Series(dates)).to_numpy(dtype="datetime64[D]")
+    return np.where(np.isnat(d), np.nan, d.astype(np.int64)).astype(float)
+
+
+def from_days(days: np.ndarray) -> np.ndarray:
+    out = np.full(len(days), np.datetime64("NaT"), dtype="datetime64[D]")
+    ok = ~np.isnan(days)
+    out[ok] = days[ok].astype(np.int64)
+    return out.astype("datetime64[ns]")
+
+
+class TeamStateStore:
+    """
+    Estado por equipo en una matriz (fila = team_id, columnas STORE_COLS), abierta con
+    memmap: lookup(ids) es una indexación de filas y apply_matches() actualiza solo las
+    filas de los equipos que juegan, sin leer el histórico de partidos. La marca de agua
+    es la fecha del último partido incluido.
+    """
+
+    def __init__(self, data: np.ndarray, meta: dict, path: str | None = None):
+        self.data = data
+        self.meta = meta
+        self.path = path
+        self.cols = {c: j for j, c in enumerate(meta["columns"])}
+        self.ring_start = self.cols[ring_columns()[0]]
+
+    # ---------- abrir / crear ----------
+    @classmethod
+    def open(cls, path: str = STORE_FILE, mode: str = "r") -> "TeamStateStore":
+        with open(meta_path(path), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["columns"] != STORE_COLS or meta["ring"] != RING:
+            raise ValueError(f"{path}: columnas distintas de las de esta versión (reconstruir: python src/team_state.py)")
+        return cls(np.load(path, mmap_mode=mode), meta, path)
+
+    @classmethod
+    def build(cls, matches: pd.DataFrame, rank: pd.DataFrame, reg: TeamRegistry,
+              path: str | None = STORE_FILE) -> "TeamStateStore":
+        """Desde el histórico completo. Con path=None la matriz queda solo en memoria."""
+        played = matches.dropna(subset=["home_team_id", "away_team_id", "home_score", "away_score"])
+        played = played.reset_index(drop=True)
+        state = build_team_state(played, rank, reg)
+
+        meta = {"columns": STORE_COLS, "ring": RING, "watermark": None, "watermark_ids": [],
+                "rank_watermark": None}
+        store = cls(np.full((len(state), len(STORE_COLS)), np.nan), meta, path)
+        store.set_columns(state["team_id"].to_numpy(), state.drop(columns=["team_id", "team"]))
+        store.data[:, store.cols["n_matches"]] = state["n_matches"].to_numpy(dtype=float)
+        store.data[:, store.ring_start:] = np.nan
+        if len(played):
+            team, k, from_end, values = recent_matches(played)
+            store.write_ring(team, k, from_end, values)
+            store.set_watermark(played)
+        if len(rank):
+            meta["rank_watermark"] = str(pd.Timestamp(rank["rank_date"].max()).date())
+        if path:
+            store.save(path)
+        return store
+
+    def save(self, path: str):
+        """Escribe la matriz (.npy) y abre la copia en disco en modo r+ (memmap)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = path + ".tmp.npy"
+        out = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float64, shape=self.data.shape)
+        out[:] = self.data
+        out.flush()
+        del out
+        os.replace(tmp, path)
+        self.path = path
+        self.data = np.load(path, mmap_mode="r+")
+        self.flush()
+
+    def flush(self):
+        if isinstance(self.data, np.memmap):
+            self.data.flush()
+        if self.path:
+            tmp = meta_path(self.path) + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self.meta, f, indent=1)
+            os.replace(tmp, meta_path(self.path))
+
+    def ensure_rows(self, n: int):
+        """Equipos nuevos en el registro: la matriz crece (único caso en que se reescribe el fichero)."""
+        if n <= len(self.data):
+            return
+        grown = np.full((n, self.data.shape[1]), np.nan)
+        grown[:len(self.data)] = self.data
+        grown[len(self.data):, self.cols["n_matches"]] = 0
+        self.data = grown
+        if self.path:
+            self.save(self.path)
+
+    # ---------- lectura ----------
+    @property
+    def n_teams(self) -> int:
+        return len(self.data)
+
+    @property
+    def watermark(self) -> pd.Timestamp | None:
+        return pd.Timestamp(self.meta["watermark"]) if self.meta["watermark"] else None
+
+    def lookup(self, ids, columns: list[str]) -> np.ndarray:
+        """Filas de `ids` (NaN para ids fuera del almacén) con las columnas pedidas."""
+        ids = np.asarray(ids, dtype=float)
+        known = ~np.isnan(ids) & (ids >= 0) & (ids < self.n_teams)
+        out = np.full((len(ids), len(columns)), np.nan)
+        out[known] = self.data[ids[known].astype(np.int64)][:, [self.cols[c] for c in columns]]
+        return out
+
+    def get(self, team_id: int) -> dict:
+        row = self.lookup([team_id], STORE_COLS[:len(STORE_COLS) - len(ring_columns())])[0]
+        out = dict(zip(STORE_COLS, row))
+        for c in DATE_STATE:
+            out[c] = pd.Timestamp(from_days(np.array([out[c]]))[0])
+        return out
+
+    def to_frame(self, names: list[str] | None = None) -> pd.DataFrame:
+        """Vista tabular (sin el buffer de partidos): team_state.csv."""
+        cols = [c for c in STORE_COLS if not c.startswith("ring_")]
+        df = pd.DataFrame(self.data[:, [self.cols[c] for c in cols]], columns=cols)
+        df.insert(0, "team_id", np.arange(self.n_teams, dtype="int32"))
+        if names is not None:
+            df.insert(1, "team", pd.Series(names[:self.n_teams], dtype="str").reindex(range(self.n_teams)))
+        df["n_matches"] = df["n_matches"].astype("int32")
+        for c in DATE_STATE:
+            df[c] = from_days(df[c].to_numpy())
+        order = ["team_id", "team", *RANK_STATE, "n_matches", "last_match_date", *RATING_STATE, *state_columns()]
+        return df[[c for c in order if c in df.columns]]
+
+    # ---------- escritura ----------
+    def set_columns(self, ids, values: pd.DataFrame):
+        """Asigna columnas del estado para unos team_id (las fechas se guardan en días)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        self.ensure_rows(int(ids.max()) + 1 if len(ids) else 0)
+        for c in values.columns:
+            v = to_days(values[c]) if c in DATE_STATE else values[c].to_numpy(dtype=float)
+            self.data[ids, self.cols[c]] = v
+
+    def write_ring(self, team: np.ndarray, k: np.ndarray, from_end: np.ndarray, values: np.ndarray):
+        """Guarda los últimos RING partidos de cada equipo en la ranura k % RING."""
+        keep = from_end < RING
+        team, slot, values = team[keep], (k[keep] % RING).astype(np.int64), values[keep]
+        for m in range(len(METRICS)):
+            self.data[team, self.ring_start + m * RING + slot] = values[:, m]
+
+    def refresh_form(self, ids: np.ndarray):
+        """Recalcula las medias last{w}_* de unos equipos desde su buffer (misma regla que latest_form)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        n = self.data[ids, self.cols["n_matches"]].astype(np.int64)
+        for w in WINDOWS:
+            back = n[:, None] - 1 - np.arange(w)
+            slots = np.where(back >= 0, back % RING, 0)
+            for m, (_, suffix) in enumerate(METRICS):
+                v = self.data[ids[:, None], self.ring_start + m * RING + slots]
+                v = np.where(back >= 0, v, np.nan)
+                count = (~np.isnan(v)).sum(axis=1)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    mean = np.nansum(v, axis=1) / count
+                mean[(count == 0) | (n < w - 1)] = np.nan
+                self.data[ids, self.cols[f"last{w}_{suffix}"]] = mean
+
+    def set_watermark(self, played: pd.DataFrame):
+        """
+        Marca de agua = último día con partidos aplicados + los match_id de ese día, para
+        poder añadir después partidos del mismo día que llegaron tarde.
+        """
+        last = played["date"].max()
+        day_ids = played.loc[played["date"] == last, "match_id"].astype("int64").tolist()
+        if self.watermark is not None and last == self.watermark:
+            day_ids += self.meta.get("watermark_ids") or []
+        self.meta["watermark"] = str(last.date())
+        self.meta["watermark_ids"] = sorted(set(day_ids))
+
+    def apply_matches(self, matches: pd.DataFrame) -> int:
+        """
+        Añade partidos jugados desde la marca de agua: n_matches, último partido, buffer y
+        forma de los equipos que juegan. Devuelve cuántos partidos se aplicaron. Los del día
+        de la marca de agua ya aplicados (watermark_ids) se ignoran y los nuevos de ese día
+        se añaden (un equipo juega una vez por día: el orden dentro del día no cambia su
+        forma). Un partido anterior a la marca de agua no se puede añadir en orden
+        (ValueError): hay que reconstruir (python src/team_state.py).
+        """
+        played = matches.dropna(subset=["home_team_id", "away_team_id", "home_score", "away_score"])
+        if self.watermark is not None:
+            on_day = played["date"] == self.watermark
+            applied = self.meta.get("watermark_ids")
+            if on_day.any() and applied is None:
+                raise ValueError(f"almacén sin watermark_ids: no se sabe qué partidos del "
+                                 f"{self.meta['watermark']} están aplicados")
+            played = played[~(on_day & played["match_id"].isin(applied or []))]
+            if (played["date"] < self.watermark).any():
+                raise ValueError(f"hay partidos con fecha < marca de agua ({self.meta['watermark']})")
+        if played.empty:
+            return 0
+        played = played.reset_index(drop=True)
+
+        team, k, from_end, values = recent_matches(played)
+        self.ensure_rows(int(team.max()) + 1)
+        ids = np.unique(team)
+        n_col = self.cols["n_matches"]
+        self.write_ring(team, self.data[team, n_col] + k, from_end, values)
+        self.data[ids, n_col] += np.bincount(team, minlength=self.n_teams)[ids]
+
+        day = np.concatenate([to_days(played["date"])] * 2)
+        tid = np.concatenate([played["home_team_id"].to_numpy(dtype=np.int64),
+                              played["away_team_id"].to_numpy(dtype=np.int64)])
+        latest = np.full(self.n_teams, -np.inf)
+        np.maximum.at(latest, tid, day)
+        self.data[ids, self.cols["last_match_date"]] = latest[ids]
+
+        self.refresh_form(ids)
+        self.set_watermark(played)
+        return len(played)
+
+    def apply_ranking(self, rank: pd.DataFrame) -> int:
+        """Última publicación del ranking (salida de ranking_with_team_ids) de cada equipo."""
+        last = latest_ranking(rank)
+        self.set_columns(last["team_id"].to_numpy(), last.drop(columns="team_id"))
+        if len(rank):
+            self.meta["rank_watermark"] = str(pd.Timestamp(rank["rank_date"].max()).date())
+        return len(last)
+
+
+def meta_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".json"
+
+
+def attach_elo(store: TeamStateStore, path: str = ELO_CHECKPOINTS) -> bool:
+    """Rating Elo actual (estado final de elo.py) en la columna elo del almacén."""
+    if not os.path.exists(path):
+        return False
+    final = load_checkpoints(path)["final"]
+    store.set_columns(np.arange(len(final)), pd.DataFrame({"elo": final}))
+    return True
+
+
+def main(since: str | None = SINCE, update: bool = False):
+    reg = TeamRegistry.load()
+    rank = ranking_with_team_ids(load_ranking_history(IN_RANKING_HISTORY), reg)
+
+    store = None
+    if update and os.path.exists(STORE_FILE):
+        # Solo los partidos desde el día de la marca de agua, sobre la matriz en disco
+        store = TeamStateStore.open(STORE_FILE, mode="r+")
+        matches = read_table(IN_MATCHES, MATCH_COLS, since=store.meta["watermark"])
+        try:
+            n_new = store.apply_matches(matches)
+        except ValueError as e:
+            print(f"No se puede actualizar en orden ({e}): se reconstruye")
+            store = None
+        else:
+            store.ensure_rows(len(reg.names))
+            store.apply_ranking(rank)
+            store.flush()
+            print("Partidos añadidos al estado:", n_new)
+    if store is None:
+        # Misma ventana que las features del modelo
+        matches = read_table(IN_MATCHES, MATCH_COLS, since=since)
+        store = TeamStateStore.build(matches, rank, reg, STORE_FILE)
+    attach_elo(store)
+    store.flush()
+
+    state = store.to_frame(reg.names)
+    write_table(state, OUT_FILE)
+    print("OK ->", STORE_FILE, "+", OUT_FILE, "| equipos:", len(state),
+          "| con ranking:", int(state["rank_points"].notna().sum()),
+          "| con forma (10):", int(state["last10_gf"].notna().sum()),
+          "| marca de agua:", store.meta["watermark"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estado más reciente por equipo (ranking + forma)")
+    parser.add_argument("--since", default=SINCE, help="Inicio de la ventana de partidos (por defecto 1993-01-01)")
+    parser.add_argument("--full-history", action="store_true", help="Usar todo el histórico")
+    parser.add_argument("--update", action="store_true",
+                        help="Añadir al almacén existente solo los partidos posteriores a su marca de agua")
+    args = parser.parse_args()
+    main(since=None if args.full_history else args.since, update=args.update)
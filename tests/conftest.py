@@ -0,0 +1,41 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+# Los módulos de src/ se importan como scripts planos (igual que entre ellos)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+from match_id import match_ids  # noqa: E402 (después de añadir src/ al path)
+
+TOURNAMENTS = ["Friendly", "FIFA World Cup", "UEFA Euro", "FIFA World Cup qualification", "Nations Cup"]
+
+
+@pytest.fixture
+def matches() -> pd.DataFrame:
+    """
+    Partidos sintéticos con la forma de matches_final_curated: cada equipo juega como
+    mucho una vez por día y los últimos días no tienen marcador (fixtures futuros).
+    """
+    rng = np.random.default_rng(7)
+    n_teams, days = 12, pd.date_range("2016-01-03", periods=160, freq="17D")
+    rows = []
+    for i, day in enumerate(days):
+        teams = rng.permutation(n_teams)[:2 * int(rng.integers(2, n_teams // 2 + 1))]
+        for h, a in teams.reshape(-1, 2):
+            played = i < len(days) - 3
+            hs, as_ = (int(rng.poisson(1.4)), int(rng.poisson(1.1))) if played else (None, None)
+            rows.append((day, h, a, hs, as_))
+    df = pd.DataFrame(rows, columns=["date", "home_team_id", "away_team_id", "home_score", "away_score"])
+    df["home_team"] = "T" + df["home_team_id"].astype(str)
+    df["away_team"] = "T" + df["away_team_id"].astype(str)
+    df["home_score"] = df["home_score"].astype("Int8")
+    df["away_score"] = df["away_score"].astype("Int8")
+    df["tournament"] = rng.choice(TOURNAMENTS, len(df))
+    df["neutral"] = rng.random(len(df)) < 0.2
+    level = (df["home_score"] == df["away_score"]).fillna(False) & (rng.random(len(df)) < 0.3)
+    df["shootout_winner"] = df["home_team"].where(level & (rng.random(len(df)) < 0.5),
+                                                  df["away_team"].where(level))
+    df["match_outcome"] = np.sign(df["home_score"].astype(float) - df["away_score"].astype(float))
+    df["match_id"] = match_ids(df["date"], df["home_team_id"], df["away_team_id"])
+    return df
@@ -0,0 +1,46 @@
+import os
+import pytest
+from bs4 import BeautifulSoup
+import datos_football_ranking as fr
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "fixtures", "football_ranking_page_1.html")
+
+
+@pytest.fixture
+def soup():
+    with open(FIXTURE, encoding="utf-8") as f:
+        return BeautifulSoup(f.read(), "html.parser")
+
+
+def test_first_page(soup):
+    assert fr.extract_period_label(soup) == "19 January 2026"
+    assert fr.detect_page_count(soup) == 5
+    df = fr.extract_ranking_from_table_fast(fr.find_ranking_table(soup))
+    assert df["position"].tolist() == [1, 2, 3, 4, 5]
+    assert df.loc[0, "team"] == "Spain (ESP)" and df.loc[0, "points"] == "1,877.18"
+
+
+def test_period_selector(soup):
+    # Solo fechas desde el primer ranking FIFA publicado
+    assert fr.list_ranking_dates(soup) == ["1993-08-08", "2025-12-22", "2026-01-19"]
+
+
+def test_missing_period_selector_fails(soup):
+    soup.find("select").decompose()
+    with pytest.raises(ValueError, match="selector de periodo"):
+        fr.list_ranking_dates(soup)
+
+
+def test_check_period(soup):
+    fr.check_period(fr.extract_period_label(soup), "2026-01-19", 1)
+    with pytest.raises(ValueError):
+        fr.check_period(fr.extract_period_label(soup), "2025-12-22", 1)
+
+
+def test_migrate_legacy_raw(tmp_path):
+    legacy, raw = tmp_path / "raw", tmp_path / "raw" / "fifa_ranking"
+    legacy.mkdir()
+    (legacy / "football_ranking_raw_2026-01-18_19_January_2026_page_1.csv").write_text("position,team,points\n")
+    assert fr.migrate_legacy_raw(str(legacy), str(raw)) == 1
+    assert os.listdir(raw) == ["football_ranking_raw_2026-01-18_19_January_2026_page_1.csv"]
+    assert fr.migrate_legacy_raw(str(legacy), str(raw)) == 0
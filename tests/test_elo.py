@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+import pytest
+import elo
+
+
+def saved_run(matches):
+    """Lo que deja guardado una ejecución completa: features y checkpoints + estado final."""
+    features, final, ckpt = elo.full_run(matches)
+    return features, dict(ckpt, final=final, watermark=elo.watermark_of(matches))
+
+
+def assert_same(extended, full):
+    features, final, ckpt, _ = extended
+    pd.testing.assert_frame_equal(features, full[0])
+    np.testing.assert_allclose(final, full[1])
+    np.testing.assert_array_equal(ckpt["date"], full[2]["date"])
+    np.testing.assert_allclose(ckpt["ratings"], full[2]["ratings"])
+
+
+@pytest.mark.parametrize("cut", ["2017-03-01", "2020-01-01", "2023-02-10"])
+def test_extend_after_watermark_resumes_from_final(matches, cut):
+    old = matches[matches["date"] < cut]
+    features, ckpt = saved_run(old)
+    since = matches.loc[matches["date"] >= cut, "date"].min()
+    out = elo.extend(matches, features, ckpt, since)
+    assert out[3].startswith("el estado final")
+    assert_same(out, elo.full_run(matches))
+
+
+def test_extend_late_match_on_watermark_day(matches):
+    played = matches.dropna(subset=["home_score"])
+    day = played["date"].max()
+    order = elo.match_inputs(played[played["date"] == day])["match_id"]
+    old = played[played["match_id"] != order[-1]]
+    features, ckpt = saved_run(old)
+    out = elo.extend(played, features, ckpt, day)
+    assert out[3].startswith("el estado final")
+    assert_same(out, elo.full_run(played))
+
+
+def test_extend_change_before_watermark_uses_checkpoint(matches):
+    # Un partido corregido en 2019: se vuelve al checkpoint del 1 de enero de ese año
+    features, ckpt = saved_run(matches)
+    changed = matches.copy()
+    i = changed.index[(changed["date"].dt.year == 2019) & changed["home_score"].notna()][3]
+    changed.loc[i, "home_score"] += 2
+    out = elo.extend(changed, features, ckpt, changed.loc[i, "date"])
+    assert out[3] == "el checkpoint 2019-01-01"
+    assert_same(out, elo.full_run(changed))
+
+
+def test_require_full_history(matches):
+    with pytest.raises(elo.PartialHistory):
+        elo.require_full_history(matches["date"])
+    elo.require_full_history(pd.Series(pd.to_datetime([elo.FIRST_MATCH_DATE, "2020-01-01"])))
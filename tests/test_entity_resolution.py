@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+from entity_resolution import best_matches, candidate_pairs, resolve_sources, score_pairs
+from match_id import match_ids
+
+
+def table(rows, **extra) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=["date", "home_team_id", "away_team_id", "home_score", "away_score"])
+    df["date"] = pd.to_datetime(df["date"])
+    df["home_team"] = "T" + df["home_team_id"].astype(str)
+    df["away_team"] = "T" + df["away_team_id"].astype(str)
+    df["match_id"] = match_ids(df["date"], df["home_team_id"], df["away_team_id"])
+    for c, v in extra.items():
+        df[c] = v
+    return df
+
+
+def sources():
+    kaggle = table([
+        ("2022-03-01", 1, 2, 2, 1),   # 0: dos fixtures API candidatos (mismo día y +1)
+        ("2022-03-05", 3, 4, 0, 0),   # 1: el mismo cruce dos días seguidos en Kaggle
+        ("2022-03-06", 3, 4, 1, 0),   # 2
+        ("2022-03-10", 5, 6, 3, 1),   # 3: API con orientación invertida
+        ("2022-03-12", 7, 8, 1, 1),   # 4: marcador distinto -> conflict
+    ])
+    kaggle["match_key"] = [f"k{i}" for i in range(len(kaggle))]
+    api = table([
+        ("2022-03-01", 1, 2, 2, 1),
+        ("2022-03-02", 1, 2, 2, 1),
+        ("2022-03-06", 3, 4, 1, 0),
+        ("2022-03-10", 6, 5, 1, 3),
+        ("2022-03-12", 7, 8, 2, 0),
+        ("2022-04-01", 9, 10, None, None),
+    ], fixture_id=np.arange(100, 106), league_id=10, season=2022)
+    return kaggle, api
+
+
+def test_best_matches_one_to_one():
+    kaggle, api = sources()
+    pairs = score_pairs(candidate_pairs(kaggle, api), kaggle, api)
+    # Hay candidatos que comparten partido en las dos direcciones...
+    assert pairs["api_pos"].duplicated().any() and pairs["k_pos"].duplicated().any()
+    best = best_matches(pairs)
+    # ...pero cada partido de cada fuente se usa como mucho una vez
+    assert not best["api_pos"].duplicated().any() and not best["k_pos"].duplicated().any()
+    assert dict(zip(best["api_pos"], best["k_pos"])) == {0: 0, 2: 2, 3: 3, 4: 4}
+
+
+def test_resolve_sources():
+    kaggle, api = sources()
+    final, report = resolve_sources(kaggle, api)
+    assert report["resolution"].tolist() == ["merged", "unmatched", "merged", "merged", "conflict", "unmatched"]
+    assert len(final) == len(kaggle) + 2
+    assert final["match_id"].is_unique
+    # El registro Kaggle se conserva (también en conflicto) y hereda las columnas API
+    np.testing.assert_array_equal(final["fixture_id"].iloc[:len(kaggle)], [100, np.nan, 102, 103, 104])
+    assert final["home_score"].iloc[4] == 1 and final["resolution"].iloc[4] == "conflict"
+    # Los fixtures sin pareja (el repetido al día siguiente y el futuro) se añaden tal cual
+    assert final["sources"].iloc[len(kaggle):].eq("api_football").all()
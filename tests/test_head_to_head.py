@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from head_to_head import HeadToHead, build_index
+
+
+def pair(df: pd.DataFrame) -> pd.Series:
+    return np.minimum(df["home_team_id"], df["away_team_id"]) * 100 + np.maximum(df["home_team_id"], df["away_team_id"])
+
+
+@pytest.mark.parametrize("cut", ["2017-03-01", "2021-07-01"])
+def test_extend_equals_build_index(matches, cut):
+    full = HeadToHead(build_index(matches))
+    h2h = HeadToHead(build_index(matches[matches["date"] < cut]))
+    n = h2h.extend(matches[matches["date"] >= h2h.watermark])
+    assert n == (matches["date"] >= cut).sum() - matches["home_score"].isna().sum()
+    pd.testing.assert_frame_equal(h2h.index, full.index)
+    pd.testing.assert_frame_equal(h2h.features(matches), full.features(matches))
+
+
+def test_extend_late_match_on_watermark_day(matches):
+    played = matches.dropna(subset=["home_score"])
+    day = played[played["date"] == played["date"].max()]
+    full = HeadToHead(build_index(played))
+    h2h = HeadToHead(build_index(played.drop(day.index[0])))
+    assert h2h.extend(day) == 1
+    assert h2h.extend(day) == 0
+    pd.testing.assert_frame_equal(h2h.features(matches), full.features(matches))
+
+
+def test_features_only_use_earlier_matches(matches):
+    # Fuerza bruta: partidos jugados de la pareja (cualquier orientación) en días anteriores
+    features = HeadToHead(build_index(matches)).features(matches)
+    played = matches.dropna(subset=["home_score", "away_score"])
+    for row, key in zip(matches.itertuples(), pair(matches)):
+        before = played[(pair(played) == key) & (played["date"] < row.date)]
+        won = ((before["home_team_id"] == row.home_team_id) & (before["home_score"] > before["away_score"])
+               | (before["away_team_id"] == row.home_team_id) & (before["away_score"] > before["home_score"]))
+        assert features.loc[row.Index, "h2h_matches"] == len(before)
+        assert features.loc[row.Index, "h2h_home_wins"] == won.sum()
+
+
+def test_extend_before_watermark_fails(matches):
+    h2h = HeadToHead(build_index(matches))
+    with pytest.raises(ValueError):
+        h2h.extend(matches[matches["date"] < "2017-01-01"])
@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+from match_id import MAX_SEQ, MAX_TEAM_ID, base_of, match_ids, resequence, split_match_ids
+
+
+def test_round_trip():
+    dates = pd.Series(pd.to_datetime(["1872-11-30", "1970-01-01", "2026-06-11", "2026-06-11", "2026-06-11"]))
+    home = pd.Series([0, 7, MAX_TEAM_ID, MAX_TEAM_ID, 3])
+    away = pd.Series([1, 0, 2, 2, MAX_TEAM_ID])
+    ids = match_ids(dates, home, away)
+    assert ids.dtype == np.int64 and (ids > 0).all()
+
+    back = split_match_ids(ids)
+    np.testing.assert_array_equal(back["date"].to_numpy(dtype="datetime64[D]"), dates.to_numpy(dtype="datetime64[D]"))
+    np.testing.assert_array_equal(back["home_team_id"], home)
+    np.testing.assert_array_equal(back["away_team_id"], away)
+    # Partido repetido (misma fecha y equipos): la secuencia sigue el orden de aparición
+    np.testing.assert_array_equal(back["seq"], [0, 0, 0, 1, 0])
+    assert base_of(ids)[2] == base_of(ids)[3]
+
+
+def test_order_follows_date():
+    dates = pd.Series(pd.to_datetime(["1900-01-01", "1950-05-05", "2024-12-31"]))
+    ids = match_ids(dates, pd.Series([MAX_TEAM_ID] * 3), pd.Series([MAX_TEAM_ID - 1] * 3))
+    assert (np.diff(ids) > 0).all()
+
+
+def test_resequence_after_concat():
+    dates = pd.Series(pd.to_datetime(["2020-01-01"] * 2))
+    a = match_ids(dates[:1], pd.Series([1]), pd.Series([2]))
+    b = match_ids(dates[1:], pd.Series([1]), pd.Series([2]))
+    ids = resequence(np.concatenate([a, b]))
+    np.testing.assert_array_equal(split_match_ids(ids)["seq"], [0, 1])
+
+
+def test_invalid_inputs():
+    dates = pd.Series(pd.to_datetime(["2020-01-01"]))
+    with pytest.raises(ValueError):
+        match_ids(dates, pd.Series([MAX_TEAM_ID + 1]), pd.Series([0]))
+    with pytest.raises(ValueError):
+        match_ids(dates, pd.Series([np.nan]), pd.Series([0]))
+    with pytest.raises(ValueError):
+        match_ids(pd.Series([pd.NaT]), pd.Series([1]), pd.Series([0]))
+    with pytest.raises(ValueError):
+        match_ids(pd.Series(pd.to_datetime(["2020-01-01"] * (MAX_SEQ + 2))),
+                  pd.Series([1] * (MAX_SEQ + 2)), pd.Series([2] * (MAX_SEQ + 2)))
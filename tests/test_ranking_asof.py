@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from ranking_asof import RankingIndex
+
+
+def history():
+    return pd.DataFrame({
+        "team_norm": ["Spain", "Spain", "France", "Brazil"],
+        "rank_date": pd.to_datetime(["2020-01-01", "2020-06-01", "2020-03-01", "2019-12-01"]),
+        "position": [5, 3, 2, 1],
+        "points": [1700.5, 1750.0, 1800.0, 1850.0],
+    })
+
+
+def test_lookup_is_strictly_before():
+    teams = pd.Series(["Spain", "Spain", "Spain", "Spain", "France", "France"])
+    dates = pd.Series(pd.to_datetime(["2019-12-31", "2020-01-01", "2020-06-01", "2020-06-02",
+                                      "2020-03-01", "2020-03-02"]))
+    r = RankingIndex(history()).lookup(teams, dates)
+    # Publicado el mismo día del partido: todavía no cuenta
+    np.testing.assert_array_equal(r["position"].to_numpy(), [np.nan, np.nan, 5, 3, np.nan, 2])
+    assert r["rank_date"].iloc[2] == pd.Timestamp("2020-01-01")
+    assert (r["rank_date"].dropna() < dates[r["rank_date"].notna()]).all()
+
+
+def test_lookup_does_not_cross_teams():
+    # Brazil (código 2) tiene una publicación anterior a todas las de France (código 1)
+    teams = pd.Series(["France", "Brazil", "Italy"])
+    dates = pd.Series(pd.to_datetime(["2020-01-15", "2020-01-15", "2020-01-15"]))
+    r = RankingIndex(history()).lookup(teams, dates)
+    np.testing.assert_array_equal(r["position"].to_numpy(), [np.nan, 1, np.nan])
+
+
+def test_lookup_missing_dates_and_static():
+    teams = pd.Series(["Spain", "Spain"])
+    index = RankingIndex(history())
+    r = index.lookup(teams, pd.Series([pd.NaT, pd.Timestamp("2021-01-01")]))
+    np.testing.assert_array_equal(r["position"].to_numpy(), [np.nan, 3])
+    # dates=None: último ranking disponible (join antiguo)
+    np.testing.assert_array_equal(index.lookup(teams, None)["position"].to_numpy(), [3, 3])
+
+
+def test_lookup_empty_history():
+    r = RankingIndex(history().iloc[:0]).lookup(pd.Series(["Spain"]), pd.Series(pd.to_datetime(["2020-01-01"])))
+    assert r["position"].isna().all() and r["rank_date"].isna().all()
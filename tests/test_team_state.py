@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from team_registry import TeamRegistry
+from team_state import TeamStateStore
+
+RANK = pd.DataFrame({"team_id": [0, 1, 0], "rank_date": pd.to_datetime(["2016-01-01", "2016-01-01", "2018-01-01"]),
+                     "position": [4.0, 9.0, 2.0], "points": [1500.0, 1400.0, 1600.0]})
+
+
+def registry(matches):
+    n = int(max(matches["home_team_id"].max(), matches["away_team_id"].max())) + 1
+    return TeamRegistry([f"T{i}" for i in range(n)])
+
+
+@pytest.mark.parametrize("cut", ["2019-06-01", "2022-01-01"])
+def test_apply_matches_equals_build(matches, cut):
+    reg = registry(matches)
+    full = TeamStateStore.build(matches, RANK, reg, path=None)
+
+    old = matches[matches["date"] < cut]
+    store = TeamStateStore.build(old, RANK, reg, path=None)
+    n = store.apply_matches(matches[matches["date"] >= store.watermark])
+    assert n == matches["home_score"].notna().sum() - old["home_score"].notna().sum()
+    np.testing.assert_allclose(store.data, full.data, equal_nan=True)
+    assert store.watermark == full.watermark
+
+
+def test_late_match_on_watermark_day(matches):
+    # Un partido del último día que llega tarde se añade; los ya aplicados se ignoran
+    reg = registry(matches)
+    played = matches.dropna(subset=["home_score"])
+    last = played[played["date"] == played["date"].max()]
+    full = TeamStateStore.build(played, RANK, reg, path=None)
+
+    store = TeamStateStore.build(played.drop(last.index[-1]), RANK, reg, path=None)
+    assert store.apply_matches(played[played["date"] >= store.watermark]) == 1
+    np.testing.assert_allclose(store.data, full.data, equal_nan=True)
+    assert store.apply_matches(played[played["date"] >= store.watermark]) == 0
+
+
+def test_apply_matches_before_watermark_fails(matches):
+    store = TeamStateStore.build(matches, RANK, registry(matches), path=None)
+    with pytest.raises(ValueError):
+        store.apply_matches(matches[matches["date"] < "2017-01-01"])